@@ -13,14 +13,20 @@ from src.retrievers.index_creation import (
     create_enhanced_specs_index_accelerated_satel,
     create_enhanced_specs_index_accelerated_pdf_satel
 )
+from src.retrievers.spec_attributes import build_spec_attribute_store
+from src.retrievers.verdict_cache import compute_index_version
+from src.retrievers.catalog_search import build_catalog_index
 from src.ui.styles import STYLES
 from src.ui.components import (
     render_technician_interface,
+    render_llm_route_stats,
     render_product_chat,
-    render_product_search_interface
+    render_product_search_interface,
+    render_catalog_search_interface
 )
 from src.utils.session_state import initialize_session_state
-from config.settings import HIKVISION_CSV, SATEL_CSV
+from src.agents.context import get_agent_context
+from config.settings import HIKVISION_CSV, SATEL_CSV, HIKVISION_ROW_LIMIT, AGENT_WARMUP
 
 
 # Apply styles
@@ -32,12 +38,19 @@ initialize_session_state()
 # Load embedding model
 embedding_model = get_embedding_model()
 
+# Technician agent resources are created on first use; optionally warm them up
+# in the background, sharing the embedding model loaded above
+if AGENT_WARMUP:
+    agent_context = get_agent_context()
+    agent_context.use_embedding_model(embedding_model)
+    agent_context.warm_up()
+
 # Load data
 try:
     df_hikvision = pd.read_csv(HIKVISION_CSV)
-    # Limit to first 20 rows for testing (remove in production)
-    if len(df_hikvision) > 20:
-        df_hikvision = df_hikvision[:20]
+    # Optional row cap for quick local testing (HIKVISION_ROW_LIMIT env variable)
+    if HIKVISION_ROW_LIMIT and len(df_hikvision) > HIKVISION_ROW_LIMIT:
+        df_hikvision = df_hikvision[:HIKVISION_ROW_LIMIT]
 except FileNotFoundError:
     st.error(f"❌ File not found: {HIKVISION_CSV}")
     st.stop()
@@ -89,6 +102,24 @@ specs_index_pdf_hikvision = st.session_state['specs_index_pdf_hikvision']
 specs_index_satel = st.session_state['specs_index_satel']
 specs_index_pdf_satel = st.session_state['specs_index_pdf_satel']
 
+# Structured attributes parsed from technical specifications
+attributes_hikvision = build_spec_attribute_store(df_hikvision, "hikvision")
+attributes_satel = build_spec_attribute_store(df_satel, "satel")
+
+# Data versions used to key cached verdicts
+if 'index_version_hikvision' not in st.session_state:
+    st.session_state['index_version_hikvision'] = compute_index_version(df_hikvision)
+if 'index_version_satel' not in st.session_state:
+    st.session_state['index_version_satel'] = compute_index_version(df_satel)
+
+# Catalog-wide indices (reuse the stored chunk vectors, no re-embedding)
+catalog_index_hikvision = build_catalog_index(
+    "hikvision", st.session_state['index_version_hikvision'], specs_index_hikvision
+)
+catalog_index_satel = build_catalog_index(
+    "satel", st.session_state['index_version_satel'], specs_index_satel
+)
+
 # Initialize LLM
 llm = get_llm()
 
@@ -98,6 +129,7 @@ category = st.sidebar.radio(
     "Choose a category:",
     ("Technicien", "Satel Product", "Hikvision Product")
 )
+render_llm_route_stats()
 
 # Main Interface
 st.markdown('<div class="main-title">Interactive Chatbot</div>', unsafe_allow_html=True)
@@ -111,7 +143,7 @@ elif category == "Hikvision Product":
     
     action = st.radio(
         "Choose an action:",
-        ("Ask about an item", "Search about caractéristiques")
+        ("Ask about an item", "Search about caractéristiques", "Search the whole catalog")
     )
     
     if action == "Ask about an item":
@@ -160,7 +192,18 @@ elif category == "Hikvision Product":
             llm,
             specs_index_hikvision,
             specs_index_pdf_hikvision,
-            embedding_model
+            embedding_model,
+            attribute_store=attributes_hikvision,
+            index_version=st.session_state['index_version_hikvision']
+        )
+    
+    elif action == "Search the whole catalog":
+        render_catalog_search_interface(
+            category,
+            df_hikvision,
+            catalog_index_hikvision,
+            embedding_model,
+            attribute_store=attributes_hikvision
         )
 
 elif category == "Satel Product":
@@ -168,7 +211,7 @@ elif category == "Satel Product":
     
     action = st.radio(
         "Choose an action:",
-        ("Ask about an item", "Search about caractéristiques")
+        ("Ask about an item", "Search about caractéristiques", "Search the whole catalog")
     )
     
     if action == "Ask about an item":
@@ -217,6 +260,17 @@ elif category == "Satel Product":
             llm,
             specs_index_satel,
             specs_index_pdf_satel,
-            embedding_model
+            embedding_model,
+            attribute_store=attributes_satel,
+            index_version=st.session_state['index_version_satel']
+        )
+    
+    elif action == "Search the whole catalog":
+        render_catalog_search_interface(
+            category,
+            df_satel,
+            catalog_index_satel,
+            embedding_model,
+            attribute_store=attributes_satel
         )
 
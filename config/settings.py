@@ -19,6 +19,24 @@ if not OPENAI_API_KEY:
 LLM_MODEL = "llama-3.1-8b-instant"
 LLM_TEMPERATURE = 0.6
 
+# Model routing: each class of LLM call gets its own model, temperature, answer cap and timeout
+# (max_tokens / timeout None for no limit). get_llm(task) builds the model of a route.
+LLM_ROUTES = {
+    # Short structured outputs: dates, filter JSON
+    "extract": {"model": os.getenv("LLM_MODEL_EXTRACT", "llama-3.1-8b-instant"), "temperature": 0.0,
+                "max_tokens": 200, "timeout": 15},
+    # Choices among known labels: agent tool selection
+    "classify": {"model": os.getenv("LLM_MODEL_CLASSIFY", "llama-3.1-8b-instant"), "temperature": 0.0,
+                 "max_tokens": 512, "timeout": 30},
+    # User-facing answers and product verdicts
+    "answer": {"model": os.getenv("LLM_MODEL_ANSWER", LLM_MODEL), "temperature": LLM_TEMPERATURE,
+               "max_tokens": None, "timeout": 60},
+    # Partial summaries of map-reduce chunks
+    "summarize": {"model": os.getenv("LLM_MODEL_SUMMARIZE", "llama-3.1-8b-instant"), "temperature": 0.2,
+                  "max_tokens": 400, "timeout": 45},
+}
+DEFAULT_LLM_ROUTE = "answer"
+
 # Embedding Configuration
 EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 EMBEDDING_DEVICE = "cpu"
@@ -34,8 +52,88 @@ RETRIEVER_K_CSV = 10
 RETRIEVER_K_PDF = 10
 RETRIEVER_K_COMBINED = 15
 
+# Product Analysis Configuration
+ANALYSIS_MAX_WORKERS = 6
+ANALYSIS_PRODUCT_TIMEOUT = 90  # seconds per product, None to disable
+ANALYSIS_MODE = "concurrent"  # "concurrent" (one prompt per product), "fast" (short verdicts) or "batched"
+ANALYSIS_BATCH_TOKEN_BUDGET = 5000  # prompt + expected answer tokens per batched call
+ANALYSIS_BATCH_MAX_PRODUCTS = 8
+ANALYSIS_BATCH_OUTPUT_TOKENS = 120  # expected answer tokens per product
+
+# Fast mode ("fast"): one-line verdicts, full justification generated on demand
+ANALYSIS_FAST_MAX_TOKENS = 40  # answer token cap per fast prompt
+
+# Speculative PDF fallback: "off", "retrieval" (prefetch PDF chunks with the CSV prompt)
+# or "prompt" (also send the PDF prompt early, spending extra tokens)
+ANALYSIS_SPECULATION = "retrieval"
+SPECULATIVE_PDF_PROMPT_BUDGET = 0.25  # share of products allowed an early PDF prompt
+
+# Embedding pre-screen (cascade mode): best chunk cosine similarity thresholds
+CASCADE_NEGATIVE_THRESHOLD = 0.20  # below: CSV prompt skipped, straight to the PDF fallback
+CASCADE_POSITIVE_THRESHOLD = None  # above: answered "Oui" without the LLM (similarity is not agreement: off)
+
+# Technician agent: build the LLM, embeddings and Drive client in the background at startup
+AGENT_WARMUP = True
+# Saved technician index (contains contact details; only the current version is kept).
+# None keeps it in memory and rebuilds it at startup, e.g. os.path.join("data", "technician_index")
+TECHNICIAN_INDEX_DIR = None
+
+# Technician agent intent router: send clear questions straight to a tool, ReAct agent otherwise
+AGENT_ROUTER = True
+ROUTER_MIN_SIMILARITY = 0.35  # cosine similarity of the question to the best tool
+ROUTER_MIN_MARGIN = 0.05  # lead over the second best tool
+
+# Technician agent sheets, read through a local mirror synced by modified date
+SHEET_SOURCE = os.getenv("SHEET_SOURCE", "drive")  # "drive" or "local" (CSV files in LOCAL_SHEETS_DIR)
+LOCAL_SHEETS_DIR = os.path.join("data", "sheets")
+SHEET_MIRROR_PATH = os.path.join("data", "sheet_mirror.sqlite")
+SHEET_MIRROR_SYNC_INTERVAL = 60  # seconds between modified-date checks of a sheet or folder
+SHEET_SYNC_MAX_WORKERS = 8  # sheets downloaded in parallel during a sync
+SHEET_SYNC_RETRIES = 3  # retries per sheet, with exponential backoff
+SHEET_SYNC_BACKOFF = 1.0  # seconds before the first retry
+REPORT_STORE_PATH = os.path.join("data", "report_store.sqlite")  # indexed daily report rows and their embeddings
+REPORT_EMBEDDING_BATCH = 256  # daily report rows embedded per call
+
+# Computed answers (equipment totals) are rendered from FR/EN templates; True rewords them with the LLM
+AGENT_LLM_POLISH = False
+
+# Technician tool answers cached per question, resolved date/filters and sheet version
+TOOL_CACHE_TTL = 15 * 60  # seconds, None for no expiry
+TOOL_CACHE_MAX_ENTRIES = 256  # 0 disables the cache
+
+# Merged report filters extracted per question (rules first, LLM for residual fields)
+FILTER_CACHE_TTL = 60 * 60  # seconds, None for no expiry
+FILTER_CACHE_MAX_ENTRIES = 512
+
+# Merged report answers: "retrieval" (closest rows only), "map_reduce" (every matching row)
+# or "auto" (map-reduce above MAP_REDUCE_MIN_ROWS matching rows)
+MERGED_ANSWER_MODE = "auto"
+MAP_REDUCE_MIN_ROWS = 40
+MAP_REDUCE_MAX_ROWS = 600  # beyond this, the closest rows to the question are kept
+MAP_REDUCE_CHUNK_TOKENS = 3000  # row tokens per map prompt
+MAP_REDUCE_SUMMARY_TOKENS = 300  # answer token cap per map prompt
+MAP_REDUCE_MAX_WORKERS = 4
+MAP_REDUCE_DEADLINE = 90  # seconds for the whole map-reduce, None to disable
+TECHNICIAN_SHEET_ID = "1ersVCUKQXs5Z6on6GNc34SD5pGnKIbxVr2KAObdk42Q"
+PLANNING_FOLDER_ID = "12V7P86iJMrceBDkU6INJ6DlpL0e9UqaM"
+DAILY_REPORT_SHEET_ID = "1c-lhkk7LPw00d5OfNiEp15CZXlVIWjUI-mI2BEYzuBs"
+DAILY_REPORTS_FOLDER_ID = "1t8RpUifcNYA66105dQ2QVLbNH8WAR94O"
+
+# Groq quota shared by every LLM call (token bucket)
+LLM_RATE_LIMIT_PER_MINUTE = 30
+LLM_RATE_BURST = 5
+
+# Catalog-wide feature search
+CATALOG_TOP_N = 10  # products returned
+CATALOG_EVIDENCE_K = 3  # best chunks shown per product
+CATALOG_CANDIDATE_K = 2000  # best chunks considered before grouping by product
+CATALOG_KEYWORD_WEIGHT = 0.3  # weight of the keyword score in hybrid search
+
 # Data Paths
 DATA_DIR = "data"
 HIKVISION_CSV = os.path.join(DATA_DIR, "my_hikvision_data.csv")
 SATEL_CSV = os.path.join(DATA_DIR, "my_satel_data.csv")
+# Optional cap on the number of Hikvision rows loaded (None loads the full catalog)
+HIKVISION_ROW_LIMIT = int(os.getenv("HIKVISION_ROW_LIMIT", "0")) or None
+VERDICT_CACHE_PATH = os.path.join(DATA_DIR, "verdict_cache.sqlite")
 
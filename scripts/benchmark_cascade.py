@@ -0,0 +1,95 @@
+"""
+Cascade pre-screen benchmark
+
+Runs the product analysis twice on the same products and questions: once sending
+every product to the LLM, once with the embedding pre-screen (cascade) enabled.
+Reports the LLM calls saved and how often both runs agree on the verdict.
+
+Usage (from the project root):
+    python -m scripts.benchmark_cascade --products 30
+"""
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+from langchain.embeddings import HuggingFaceEmbeddings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import SATEL_CSV, EMBEDDING_MODEL_NAME, EMBEDDING_DEVICE
+from src.models.llm import get_llm
+from src.retrievers.index_creation import process_product_batch_satel, process_product_batch_pdf_satel
+from src.retrievers.product_analysis import analyze_selected_products
+
+QUESTIONS = [
+    "Est-ce que le produit est un détecteur sans fil ?",
+    "Le produit fonctionne-t-il en extérieur ?",
+    "Est-ce une centrale d'alarme certifiée Grade 3 ?",
+    "Le produit possède-t-il une sirène intégrée ?",
+    "Le produit est-il compatible avec le système ABAX 2 ?",
+]
+
+
+class CountingLLM:
+    """Wrap an LLM and count the calls that actually reach it."""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.model_name = getattr(llm, "model_name", "llm")
+        self.temperature = getattr(llm, "temperature", "")
+        self.calls = 0
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        return self.llm.invoke(prompt, **kwargs)
+
+
+def run(llm, query, codes, specs_index, specs_index_pdf, embedding_model, cascade):
+    counting = CountingLLM(llm)
+    start = time.time()
+    rows = analyze_selected_products(
+        query, codes, counting, specs_index, specs_index_pdf,
+        cascade=cascade, embedding_model=embedding_model
+    )
+    return rows, counting.calls, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=30, help="Number of Satel products to analyze")
+    args = parser.parse_args()
+
+    df = pd.read_csv(SATEL_CSV).drop_duplicates("product_code").head(args.products)
+    embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME, model_kwargs={'device': EMBEDDING_DEVICE})
+    print(f"Building indices for {len(df)} products...")
+    specs_index = process_product_batch_satel(df, embedding_model)
+    specs_index_pdf = process_product_batch_pdf_satel(df, embedding_model)
+    codes = df["product_code"].tolist()
+    llm = get_llm()
+
+    summary = []
+    for query in QUESTIONS:
+        full_rows, full_calls, full_time = run(llm, query, codes, specs_index, specs_index_pdf, embedding_model, cascade=False)
+        cascade_rows, cascade_calls, cascade_time = run(llm, query, codes, specs_index, specs_index_pdf, embedding_model, cascade=True)
+
+        agree = sum(a["correspond"] == b["correspond"] for a, b in zip(full_rows, cascade_rows))
+        summary.append({
+            "question": query,
+            "llm_calls_full": full_calls,
+            "llm_calls_cascade": cascade_calls,
+            "calls_saved_%": round(100 * (full_calls - cascade_calls) / full_calls, 1) if full_calls else 0.0,
+            "agreement_%": round(100 * agree / len(codes), 1),
+            "time_full_s": round(full_time, 1),
+            "time_cascade_s": round(cascade_time, 1),
+        })
+        print(f"✓ {query}: {full_calls} -> {cascade_calls} calls, {agree}/{len(codes)} verdicts agree")
+
+    df_summary = pd.DataFrame(summary)
+    print("\n" + df_summary.to_string(index=False))
+    print(f"\nTotal LLM calls: {df_summary['llm_calls_full'].sum()} -> {df_summary['llm_calls_cascade'].sum()}")
+    print(f"Mean agreement: {df_summary['agreement_%'].mean():.1f}%")
+
+
+if __name__ == "__main__":
+    main()
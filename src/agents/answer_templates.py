@@ -0,0 +1,152 @@
+"""
+Templated answers for results the tools compute themselves.
+
+Equipment totals (planning, daily report, merged reports) are already final
+when the tool has them; asking the LLM to "format this list" only adds a round
+trip. They are rendered with French or English templates, chosen from the
+language of the question. AGENT_LLM_POLISH turns an LLM rewording of the
+rendered text back on.
+"""
+import re
+from config.settings import AGENT_LLM_POLISH
+from src.agents.date_parser import normalize_text, MONTHS
+from src.models.llm import invoke_llm
+
+_FRENCH_WORDS = {
+    "le", "la", "les", "des", "du", "au", "aux", "quel", "quels", "quelle", "quelles", "combien", "pour",
+    "est", "sont", "ont", "installe", "installes", "installee", "installees", "retourne", "retournes",
+    "equipement", "equipements", "materiel", "chez", "donne", "moi", "liste", "prevu", "prevus", "hier",
+    "aujourd'hui", "demain", "mois", "semaine", "qui", "quoi", "utilise", "utilises",
+}
+_ENGLISH_WORDS = {
+    "the", "what", "which", "how", "many", "much", "is", "are", "was", "were", "for", "installed", "returned",
+    "equipment", "list", "show", "planned", "yesterday", "today", "tomorrow", "month", "week", "who", "used",
+    "give", "me", "all", "total",
+}
+
+TEMPLATES = {
+    "fr": {
+        "planned": "Équipements prévus{scope}",
+        "installed": "Équipements installés{scope}",
+        "returned": "Équipements retournés{scope}",
+        "on_date": " le {date}",
+        "item": "• {name} : {count}",
+        "total": "Total : {total} ({kinds} types d'équipement)",
+        "records": "Basé sur {records} entrées de rapport.",
+        "filters": "Critères : {filters}",
+        "period": "période du {start} au {end}",
+        "month": "mois {month}",
+        "year": "année {year}",
+        "client": "client {value}",
+        "site_manager": "chef de chantier {value}",
+        "equipment_type": "équipement {value}",
+        "none": "Aucune information d'équipement trouvée{scope}.",
+    },
+    "en": {
+        "planned": "Planned equipment{scope}",
+        "installed": "Equipment installed{scope}",
+        "returned": "Equipment returned{scope}",
+        "on_date": " on {date}",
+        "item": "• {name}: {count}",
+        "total": "Total: {total} ({kinds} equipment types)",
+        "records": "Based on {records} report entries.",
+        "filters": "Criteria: {filters}",
+        "period": "period {start} to {end}",
+        "month": "month {month}",
+        "year": "year {year}",
+        "client": "client {value}",
+        "site_manager": "site manager {value}",
+        "equipment_type": "equipment {value}",
+        "none": "No equipment information found{scope}.",
+    },
+}
+
+polish_prompt = """Rewrite this answer to the user's question in a natural, professional tone, in the language of the question.
+Keep every item, number and date exactly as given. Do not add information.
+
+User Question: {question}
+
+Answer:
+{answer}"""
+
+
+def detect_language(query: str) -> str:
+    """"fr" or "en", from the function words of the question (French when undecided)."""
+    words = re.findall(r"[a-z']+", normalize_text(query))
+    french = sum(word in _FRENCH_WORDS for word in words)
+    english = sum(word in _ENGLISH_WORDS for word in words)
+    return "en" if english > french else "fr"
+
+
+def describe_filters(filters: dict, language: str) -> str:
+    """Human-readable summary of the merged-search filters applied."""
+    templates = TEMPLATES[language]
+    parts = []
+    date_range = filters.get("date_range")
+    if isinstance(date_range, dict) and (date_range.get("start") or date_range.get("end")):
+        parts.append(templates["period"].format(start=date_range.get("start") or "…", end=date_range.get("end") or "…"))
+    if filters.get("month"):
+        month = str(filters["month"])
+        if not month.isdigit():
+            month = MONTHS.get(normalize_text(month), month)
+        parts.append(templates["month"].format(month=month))
+    if filters.get("year"):
+        parts.append(templates["year"].format(year=filters["year"]))
+    for field in ("client", "site_manager", "equipment_type"):
+        if filters.get(field):
+            parts.append(templates[field].format(value=filters[field]))
+    return ", ".join(parts)
+
+
+def render_equipment_totals(query: str, sections: list, date_info: str = None, records: int = None,
+                            filters: dict = None, by_count: bool = False) -> str:
+    """
+    Render equipment totals as a list answer.
+
+    Args:
+        query: User question (selects the template language)
+        sections: (kind, totals) pairs, kind in "planned", "installed", "returned"
+        date_info: Day the totals are for, if a single day
+        records: Number of report rows the totals come from
+        filters: Merged-search filters, summarized under the list
+        by_count: Sort items by decreasing count instead of by name
+
+    Returns:
+        Answer text
+    """
+    language = detect_language(query)
+    templates = TEMPLATES[language]
+    scope = templates["on_date"].format(date=date_info) if date_info else ""
+
+    blocks = []
+    for kind, totals in sections:
+        if not totals:
+            continue
+        items = sorted(totals.items(), key=(lambda item: (-item[1], item[0])) if by_count else None)
+        lines = [templates[kind].format(scope=scope) + (" :" if language == "fr" else ":")]
+        lines += [templates["item"].format(name=name, count=count) for name, count in items]
+        lines.append(templates["total"].format(total=sum(totals.values()), kinds=len(totals)))
+        blocks.append("\n".join(lines))
+
+    if not blocks:
+        return templates["none"].format(scope=scope)
+
+    footer = []
+    if filters:
+        described = describe_filters(filters, language)
+        if described:
+            footer.append(templates["filters"].format(filters=described))
+    if records is not None:
+        footer.append(templates["records"].format(records=records))
+    return "\n\n".join(blocks + (["\n".join(footer)] if footer else []))
+
+
+def finish_answer(query: str, answer: str, llm=None) -> str:
+    """Return a rendered answer, reworded by the LLM only when AGENT_LLM_POLISH is on."""
+    if not AGENT_LLM_POLISH or llm is None:
+        return answer
+    try:
+        return invoke_llm(llm, polish_prompt.format(question=query, answer=answer)).strip()
+    except Exception as e:
+        print(f"Answer polish failed, returning the template: {e}")
+        return answer
@@ -0,0 +1,164 @@
+"""
+Shared resources of the technician agent.
+
+The LLM, the embedding model, the Google Drive client, the sheet mirror and the
+technician directory are created on first use instead of at import time, so the app starts
+without paying for them. Every resource is built once even when several threads
+ask for it at the same time, and warm_up() can build them (including the
+technician index) in the background.
+"""
+import os
+import threading
+import pandas as pd
+from pydrive.auth import GoogleAuth
+from pydrive.drive import GoogleDrive
+from langchain.embeddings import HuggingFaceEmbeddings
+from config.settings import EMBEDDING_MODEL_NAME, EMBEDDING_DEVICE, SHEET_SOURCE
+from src.models.llm import get_llm
+from src.agents.data_sources import SheetMirror, create_source
+from src.agents.technician_index import TechnicianDirectory
+
+# Google Drive credentials (should be in project root)
+CLIENT_SECRETS_FILE = "client_secrets.json"
+CREDENTIALS_FILE = "credentials.json"
+
+
+def authenticate_drive() -> GoogleDrive:
+    """Authenticate with Google Drive, running the browser flow on first use only."""
+    gauth = GoogleAuth()
+
+    # Load client secrets if it exists
+    if os.path.exists(CLIENT_SECRETS_FILE):
+        gauth.LoadClientConfigFile(CLIENT_SECRETS_FILE)
+
+    # Load or create credentials
+    if os.path.exists(CREDENTIALS_FILE):
+        gauth.LoadCredentialsFile(CREDENTIALS_FILE)
+    else:
+        # First time: need client_secrets.json to authenticate
+        if not os.path.exists(CLIENT_SECRETS_FILE):
+            raise FileNotFoundError(
+                f"client_secrets.json not found in project root. "
+                f"Please download it from Google Cloud Console and place it in the project root directory. "
+                f"See SETUP_INSTRUCTIONS.md for details."
+            )
+        gauth.LocalWebserverAuth()
+        gauth.SaveCredentialsFile(CREDENTIALS_FILE)
+
+    if gauth.credentials is None:
+        gauth.LocalWebserverAuth()
+    elif gauth.access_token_expired:
+        gauth.Refresh()
+    else:
+        gauth.Authorize()
+
+    gauth.SaveCredentialsFile(CREDENTIALS_FILE)
+    return GoogleDrive(gauth)
+
+
+class TechnicianAgentContext:
+    """
+    Lazily created resources shared by the technician tools.
+
+    Each resource has its own lock, so a slow Drive authentication never blocks
+    a tool that only needs the LLM.
+    """
+
+    def __init__(self, embedding_model=None):
+        self._resources = {}
+        if embedding_model is not None:
+            self._resources["embedding_model"] = embedding_model
+        self._locks = {name: threading.Lock() for name in ("llm", "embedding_model", "drive", "sheets", "technicians")}
+        self._warmup_thread = None
+        self._warmup_lock = threading.Lock()
+
+    def _get(self, name: str, factory):
+        value = self._resources.get(name)
+        if value is not None:
+            return value
+        with self._locks[name]:
+            value = self._resources.get(name)
+            if value is None:
+                value = factory()
+                self._resources[name] = value
+        return value
+
+    def is_loaded(self, name: str) -> bool:
+        """Return whether a resource has already been created."""
+        return name in self._resources
+
+    @property
+    def llm(self):
+        return self._get("llm", get_llm)
+
+    @property
+    def embedding_model(self):
+        return self._get("embedding_model", lambda: HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL_NAME,
+            model_kwargs={'device': EMBEDDING_DEVICE}
+        ))
+
+    @property
+    def drive(self) -> GoogleDrive:
+        return self._get("drive", authenticate_drive)
+
+    @property
+    def sheets(self) -> SheetMirror:
+        """Local mirror of the planning, daily report and technician sheets."""
+        return self._get("sheets", lambda: SheetMirror(create_source(lambda: self.drive)))
+
+    @property
+    def technicians(self) -> TechnicianDirectory:
+        return self._get("technicians", lambda: TechnicianDirectory(self))
+
+    @property
+    def df_technicien(self) -> pd.DataFrame:
+        """Current technician sheet (checked for changes, see TechnicianDirectory)."""
+        self.technicians.refresh()
+        return self.technicians.df
+
+    def use_embedding_model(self, embedding_model):
+        """Share an already loaded embedding model unless one was created already."""
+        with self._locks["embedding_model"]:
+            self._resources.setdefault("embedding_model", embedding_model)
+
+    def warm_up(self, background: bool = True):
+        """
+        Create every resource ahead of the first question.
+
+        Drive is only contacted when saved credentials exist (or the sheets come
+        from a local directory), so a warm-up never opens the interactive
+        browser login. Calling it again while (or after)
+        a warm-up ran does nothing.
+        """
+        with self._warmup_lock:
+            if self._warmup_thread is not None:
+                return
+            self._warmup_thread = threading.Thread(target=self._warm_up, name="agent-warmup", daemon=True)
+            if background:
+                self._warmup_thread.start()
+        if not background:
+            self._warmup_thread.run()
+
+    def _warm_up(self):
+        try:
+            self.llm
+            self.embedding_model
+            if SHEET_SOURCE == "local" or os.path.exists(CREDENTIALS_FILE):
+                self.technicians.search("technicien", k=1)
+            print("✓ Technician agent warmed up")
+        except Exception as e:
+            print(f"Technician agent warm-up failed: {e}")
+
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def get_agent_context() -> TechnicianAgentContext:
+    """Return the process-wide technician agent context."""
+    global _context
+    with _context_lock:
+        if _context is None:
+            _context = TechnicianAgentContext()
+        return _context
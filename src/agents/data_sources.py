@@ -0,0 +1,397 @@
+"""
+Data sources of the technician agent and their local mirror.
+
+Sheets (technician directory, planning, daily reports) come from a source
+backend: Google Drive, or a local directory of CSV files (handy without Google
+access). SheetMirror keeps a copy of every sheet in a local SQLite database and
+only downloads the sheets whose modified date changed since the last sync, so
+the tools query the mirror instead of Drive.
+
+Local directory layout: a single sheet is `<root>/<file_id>.csv`, the sheets of
+a folder are `<root>/<folder_id>/<title>.csv` (file id `<folder_id>/<title>`).
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from io import StringIO
+import pandas as pd
+from pydrive.auth import GoogleAuth, RefreshError
+from pydrive.drive import GoogleDrive
+from src.utils.singleflight import SingleFlight
+from config.settings import (
+    SHEET_SOURCE, LOCAL_SHEETS_DIR, SHEET_MIRROR_PATH, SHEET_MIRROR_SYNC_INTERVAL,
+    SHEET_SYNC_MAX_WORKERS, SHEET_SYNC_RETRIES, SHEET_SYNC_BACKOFF
+)
+
+SPREADSHEET_MIMETYPE = "application/vnd.google-apps.spreadsheet"
+
+# Name prefix of the parallel download threads (never start an interactive Drive login)
+SYNC_THREAD_PREFIX = "sheet-sync"
+
+
+class DriveSource:
+    """
+    Google Drive spreadsheets, exported as CSV.
+
+    The HTTP connection of a Drive client cannot be shared between threads, so
+    each thread gets its own client authorized with the shared credentials.
+    An expired token is refreshed by one thread at a time; the interactive
+    browser flow is only started from the app thread, never from the parallel
+    download threads.
+    """
+
+    def __init__(self, drive_getter):
+        self._drive_getter = drive_getter
+        self._local = threading.local()
+        self._auth_lock = threading.Lock()
+
+    def _refresh(self, auth):
+        with self._auth_lock:
+            # Another loader thread may have refreshed the token meanwhile
+            if not auth.credentials.access_token_expired:
+                return
+            try:
+                auth.Refresh()
+                return
+            except RefreshError as e:
+                if threading.current_thread().name.startswith(SYNC_THREAD_PREFIX):
+                    raise RefreshError(f"Drive token could not be refreshed, re-authenticate from the app: {e}") from e
+            auth.LocalWebserverAuth()
+
+    @property
+    def drive(self):
+        drive = self._drive_getter()
+        if drive.auth.credentials.access_token_expired:
+            self._refresh(drive.auth)
+
+        local = getattr(self._local, "client", None)
+        if local is None or local[0] is not drive.auth.credentials:
+            gauth = GoogleAuth()
+            gauth.credentials = drive.auth.credentials
+            gauth.Authorize()
+            local = (drive.auth.credentials, GoogleDrive(gauth))
+            self._local.client = local
+        return local[1]
+
+    def list_folder(self, folder_id: str) -> list:
+        """Return {id, title, modified} for every spreadsheet of a folder."""
+        query_files = f"'{folder_id}' in parents and mimeType='{SPREADSHEET_MIMETYPE}'"
+        file_list = self.drive.ListFile({'q': query_files}).GetList()
+        return [{'id': file['id'], 'title': file['title'], 'modified': file['modifiedDate']} for file in file_list]
+
+    def file_info(self, file_id: str) -> dict:
+        """Return {id, title, modified} of one spreadsheet."""
+        file = self.drive.CreateFile({'id': file_id})
+        file.FetchMetadata(fields='title,modifiedDate')
+        return {'id': file_id, 'title': file['title'], 'modified': file['modifiedDate']}
+
+    def read_sheet(self, file_id: str) -> pd.DataFrame:
+        file = self.drive.CreateFile({'id': file_id})
+        csv_content = file.GetContentString(mimetype='text/csv')
+        return pd.read_csv(StringIO(csv_content))
+
+
+class LocalDirectorySource:
+    """CSV files on disk, laid out like the Drive folders (see module docstring)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, file_id: str) -> str:
+        return os.path.join(self.root, f"{file_id}.csv")
+
+    @staticmethod
+    def _modified(path: str) -> str:
+        return datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc).isoformat()
+
+    def list_folder(self, folder_id: str) -> list:
+        directory = os.path.join(self.root, folder_id)
+        if not os.path.isdir(directory):
+            return []
+        files = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".csv"):
+                title = name[:-len(".csv")]
+                files.append({
+                    'id': f"{folder_id}/{title}",
+                    'title': title,
+                    'modified': self._modified(os.path.join(directory, name))
+                })
+        return files
+
+    def file_info(self, file_id: str) -> dict:
+        path = self._path(file_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Sheet not found: {path}")
+        return {'id': file_id, 'title': os.path.basename(file_id), 'modified': self._modified(path)}
+
+    def read_sheet(self, file_id: str) -> pd.DataFrame:
+        return pd.read_csv(self._path(file_id))
+
+
+def _table_name(file_id: str) -> str:
+    return "sheet_" + hashlib.sha1(file_id.encode("utf-8")).hexdigest()[:16]
+
+
+class SheetMirror:
+    """
+    Local SQLite copy of the agent's sheets, synced by modified date.
+
+    Each sheet is stored in its own table; the `files` table records the folder,
+    title and modified date of every mirrored sheet. Folders and single sheets are
+    checked against the source at most every `sync_interval` seconds, and the last
+    mirrored copy is served when the source cannot be reached. Changed sheets are
+    downloaded concurrently by up to `max_workers` threads, each retried
+    `retries` times with exponential backoff.
+    """
+
+    def __init__(self, source, path: str = SHEET_MIRROR_PATH, sync_interval: float = SHEET_MIRROR_SYNC_INTERVAL,
+                 max_workers: int = SHEET_SYNC_MAX_WORKERS, retries: int = SHEET_SYNC_RETRIES,
+                 backoff: float = SHEET_SYNC_BACKOFF):
+        self.source = source
+        self.path = path
+        self.sync_interval = sync_interval
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                file_id TEXT PRIMARY KEY,
+                folder_id TEXT,
+                title TEXT,
+                modified TEXT,
+                table_name TEXT,
+                row_count INTEGER,
+                synced_at REAL
+            )
+        """)
+        self._conn.commit()
+        self._last_checked = {}
+        self._frames = {}
+        # Callers arriving while a sync runs wait for it instead of reading a stale mirror
+        self._flight = SingleFlight("sheet_mirror")
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _due(self, key: str) -> bool:
+        last = self._last_checked.get(key)
+        return last is None or time.monotonic() - last >= self.sync_interval
+
+    def _mirrored(self, folder_id: str = None) -> dict:
+        if folder_id is None:
+            cursor = self._conn.execute("SELECT file_id, folder_id, title, modified FROM files")
+        else:
+            cursor = self._conn.execute(
+                "SELECT file_id, folder_id, title, modified FROM files WHERE folder_id = ?", (folder_id,)
+            )
+        return {file_id: {'id': file_id, 'folder_id': folder, 'title': title, 'modified': modified}
+                for file_id, folder, title, modified in cursor}
+
+    def _store(self, info: dict, folder_id: str, df: pd.DataFrame):
+        table = _table_name(info['id'])
+        with self._lock:
+            df.to_sql(table, self._conn, if_exists="replace", index=False)
+            self._conn.execute(
+                """INSERT OR REPLACE INTO files (file_id, folder_id, title, modified, table_name, row_count, synced_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (info['id'], folder_id, info['title'], info['modified'], table, len(df), time.time())
+            )
+            self._conn.commit()
+            self._frames[info['id']] = (info['modified'], df)
+
+    def _remove(self, file_id: str):
+        with self._lock:
+            self._conn.execute(f'DROP TABLE IF EXISTS "{_table_name(file_id)}"')
+            self._conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+            self._conn.commit()
+            self._frames.pop(file_id, None)
+
+    def _read(self, file_id: str, modified: str) -> pd.DataFrame:
+        cached = self._frames.get(file_id)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+        with self._lock:
+            try:
+                df = pd.read_sql_query(f'SELECT * FROM "{_table_name(file_id)}"', self._conn)
+            except Exception:
+                df = pd.DataFrame()
+            self._frames[file_id] = (modified, df)
+        return df
+
+    def _fetch(self, info: dict, folder_id: str) -> float:
+        """
+        Download one sheet from the source into the mirror, retrying with backoff.
+
+        Returns:
+            Seconds spent, retries included
+        """
+        start = time.monotonic()
+        for attempt in range(self.retries + 1):
+            try:
+                df = self.source.read_sheet(info['id'])
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                print(f"Retrying {info['title']} in {delay:.1f}s ({e})")
+                time.sleep(delay)
+
+        self._store(info, folder_id, df)
+        elapsed = time.monotonic() - start
+        print(f"✓ Mirrored {info['title']} ({len(df)} rows, {elapsed:.2f}s)")
+        return elapsed
+
+    def _fetch_many(self, files: list, folder_id: str) -> tuple:
+        """
+        Download several sheets on a bounded thread pool.
+
+        Each sheet is stored in the mirror as soon as it arrives.
+
+        Returns:
+            (latencies, failed): seconds per file title, number of files that failed
+        """
+        latencies = {}
+        failed = 0
+        if not files:
+            return latencies, failed
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(files))),
+                                thread_name_prefix=SYNC_THREAD_PREFIX) as executor:
+            futures = {executor.submit(self._fetch, info, folder_id): info for info in files}
+            for future in as_completed(futures):
+                info = futures[future]
+                try:
+                    latencies[info['title']] = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"✗ Error mirroring {info['title']}: {e}")
+
+        slowest = ", ".join(f"{title} {seconds:.2f}s" for title, seconds in
+                            sorted(latencies.items(), key=lambda item: item[1], reverse=True)[:3])
+        print(f"✓ Fetched {len(latencies)}/{len(files)} files in {time.monotonic() - start:.1f}s"
+              + (f" (slowest: {slowest})" if slowest else ""))
+        return latencies, failed
+
+    # -- sync --------------------------------------------------------------
+
+    def sync_folder(self, folder_id: str, force: bool = False) -> dict:
+        """
+        Bring the mirror of a folder up to date.
+
+        Only new sheets and sheets whose modified date changed are downloaded;
+        sheets removed from the folder are dropped.
+
+        Returns:
+            Dictionary with the number of files fetched, unchanged, removed and
+            failed, plus the download seconds per file title ("latencies")
+        """
+        return self._flight.do(f"folder\x1f{folder_id}", lambda: self._sync_folder(folder_id, force))
+
+    def _sync_folder(self, folder_id: str, force: bool) -> dict:
+        with self._lock:
+            if not force and not self._due(folder_id):
+                return {"fetched": 0, "unchanged": 0, "removed": 0, "failed": 0, "latencies": {}}
+            self._last_checked[folder_id] = time.monotonic()
+            mirrored = self._mirrored(folder_id)
+
+        remote = self.source.list_folder(folder_id)
+        changed = [info for info in remote if mirrored.get(info['id'], {}).get('modified') != info['modified']]
+        removed = set(mirrored) - {info['id'] for info in remote}
+
+        latencies, failed = self._fetch_many(changed, folder_id)
+        for file_id in removed:
+            self._remove(file_id)
+
+        return {
+            "fetched": len(changed) - failed,
+            "unchanged": len(remote) - len(changed),
+            "removed": len(removed),
+            "failed": failed,
+            "latencies": latencies
+        }
+
+    def sync_sheet(self, file_id: str, force: bool = False):
+        """Bring the mirror of one sheet up to date."""
+        return self._flight.do(f"sheet\x1f{file_id}", lambda: self._sync_sheet(file_id, force))
+
+    def _sync_sheet(self, file_id: str, force: bool):
+        with self._lock:
+            if not force and not self._due(file_id):
+                return
+            self._last_checked[file_id] = time.monotonic()
+            known = self._mirrored().get(file_id)
+
+        info = self.source.file_info(file_id)
+        if known is None or known['modified'] != info['modified']:
+            self._fetch(info, known['folder_id'] if known else None)
+
+    # -- queries -----------------------------------------------------------
+
+    def list_folder(self, folder_id: str) -> pd.DataFrame:
+        """
+        Return the mirrored sheets of a folder, syncing it first when due.
+
+        Returns:
+            DataFrame with columns id, title, modified
+        """
+        try:
+            self.sync_folder(folder_id)
+        except Exception as e:
+            print(f"Could not sync folder {folder_id}, using the local mirror: {e}")
+        with self._lock:
+            files = list(self._mirrored(folder_id).values())
+        return pd.DataFrame(files, columns=['id', 'folder_id', 'title', 'modified']).drop(columns='folder_id')
+
+    def get_sheet(self, file_id: str) -> pd.DataFrame:
+        """Return a copy of a sheet, syncing it first when due (empty DataFrame if unknown)."""
+        try:
+            self.sync_sheet(file_id)
+        except Exception as e:
+            print(f"Could not sync sheet {file_id}, using the local mirror: {e}")
+        with self._lock:
+            known = self._mirrored().get(file_id)
+        if known is None:
+            return pd.DataFrame()
+        return self._read(file_id, known['modified']).copy()
+
+    def sheet_version(self, file_id: str):
+        """Modified date of the mirrored copy of a sheet (None if not mirrored)."""
+        with self._lock:
+            known = self._mirrored().get(file_id)
+        return known['modified'] if known else None
+
+    def read(self, file_id: str) -> pd.DataFrame:
+        """Return the mirrored copy of a sheet without syncing (the cached frame, do not modify)."""
+        with self._lock:
+            known = self._mirrored().get(file_id)
+        if known is None:
+            return pd.DataFrame()
+        return self._read(file_id, known['modified'])
+
+    def load_folder(self, folder_id: str) -> list:
+        """
+        Return (file info, DataFrame copy) for every mirrored sheet of a folder.
+
+        The folder is synced first when due.
+        """
+        files = self.list_folder(folder_id)
+        return [(info, self._read(info['id'], info['modified']).copy()) for info in files.to_dict("records")]
+
+
+def create_source(drive_getter=None):
+    """Build the sheet source selected by SHEET_SOURCE ("drive" or "local")."""
+    if SHEET_SOURCE == "local":
+        return LocalDirectorySource(LOCAL_SHEETS_DIR)
+    return DriveSource(drive_getter)
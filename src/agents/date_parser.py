@@ -0,0 +1,339 @@
+"""
+Rule-based date extraction for the technician agent.
+
+Turns French or English phrasings ("le 12 août", "hier", "last monday",
+"du 1 au 15 juillet", "12/08/2025", "la semaine dernière") into a date or a
+date range without calling the LLM. The LLM is only used as a fallback by
+extract_date_ddmmyyyy when no rule matches, and its answer is validated.
+
+The corpus of technician phrasings the parser is checked against is in
+tests/test_date_parser.py.
+"""
+import calendar
+import re
+import unicodedata
+from datetime import date, datetime, timedelta
+from typing import NamedTuple, Optional
+from langchain.prompts import PromptTemplate
+from src.models.llm import invoke_llm
+
+NO_DATE = "NO_DATE"
+
+MONTHS = {
+    "janvier": 1, "january": 1, "janv": 1, "jan": 1,
+    "fevrier": 2, "february": 2, "fevr": 2, "fev": 2, "feb": 2,
+    "mars": 3, "march": 3, "mar": 3,
+    "avril": 4, "april": 4, "avr": 4, "apr": 4,
+    "mai": 5, "may": 5,
+    "juin": 6, "june": 6, "jun": 6,
+    "juillet": 7, "july": 7, "juil": 7, "jul": 7,
+    "aout": 8, "august": 8, "aug": 8,
+    "septembre": 9, "september": 9, "sept": 9, "sep": 9,
+    "octobre": 10, "october": 10, "oct": 10,
+    "novembre": 11, "november": 11, "nov": 11,
+    "decembre": 12, "december": 12, "dec": 12,
+}
+
+# Month names accepted without a day next to them ("en juillet", "in august 2025")
+FULL_MONTHS = {
+    name: number for name, number in MONTHS.items()
+    if len(name) > 4 or name in ("mars", "mai", "juin", "june", "july", "may", "aout")
+}
+
+WEEKDAYS = {
+    "lundi": 0, "monday": 0, "mardi": 1, "tuesday": 1, "mercredi": 2, "wednesday": 2,
+    "jeudi": 3, "thursday": 3, "vendredi": 4, "friday": 4, "samedi": 5, "saturday": 5,
+    "dimanche": 6, "sunday": 6,
+}
+
+NUMBER_WORDS = {
+    "un": 1, "une": 1, "one": 1, "deux": 2, "two": 2, "trois": 3, "three": 3, "quatre": 4, "four": 4,
+    "cinq": 5, "five": 5, "six": 6, "sept": 7, "seven": 7, "huit": 8, "eight": 8, "neuf": 9, "nine": 9,
+    "dix": 10, "ten": 10, "quinze": 15, "fifteen": 15, "trente": 30, "thirty": 30,
+}
+
+_MONTH = "(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+_FULL_MONTH = "(" + "|".join(sorted(FULL_MONTHS, key=len, reverse=True)) + ")"
+_DAY = r"(\d{1,2})(?:er|eme|st|nd|rd|th)?"
+_YEAR = r"(\d{4})"
+_NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + ")"
+_WEEKDAY = "(" + "|".join(WEEKDAYS) + ")"
+
+# Full dates; each pattern maps its groups to (day, month, year)
+_DATE_PATTERNS = [
+    (re.compile(r"\b" + _YEAR + r"[-/.](\d{1,2})[-/.](\d{1,2})\b"), lambda g: (g[2], g[1], g[0])),
+    (re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4}|\d{2})\b"), lambda g: (g[0], g[1], g[2])),
+    (re.compile(r"\b" + _DAY + r"\s+(?:de\s+|of\s+)?" + _MONTH + r"(?:,?\s+" + _YEAR + r")?\b"),
+     lambda g: (g[0], g[1], g[2])),
+    (re.compile(r"\b" + _MONTH + r"\s+" + _DAY + r"(?:,?\s+" + _YEAR + r")?\b"), lambda g: (g[1], g[0], g[2])),
+    (re.compile(r"\b(\d{1,2})/(\d{1,2})\b(?!/)"), lambda g: (g[0], g[1], None)),
+]
+
+_RANGE_CONNECTOR = re.compile(r"^\s*(?:au|a|to|until|till|through|jusqu'au|jusqu'a|et|and|-|–)\s*(?:le\s+|the\s+)?$")
+# "du 1 au 15 août": the start day borrows the month (and year) of the end date
+_PARTIAL_RANGE = re.compile(
+    r"\b(?:du|from|between|entre(?:\s+le)?)\s+" + _DAY + r"\s+(?:au|to|and|et|-|–)\s+(?:le\s+|the\s+)?"
+    + _DAY + r"\s+(?:de\s+|of\s+)?" + _MONTH + r"(?:,?\s+" + _YEAR + r")?\b"
+)
+_MONTH_ALONE = re.compile(
+    r"\b(?:(?:en|in|de|of|du mois de|mois de|month of|during|pendant|durant|au mois de)\s+)?"
+    + _FULL_MONTH + r"(?:\s+" + _YEAR + r")?\b"
+)
+_YEAR_ALONE = re.compile(r"\b(?:en|in|annee|year|during|pendant|durant)\s+(\d{4})\b")
+
+
+class DateRange(NamedTuple):
+    """Inclusive range of days found in a question."""
+    start: date
+    end: date
+
+    @property
+    def is_single_day(self) -> bool:
+        return self.start == self.end
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case, strip accents and unify apostrophes and dashes."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.replace("’", "'").replace("‑", "-").split())
+
+
+def _year(value, today: date) -> int:
+    if not value:
+        return today.year
+    year = int(value)
+    return year + 2000 if year < 100 else year
+
+
+def _month(value) -> int:
+    if value.isdigit():
+        return int(value)
+    return MONTHS[value.rstrip(".")]
+
+
+def _month_range(year: int, month: int) -> DateRange:
+    return DateRange(date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1]))
+
+
+def _number(value: str) -> int:
+    return int(value) if value.isdigit() else NUMBER_WORDS[value]
+
+
+def find_dates(text: str, today: date = None) -> list:
+    """
+    Find the full dates (day, month, optional year) mentioned in a question.
+
+    Returns:
+        List of (start, end, date) for each valid date, in order of appearance
+    """
+    today = today or date.today()
+    text = normalize_text(text)
+    found = []
+    taken = []
+    for pattern, fields in _DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            if any(match.start() < end and start < match.end() for start, end in taken):
+                continue
+            day, month, year = fields(match.groups())
+            try:
+                value = date(_year(year, today), _month(month), int(day))
+            except (ValueError, KeyError):
+                continue
+            taken.append((match.start(), match.end()))
+            found.append((match.start(), match.end(), value))
+    return sorted(found)
+
+
+def _relative(text: str, today: date, weekday: str = "past") -> Optional[DateRange]:
+    """Relative phrasings: hier, last week, il y a 3 jours, lundi dernier..."""
+    def day(offset: int) -> DateRange:
+        value = today + timedelta(days=offset)
+        return DateRange(value, value)
+
+    def week(offset: int) -> DateRange:
+        monday = today - timedelta(days=today.weekday()) + timedelta(weeks=offset)
+        return DateRange(monday, monday + timedelta(days=6))
+
+    def month(offset: int) -> DateRange:
+        index = today.year * 12 + today.month - 1 + offset
+        return _month_range(index // 12, index % 12 + 1)
+
+    def year(offset: int) -> DateRange:
+        return DateRange(date(today.year + offset, 1, 1), date(today.year + offset, 12, 31))
+
+    rules = [
+        (r"\bavant[- ]hier\b|\bday before yesterday\b", lambda m: day(-2)),
+        (r"\bapres[- ]demain\b|\bday after tomorrow\b", lambda m: day(2)),
+        (r"\baujourd'?hui\b|\btoday\b|\bce jour\b|\btonight\b|\bce soir\b", lambda m: day(0)),
+        (r"\bhier\b|\byesterday\b", lambda m: day(-1)),
+        (r"\bdemain\b|\btomorrow\b", lambda m: day(1)),
+        (r"\bil y a " + _NUMBER + r" jours?\b|\b" + _NUMBER + r" days? ago\b",
+         lambda m: day(-_number(m.group(1) or m.group(2)))),
+        (r"\b(?:les|ces)\s+" + _NUMBER + r"\s+derniers\s+jours\b|\b(?:last|past)\s+" + _NUMBER + r"\s+days\b",
+         lambda m: DateRange(today - timedelta(days=_number(m.group(1) or m.group(2)) - 1), today)),
+        (r"\b(?:la\s+)?semaine\s+(?:derniere|passee)\b|\blast week\b|\bprevious week\b", lambda m: week(-1)),
+        (r"\b(?:la\s+)?semaine\s+prochaine\b|\bnext week\b", lambda m: week(1)),
+        (r"\bcette semaine\b|\bthis week\b", lambda m: week(0)),
+        (r"\bil y a " + _NUMBER + r" mois\b|\b" + _NUMBER + r" months? ago\b",
+         lambda m: month(-_number(m.group(1) or m.group(2)))),
+        (r"\b(?:le\s+)?mois\s+(?:dernier|passe|precedent)\b|\blast month\b|\bprevious month\b", lambda m: month(-1)),
+        (r"\b(?:le\s+)?mois\s+prochain\b|\bnext month\b", lambda m: month(1)),
+        (r"\bce mois(?:-ci)?\b|\bthis month\b", lambda m: month(0)),
+        (r"\bl'annee\s+(?:derniere|passee)\b|\blast year\b", lambda m: year(-1)),
+        (r"\bcette annee\b|\bthis year\b", lambda m: year(0)),
+    ]
+    for pattern, build in rules:
+        match = re.search(pattern, text)
+        if match:
+            return build(match)
+
+    match = re.search(r"\b(?:last|previous)\s+" + _WEEKDAY + r"\b|\b" + _WEEKDAY + r"\s+(?:dernier|passe)\b", text)
+    if match:
+        weekday = WEEKDAYS[match.group(1) or match.group(2)]
+        return day(-((today.weekday() - weekday - 1) % 7 + 1))
+    match = re.search(r"\bnext\s+" + _WEEKDAY + r"\b|\b" + _WEEKDAY + r"\s+prochain\b", text)
+    if match:
+        weekday = WEEKDAYS[match.group(1) or match.group(2)]
+        return day((weekday - today.weekday() - 1) % 7 + 1)
+    match = re.search(r"\b" + _WEEKDAY + r"\b", text)
+    if match:
+        # A bare weekday is the latest one for reports, the coming one for the planning (today included)
+        if weekday == "future":
+            return day((WEEKDAYS[match.group(1)] - today.weekday()) % 7)
+        return day(-((today.weekday() - WEEKDAYS[match.group(1)]) % 7))
+    return None
+
+
+def relative_date_range(text: str, today: date = None) -> Optional[DateRange]:
+    """Period of a relative phrasing only ("hier", "le mois dernier", "this month"), or None."""
+    return _relative(normalize_text(text), today or date.today())
+
+
+def parse_date_range(text: str, today: date = None, weekday: str = "past") -> Optional[DateRange]:
+    """
+    Extract the date or period a question is about.
+
+    Handles numeric dates (12/08/2025, 2025-08-12, 12-08-25), day + month names
+    in French or English with or without a year ("le 1er août", "August 12"),
+    ranges ("du 1 au 15 juillet", "from 01/08/2025 to 05/08/2025"), relative
+    dates ("hier", "il y a 3 jours", "last monday", "la semaine dernière",
+    "last 7 days") and whole months or years ("en juillet", "in 2025").
+    A missing year is the current one.
+
+    Args:
+        text: User question
+        today: Reference day for relative dates (defaults to today)
+        weekday: Direction of a bare weekday ("jeudi"): "past" for reports,
+            "future" for the planning
+
+    Returns:
+        DateRange (start == end for a single day), or None if no date was found
+    """
+    today = today or date.today()
+    normalized = normalize_text(text)
+
+    dates = find_dates(normalized, today)
+    if len(dates) >= 2:
+        (_, first_end, first), (second_start, _, second) = dates[0], dates[1]
+        if _RANGE_CONNECTOR.match(normalized[first_end:second_start]) and first <= second:
+            return DateRange(first, second)
+
+    match = _PARTIAL_RANGE.search(normalized)
+    if match:
+        start_day, end_day, month, year = match.groups()
+        try:
+            year, month = _year(year, today), _month(month)
+            start, end = date(year, month, int(start_day)), date(year, month, int(end_day))
+            if start <= end:
+                return DateRange(start, end)
+        except (ValueError, KeyError):
+            pass
+
+    if dates:
+        return DateRange(dates[0][2], dates[0][2])
+
+    relative = _relative(normalized, today, weekday)
+    if relative:
+        return relative
+
+    for match in _MONTH_ALONE.finditer(normalized):
+        has_context = match.group(0) != match.group(1) or match.group(2)
+        # "may"/"mars"/"march" are common words: only a month with a preposition or a year
+        if has_context or match.group(1) not in ("may", "mars", "march"):
+            return _month_range(_year(match.group(2), today), FULL_MONTHS[match.group(1)])
+
+    match = _YEAR_ALONE.search(normalized)
+    if match:
+        year = int(match.group(1))
+        return DateRange(date(year, 1, 1), date(year, 12, 31))
+    return None
+
+
+def parse_date(text: str, today: date = None, weekday: str = "past") -> Optional[date]:
+    """Extract a single day from a question (None if none, or if it names a longer period)."""
+    found = parse_date_range(text, today, weekday)
+    if found and found.is_single_day:
+        return found.start
+    return None
+
+
+def format_ddmmyyyy(value: date) -> str:
+    return value.strftime("%d-%m-%Y")
+
+
+def is_valid_ddmmyyyy(value: str) -> bool:
+    """Check that a string is an existing date in DD-MM-YYYY format."""
+    if not re.fullmatch(r"\d{2}-\d{2}-\d{4}", value.strip()):
+        return False
+    try:
+        datetime.strptime(value.strip(), "%d-%m-%Y")
+        return True
+    except ValueError:
+        return False
+
+
+date_extraction_prompt = PromptTemplate(
+    input_variables=["query", "today"],
+    template="""Extract the date from the query and return it in DD-MM-YYYY format.
+- Today is {today}.
+- If no date is found, return NO_DATE
+- Only return the date, nothing else.
+
+Query: {query}"""
+)
+
+
+def extract_date_ddmmyyyy(query: str, llm=None, today: date = None, weekday: str = "past") -> str:
+    """
+    Extract a single day from a question as DD-MM-YYYY.
+
+    The rule-based parser is tried first; the LLM is only asked when it finds
+    nothing, and an answer that is not a valid DD-MM-YYYY date counts as NO_DATE.
+    A question about a longer period ("la semaine dernière") returns NO_DATE
+    without asking the LLM.
+
+    Args:
+        query: User question
+        llm: Optional language model used as a fallback
+        today: Reference day for relative dates (defaults to today)
+        weekday: Direction of a bare weekday, "past" or "future" (see parse_date_range)
+
+    Returns:
+        Date string in DD-MM-YYYY format, or NO_DATE
+    """
+    today = today or date.today()
+    found = parse_date_range(query, today, weekday)
+    if found:
+        return format_ddmmyyyy(found.start) if found.is_single_day else NO_DATE
+    if llm is None:
+        return NO_DATE
+
+    raw_response = invoke_llm(llm, date_extraction_prompt.format(query=query, today=format_ddmmyyyy(today))).strip()
+    candidate = raw_response.replace("/", "-").replace(".", "-")
+    if is_valid_ddmmyyyy(candidate):
+        return candidate
+    if raw_response != NO_DATE:
+        print(f"Discarding malformed date from LLM: {raw_response!r}")
+    return NO_DATE
+
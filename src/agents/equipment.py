@@ -0,0 +1,119 @@
+"""
+Equipment ledger of the planning and daily report sheets.
+
+Equipment cells hold comma-separated "name: count" items. They are exploded
+once per sheet version into a long-format ledger
+(row, date, client, chef_chantier, equipment, qty, direction) with vectorized
+string operations, so installed / returned totals for any selection of rows are
+a groupby instead of a Python loop over the sheet.
+"""
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# Equipment columns of the daily reports and the direction they record
+REPORT_EQUIPMENT_COLUMNS = {"equipement_installee": "installed", "equipement_retour": "returned"}
+# Equipment column of the planning sheets
+PLANNING_EQUIPMENT_COLUMNS = {"equipment": "planned"}
+
+LEDGER_COLUMNS = ["row", "date", "client", "chef_chantier", "equipment", "qty", "direction"]
+
+_ITEM = r"^\s*(?P<equipment>[^:]*?)\s*:\s*(?P<qty>[+-]?\d+)\s*$"
+
+
+def parse_equipment_column(values: pd.Series) -> pd.DataFrame:
+    """
+    Explode "name: count, name: count" cells into one row per item.
+
+    Items without a count or with a non-integer count are skipped.
+
+    Returns:
+        DataFrame with columns row (index label of the cell), equipment, qty
+    """
+    items = values.dropna().astype(str).str.split(",").explode()
+    parsed = items.str.extract(_ITEM).dropna()
+    parsed = parsed[parsed["equipment"] != ""]
+    return pd.DataFrame({
+        "row": parsed.index,
+        "equipment": parsed["equipment"].values,
+        "qty": parsed["qty"].astype(int).values,
+    })
+
+
+def build_equipment_ledger(df: pd.DataFrame, columns: dict = None) -> pd.DataFrame:
+    """
+    Build the long-format equipment ledger of a sheet.
+
+    Args:
+        df: Planning or daily report rows
+        columns: Equipment column -> direction label (defaults to the daily report columns)
+
+    Returns:
+        DataFrame with LEDGER_COLUMNS; `row` is the index label in df
+    """
+    columns = REPORT_EQUIPMENT_COLUMNS if columns is None else columns
+    parts = []
+    for column, direction in columns.items():
+        if column not in df.columns:
+            continue
+        part = parse_equipment_column(df[column])
+        part["direction"] = direction
+        parts.append(part)
+
+    if not parts:
+        return pd.DataFrame(columns=LEDGER_COLUMNS)
+
+    ledger = pd.concat(parts, ignore_index=True)
+    for field in ("date", "client", "chef_chantier"):
+        ledger[field] = df[field].reindex(ledger["row"]).values if field in df.columns else None
+    return ledger[LEDGER_COLUMNS]
+
+
+def equipment_totals(ledger: pd.DataFrame, direction: str = None, rows=None) -> dict:
+    """
+    Total quantity per equipment.
+
+    Args:
+        ledger: Equipment ledger (see build_equipment_ledger)
+        direction: Keep only this direction ("installed", "returned", "planned")
+        rows: Keep only these source rows (index labels), e.g. the rows left by a filter
+
+    Returns:
+        Dictionary equipment -> total quantity
+    """
+    selected = ledger
+    if direction is not None:
+        selected = selected[selected["direction"] == direction]
+    if rows is not None:
+        selected = selected[selected["row"].isin(rows)]
+    return selected.groupby("equipment")["qty"].sum().astype(int).to_dict()
+
+
+class LedgerCache:
+    """Ledgers of the most recently used sheet versions."""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version, df: pd.DataFrame, columns: dict = None) -> pd.DataFrame:
+        """Return the ledger of a sheet, building it only for a new (key, version)."""
+        if version is None:
+            return build_equipment_ledger(df, columns)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        ledger = build_equipment_ledger(df, columns)
+        with self._lock:
+            self._entries[key] = (version, ledger)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return ledger
+
+
+ledger_cache = LedgerCache()
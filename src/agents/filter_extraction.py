@@ -0,0 +1,272 @@
+"""
+Filter extraction for the merged daily report search.
+
+Months, years and date ranges come from the rule-based date parser; client,
+site manager and equipment names are looked up in vocabularies built from the
+report data itself (one per version of the report folder). The LLM is only
+asked for fields the rules cannot settle: a client, manager or delivery note
+the question refers to but that is not in the data vocabularies. Extractions
+are cached per normalized question.
+"""
+import calendar
+import json
+import re
+import threading
+from datetime import date
+import pandas as pd
+from config.settings import FILTER_CACHE_TTL, FILTER_CACHE_MAX_ENTRIES
+from src.agents.date_parser import MONTHS, WEEKDAYS, normalize_text, parse_date_range, relative_date_range
+from src.agents.tool_cache import ToolResultCache
+from src.models.llm import invoke_llm
+
+FILTER_FIELDS = ["date_range", "month", "year", "client", "site_manager", "equipment_type", "aggregation", "delivery_note"]
+
+# Words never used as a vocabulary entry on their own
+STOPWORDS = {
+    "client", "clients", "chef", "chantier", "site", "manager", "equipement", "equipment", "materiel",
+    "les", "des", "the", "and", "pour", "avec", "sans", "sarl", "societe", "company", "group", "groupe",
+}
+
+# Words of company names too common to stand for one client on their own ("Orange Tunisie")
+COMMON_WORDS = {
+    "tunisie", "tunisia", "tunis", "france", "maroc", "morocco", "algerie", "algeria", "libye", "libya",
+    "afrique", "africa", "europe", "international", "distribution", "services", "service", "solutions",
+    "technologies", "technology", "systems", "telecom", "banque", "bank", "industries", "industrie",
+    "holding", "energie", "energy", "nord", "sud", "centre",
+}
+
+# Month and weekday names belong to the date parser, never to a name vocabulary
+DATE_WORDS = set(MONTHS) | set(WEEKDAYS)
+
+_TOTAL = re.compile(r"\b(?:total|totaux|combien|how many|how much|count|nombre|somme|sum)\b")
+_LIST = re.compile(r"\b(?:list|liste|lister|quels?|quelles?|what|which|show|montre|affiche|lesquel)")
+_EXPLICIT_YEAR = re.compile(r"\b(?:19|20)\d{2}\b")
+_DELIVERY_NOTE = re.compile(r"\b(?:bl|bon de livraison|delivery note)\s*(?:n[o°]?\.?\s*)?:?\s*([a-z0-9][a-z0-9/-]*\d[a-z0-9/-]*)")
+
+# Cues that the question names a client / manager / delivery note the vocabularies may not know
+_RESIDUAL_CUES = {
+    "client": re.compile(r"\b(?:client|customer|chez)\b"),
+    "site_manager": re.compile(r"\b(?:chef|manager|responsable|supervis)"),
+    "delivery_note": re.compile(r"\b(?:bl|bon de livraison|delivery note)\b"),
+}
+
+residual_prompt = """Extract these fields from the query. Return a JSON object with exactly these keys, null when not mentioned:
+{fields}
+
+Query: {query}
+
+Return ONLY valid JSON, nothing else."""
+
+_FIELD_DESCRIPTIONS = {
+    "client": "client: specific client name",
+    "site_manager": "site_manager: chef_chantier (site manager) name",
+    "delivery_note": "delivery_note: BL (delivery note) number",
+}
+
+
+def name_words(name) -> list:
+    """(original, normalized) single words of a multi-word name usable as an entry on their own."""
+    name = str(name).strip()
+    words = list(zip(name.split(), normalize_text(name).split()))
+    if len(words) < 2:
+        return []
+    return [
+        (original.strip(",.;"), word) for original, word in words
+        if len(word) >= 4 and not word.isdigit() and word not in STOPWORDS | COMMON_WORDS | DATE_WORDS
+    ]
+
+
+class Vocabulary:
+    """Known names of one field, matched as whole words (plural tolerated) in a question."""
+
+    def __init__(self, names, shared_words=frozenset()):
+        """
+        Args:
+            names: Known names of the field
+            shared_words: Normalized words also found in another vocabulary, never entries on their own
+        """
+        names = [str(name).strip() for name in names]
+        # normalized form -> text used as filter value (original spelling)
+        self.entries = {}
+        for name in names:
+            normalized = normalize_text(name)
+            if len(normalized) < 3 or normalized in STOPWORDS or normalized in DATE_WORDS:
+                continue
+            self.entries.setdefault(normalized, name)
+
+        # Single words of multi-word names ("Dupont" for "Jean Dupont"), only when they
+        # point to one name of this vocabulary and to no other field
+        owners = {}
+        for name in names:
+            for original, word in name_words(name):
+                owners.setdefault(word, {})[name] = original
+        for word, spellings in owners.items():
+            if len(spellings) == 1 and word not in shared_words:
+                self.entries.setdefault(word, next(iter(spellings.values())))
+        alternatives = sorted(self.entries, key=len, reverse=True)
+        self._pattern = re.compile(
+            r"\b(" + "|".join(re.escape(entry) for entry in alternatives) + r")(?:s|x)?\b"
+        ) if alternatives else None
+
+    def search(self, normalized_query: str):
+        """Regex match of the longest known name in the question, or None."""
+        if self._pattern is None:
+            return None
+        found = list(self._pattern.finditer(normalized_query))
+        if not found:
+            return None
+        return max(found, key=lambda match: len(match.group(1)))
+
+    def match(self, normalized_query: str):
+        """Return the filter value of the longest known name in the question, or None."""
+        found = self.search(normalized_query)
+        return self.entries[found.group(1)] if found else None
+
+
+def build_vocabularies(df_reports: pd.DataFrame, equipment_names=()) -> dict:
+    """Vocabularies of the client, site_manager and equipment_type filters."""
+    def names(column):
+        return df_reports[column].dropna().astype(str).unique() if column in df_reports.columns else []
+    field_names = {
+        "client": names("client"),
+        "site_manager": names("chef_chantier"),
+        "equipment_type": list(equipment_names),
+    }
+    # Words that occur in the names of more than one field cannot settle either
+    seen, shared = {}, set()
+    for field, values in field_names.items():
+        for value in values:
+            for word in {word for _, word in name_words(value)} | {normalize_text(value)}:
+                if seen.setdefault(word, field) != field:
+                    shared.add(word)
+    return {field: Vocabulary(values, shared) for field, values in field_names.items()}
+
+
+def date_filters(query: str, today: date = None) -> dict:
+    """
+    month / year / date_range filters of a question.
+
+    A bare month name keeps the old semantics ("en juillet" is July of any
+    year); relative months ("le mois dernier", "this month") keep the year
+    they resolved to.
+    """
+    period = parse_date_range(query, today)
+    if period is None:
+        return {}
+    keep_year = bool(_EXPLICIT_YEAR.search(query)) or relative_date_range(query, today) is not None
+    start, end = period
+    whole_month = start.day == 1 and end == date(start.year, start.month, calendar.monthrange(start.year, start.month)[1])
+    if whole_month and start.month == end.month:
+        return {"month": str(start.month), "year": str(start.year) if keep_year else None}
+    if start == date(start.year, 1, 1) and end == date(start.year, 12, 31):
+        return {"year": str(start.year)}
+    return {"date_range": {"start": start.isoformat(), "end": end.isoformat()}}
+
+
+def rule_filters(query: str, vocabularies: dict, today: date = None) -> dict:
+    """Filters recognized without the LLM (missing fields are None)."""
+    text = normalize_text(query)
+    filters = dict.fromkeys(FILTER_FIELDS)
+    filters.update(date_filters(query, today))
+
+    # Date words are never name entries; words read as an equipment are not also read as a name
+    names_text = text
+    for field in sorted(vocabularies, key=lambda field: field != "equipment_type"):
+        found = vocabularies[field].search(text if field == "equipment_type" else names_text)
+        if found is None:
+            continue
+        filters[field] = vocabularies[field].entries[found.group(1)]
+        if field == "equipment_type":
+            names_text = names_text[:found.start()] + " " * len(found.group(0)) + names_text[found.end():]
+
+    if _TOTAL.search(text):
+        filters["aggregation"] = "total"
+    elif _LIST.search(text):
+        filters["aggregation"] = "list"
+
+    delivery_note = _DELIVERY_NOTE.search(text)
+    if delivery_note:
+        filters["delivery_note"] = delivery_note.group(1).upper()
+    return filters
+
+
+def residual_fields(query: str, filters: dict) -> list:
+    """Fields the question hints at but the rules left empty."""
+    text = normalize_text(query)
+    return [field for field, cue in _RESIDUAL_CUES.items() if not filters.get(field) and cue.search(text)]
+
+
+def _extract_json_object(response: str) -> dict:
+    text = response.strip()
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("no JSON object in response")
+    data = json.loads(text[start:end + 1])
+    if not isinstance(data, dict):
+        raise ValueError("response is not a JSON object")
+    return data
+
+
+class FilterExtractor:
+    """Rule-based filter extraction with LLM fallback for residual fields."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._vocabularies = None
+        self.cache = ToolResultCache(max_entries=FILTER_CACHE_MAX_ENTRIES, ttl=FILTER_CACHE_TTL)
+        self.llm_calls = 0
+
+    def vocabularies(self, df_reports: pd.DataFrame, version, equipment_names=()) -> dict:
+        """Vocabularies of the report data, rebuilt when the data version changes."""
+        with self._lock:
+            if self._vocabularies is not None and version is not None and version == self._version:
+                return self._vocabularies
+        vocabularies = build_vocabularies(df_reports, equipment_names)
+        with self._lock:
+            self._version, self._vocabularies = version, vocabularies
+        return vocabularies
+
+    def extract(self, query: str, llm, df_reports: pd.DataFrame, version=None, equipment_names=(),
+                today: date = None) -> dict:
+        """
+        Extract the merged-search filters of a question.
+
+        Args:
+            query: User question
+            llm: Language model asked for residual fields only
+            df_reports: Combined daily reports (vocabulary source)
+            version: Data version of df_reports (vocabularies and cache key)
+            equipment_names: Known equipment names (e.g. from the equipment ledger)
+            today: Reference day for relative dates
+
+        Returns:
+            Dictionary with the FILTER_FIELDS keys (None when not mentioned)
+        """
+        today = today or date.today()
+        cache_key = self.cache.key("filters", query, today.isoformat(), version)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
+        filters = rule_filters(query, self.vocabularies(df_reports, version, equipment_names), today)
+        missing = residual_fields(query, filters)
+        if missing and llm is not None:
+            prompt = residual_prompt.format(
+                fields="\n".join(f"- {_FIELD_DESCRIPTIONS[field]}" for field in missing), query=query
+            )
+            try:
+                self.llm_calls += 1
+                extracted = _extract_json_object(invoke_llm(llm, prompt))
+                for field in missing:
+                    value = extracted.get(field)
+                    if value not in (None, "", "null"):
+                        filters[field] = str(value)
+            except Exception as e:
+                print(f"✗ LLM filter extraction failed for {missing}, keeping rule-based filters: {e}")
+
+        return dict(self.cache.put(cache_key, filters))
+
+
+filter_extractor = FilterExtractor()
@@ -0,0 +1,173 @@
+"""
+Map-reduce answers over large sets of daily report rows.
+
+When a merged question matches many rows, a similarity sample misses most of
+them and a single prompt with every row is slow or too long. The rows are cut
+into token-bounded chunks, each chunk is summarized with respect to the question
+concurrently (every call still goes through the shared rate limiter of
+invoke_llm), and the partial answers are combined in a final reduce call.
+
+Progress is reported as chunks complete and a deadline bounds the whole run:
+chunks not summarized in time are left out and the answer says so, as it does
+when the caller capped the rows (total_matching).
+"""
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+from config.settings import (
+    MAP_REDUCE_CHUNK_TOKENS, MAP_REDUCE_MAX_WORKERS, MAP_REDUCE_DEADLINE, MAP_REDUCE_SUMMARY_TOKENS
+)
+from src.agents.report_store import report_row_text
+from src.models.llm import invoke_llm
+from src.utils.tokens import estimate_tokens
+
+# Progress callback of the current question: called as progress(done, total, stage)
+# from the thread that called map_reduce_answer (see run_agent)
+progress_callback = contextvars.ContextVar("map_reduce_progress", default=None)
+
+MAP_PROMPT = """You are a daily report analyst. Extract from these daily report entries everything relevant to the user's question.
+
+User Question: {question}
+Entries {first}-{last} of {total}:
+{rows}
+
+List the relevant facts with their dates, clients and site managers. Write "Nothing relevant" if no entry is relevant."""
+
+REDUCE_PROMPT = """You are a daily report analyst. Answer the user's question from these partial findings, each covering a part of the matching daily reports.
+
+User Question: {question}
+Total matching records: {total}{coverage}
+
+Partial findings:
+{findings}
+
+Provide a comprehensive, clear answer with specific details. Merge duplicates and ignore parts with nothing relevant."""
+
+
+def _report(done: int, total: int, stage: str):
+    callback = progress_callback.get()
+    if callback is not None:
+        try:
+            callback(done, total, stage)
+        except Exception as e:
+            print(f"Progress callback failed: {e}")
+
+
+def plan_row_chunks(texts: list, token_budget: int = MAP_REDUCE_CHUNK_TOKENS) -> list:
+    """
+    Group row texts into chunks of at most token_budget tokens.
+
+    A row larger than the budget on its own still gets a chunk of one.
+
+    Returns:
+        List of (first index, last index) pairs, inclusive
+    """
+    chunks = []
+    start = None
+    used = 0
+    for index, text in enumerate(texts):
+        cost = estimate_tokens(text) + 1
+        if start is not None and used + cost > token_budget:
+            chunks.append((start, index - 1))
+            start = None
+        if start is None:
+            start, used = index, 0
+        used += cost
+    if start is not None:
+        chunks.append((start, len(texts) - 1))
+    return chunks
+
+
+def _map_chunks(query: str, texts: list, chunks: list, llm, deadline: float, max_workers: int, stage: str) -> dict:
+    """Summarize chunks concurrently until done or the deadline; returns chunk index -> summary."""
+    def summarize(first, last):
+        prompt = MAP_PROMPT.format(
+            question=query, first=first + 1, last=last + 1, total=len(texts), rows="\n".join(texts[first:last + 1])
+        )
+        return invoke_llm(llm, prompt, max_tokens=MAP_REDUCE_SUMMARY_TOKENS)
+
+    summaries = {}
+    _report(0, len(chunks), stage)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))))
+    try:
+        futures = {executor.submit(summarize, first, last): index for index, (first, last) in enumerate(chunks)}
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"Map-reduce deadline reached: {len(pending)} of {len(chunks)} chunks left out")
+                break
+            done, pending = wait(pending, timeout=min(remaining, 0.5), return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    summaries[futures[future]] = future.result()
+                except Exception as e:
+                    print(f"✗ Chunk {futures[future] + 1} failed: {e}")
+            if done:
+                _report(len(summaries), len(chunks), stage)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return summaries
+
+
+def map_reduce_answer(query: str, df: pd.DataFrame, llm, deadline: float = MAP_REDUCE_DEADLINE,
+                      token_budget: int = MAP_REDUCE_CHUNK_TOKENS, max_workers: int = MAP_REDUCE_MAX_WORKERS,
+                      summarize_llm=None, total_matching: int = None) -> tuple:
+    """
+    Answer a question from every row of df.
+
+    Args:
+        query: User question
+        df: Daily report rows (e.g. the filtered merged reports)
+        llm: Language model writing the final answer
+        deadline: Seconds allowed for the whole map and reduce (None for no limit)
+        token_budget: Maximum row tokens per map prompt (and per group of findings in the reduce)
+        max_workers: Concurrent map prompts
+        summarize_llm: Language model of the chunk summaries (defaults to llm)
+        total_matching: Rows matching the question when df holds only part of them
+            (defaults to len(df))
+
+    Returns:
+        (answer text, complete): complete is False when rows were left out
+        (row cap or deadline) or nothing could be summarized
+    """
+    end = time.monotonic() + (deadline if deadline is not None else float("inf"))
+    texts = [report_row_text(row) for row in df.to_dict(orient="records")]
+    chunks = plan_row_chunks(texts, token_budget)
+    total = max(total_matching or 0, len(texts))
+    print(f"Map-reduce over {len(texts)} of {total} rows in {len(chunks)} chunks")
+
+    summarize_llm = summarize_llm or llm
+    summaries = _map_chunks(query, texts, chunks, summarize_llm, end, max_workers, "map")
+    if not summaries:
+        return "The daily reports could not be summarized before the deadline. Please narrow the question (date, client, manager).", False
+
+    covered = sum(chunks[index][1] - chunks[index][0] + 1 for index in summaries)
+    coverage = "" if covered == total else f"\nCoverage: only {covered} of {total} matching records were summarized"
+    findings = [summaries[index] for index in sorted(summaries)]
+
+    # Findings too long for one reduce prompt are condensed again in groups
+    while len(findings) > 1 and estimate_tokens("\n\n".join(findings)) > token_budget and time.monotonic() < end:
+        groups = plan_row_chunks(findings, token_budget)
+        if len(groups) == len(findings):
+            break
+        condensed = _map_chunks(query, findings, groups, summarize_llm, end, max_workers, "reduce")
+        if not condensed:
+            break
+        # Groups not condensed before the deadline keep their findings as they are
+        findings = [
+            text
+            for index, (first, last) in enumerate(groups)
+            for text in ([condensed[index]] if index in condensed else findings[first:last + 1])
+        ]
+
+    _report(len(chunks), len(chunks), "reduce")
+    prompt = REDUCE_PROMPT.format(
+        question=query, total=total, coverage=coverage,
+        findings="\n\n".join(f"Part {i + 1}:\n{finding}" for i, finding in enumerate(findings))
+    )
+    answer = invoke_llm(llm, prompt)
+    if coverage:
+        answer += f"\n\n_({covered} of {total} matching records were covered; narrow the question to cover them all.)_"
+    return answer.strip(), not coverage
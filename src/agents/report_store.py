@@ -0,0 +1,396 @@
+"""
+Indexed SQLite store of the daily report rows.
+
+The merged-data tool used to copy the whole combined DataFrame and scan it with
+`str.lower().str.contains` for every filter. The rows are now kept in a SQLite
+table indexed by (year, month, date), with a trigram full-text index on client,
+chef_chantier and the equipment columns, and the extracted filter dict compiles
+to a single indexed query returning the keys of the matching rows.
+
+The store is updated per report file: only files that are new or whose modified
+date changed are rewritten. It also keeps one embedding per row, computed only
+for rows that do not have one yet, so semantic search covers the whole history
+(pre-filtered by the same indexed query) with a single query embedding.
+"""
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from config.settings import REPORT_STORE_PATH, REPORT_EMBEDDING_BATCH
+from src.agents.date_parser import MONTHS, normalize_text
+
+# Bumped when the tables change; older stores are rebuilt from the sheets
+SCHEMA_VERSION = 1
+
+# Free-text columns searched with substring semantics
+TEXT_COLUMNS = ["client", "chef_chantier", "equipement_installee", "equipement_retour"]
+
+# Filter fields of extract_filters_from_query and the columns they search
+TEXT_FILTERS = {
+    "client": ["client"],
+    "site_manager": ["chef_chantier"],
+    "equipment_type": ["equipement_installee", "equipement_retour"],
+}
+
+
+def _text(value) -> str:
+    return "" if value is None or (isinstance(value, float) and pd.isna(value)) else str(value)
+
+
+def report_row_text(row: dict) -> str:
+    """Text embedded for one daily report row."""
+    return (
+        f"Date: {row.get('date', 'N/A')} | "
+        f"Client: {row.get('client', 'N/A')} | "
+        f"BL: {row.get('nom_BL', 'N/A')} | "
+        f"Manager: {row.get('chef_chantier', 'N/A')} | "
+        f"Time: {row.get('heure_entree', 'N/A')}-{row.get('heure_sortie', 'N/A')} | "
+        f"Action: {row.get('action_previsionelle_a_executer', 'N/A')} | "
+        f"Equipment Installed: {row.get('equipement_installee', 'N/A')} | "
+        f"Constraints: {row.get('contrainte_visees', 'N/A')} | "
+        f"Remaining: {row.get('reste_a_faire', 'N/A')} | "
+        f"Observations: {row.get('observation', 'N/A')}"
+    )
+
+
+def _model_name(embedding_model) -> str:
+    return getattr(embedding_model, "model_name", None) or type(embedding_model).__name__
+
+
+def parse_month(value):
+    """Month number from a name (FR/EN) or a number, None if unknown."""
+    text = normalize_text(value)
+    if text.isdigit():
+        month = int(text)
+        return month if 1 <= month <= 12 else None
+    return MONTHS.get(text)
+
+
+def filter_frame(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    """
+    Rows of a prepared daily report frame matching a filter dict, in pandas.
+
+    Same semantics as ReportStore.compile_filters; used while the store is not
+    in sync with the frame.
+    """
+    mask = pd.Series(True, index=df.index)
+    dates = df["date_parsed"] if "date_parsed" in df.columns else pd.Series(pd.NaT, index=df.index)
+
+    month = parse_month(filters["month"]) if filters.get("month") else None
+    if month:
+        mask &= dates.dt.month == month
+    if filters.get("year"):
+        try:
+            mask &= dates.dt.year == int(filters["year"])
+        except (TypeError, ValueError):
+            pass
+
+    date_range = filters.get("date_range")
+    if isinstance(date_range, dict):
+        days = dates.dt.normalize()
+        for key, compare in (("start", days.ge), ("end", days.le)):
+            bound = pd.to_datetime(date_range.get(key), errors="coerce")
+            if not pd.isna(bound):
+                mask &= compare(bound)
+
+    for field, columns in TEXT_FILTERS.items():
+        value = _text(filters.get(field)).strip().lower()
+        if not value:
+            continue
+        found = pd.Series(False, index=df.index)
+        for column in columns:
+            if column in df.columns:
+                found |= df[column].map(_text).str.lower().str.contains(value, regex=False)
+        mask &= found
+    return df[mask]
+
+
+class ReportStore:
+    """Daily report rows with date and full-text indexes."""
+
+    def __init__(self, path: str = REPORT_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.executescript("""
+                DROP TABLE IF EXISTS report_files;
+                DROP TABLE IF EXISTS reports;
+                DROP TABLE IF EXISTS reports_fts;
+                DROP TABLE IF EXISTS report_vectors;
+                DROP TABLE IF EXISTS report_meta;
+            """)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS report_files (
+                file_id TEXT PRIMARY KEY,
+                modified TEXT
+            );
+            CREATE TABLE IF NOT EXISTS reports (
+                rowid INTEGER PRIMARY KEY,
+                row_key TEXT UNIQUE,
+                file_id TEXT,
+                date TEXT,
+                year INTEGER,
+                month INTEGER,
+                client TEXT,
+                chef_chantier TEXT,
+                equipement_installee TEXT,
+                equipement_retour TEXT,
+                text TEXT
+            );
+            CREATE TABLE IF NOT EXISTS report_vectors (
+                rowid INTEGER PRIMARY KEY,
+                vector BLOB
+            );
+            CREATE TABLE IF NOT EXISTS report_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE INDEX IF NOT EXISTS reports_period ON reports (year, month, date);
+            CREATE INDEX IF NOT EXISTS reports_date ON reports (date);
+            CREATE INDEX IF NOT EXISTS reports_file ON reports (file_id);
+        """)
+        try:
+            self._conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5({', '.join(TEXT_COLUMNS)}, tokenize='trigram')"
+            )
+            self.full_text = True
+        except sqlite3.OperationalError as e:
+            # SQLite older than 3.34: substring filters fall back to LIKE scans
+            print(f"Full-text index unavailable ({e}), using LIKE filters")
+            self.full_text = False
+        self._conn.commit()
+        # In-memory copy of report_vectors: (rowids, normalized matrix), None when stale
+        self._vectors = None
+
+    def sync(self, frames: dict):
+        """
+        Bring the store in line with the loaded report files.
+
+        Args:
+            frames: Dictionary (file_id, modified) -> prepared report DataFrame whose
+                index holds the row keys (see prepare_daily_report)
+
+        Returns:
+            Number of files rewritten
+        """
+        current = {file_id: modified for file_id, modified in frames}
+        with self._lock:
+            stored = dict(self._conn.execute("SELECT file_id, modified FROM report_files"))
+            stale = [file_id for file_id, modified in stored.items() if current.get(file_id) != modified]
+            fresh = [(file_id, modified) for file_id, modified in frames if stored.get(file_id) != modified]
+
+            for file_id in stale:
+                if self.full_text:
+                    self._conn.execute(
+                        "DELETE FROM reports_fts WHERE rowid IN (SELECT rowid FROM reports WHERE file_id = ?)", (file_id,)
+                    )
+                self._conn.execute(
+                    "DELETE FROM report_vectors WHERE rowid IN (SELECT rowid FROM reports WHERE file_id = ?)", (file_id,)
+                )
+                self._conn.execute("DELETE FROM reports WHERE file_id = ?", (file_id,))
+                self._conn.execute("DELETE FROM report_files WHERE file_id = ?", (file_id,))
+
+            for file_id, modified in fresh:
+                self._insert(file_id, frames[(file_id, modified)])
+                self._conn.execute("INSERT INTO report_files (file_id, modified) VALUES (?, ?)", (file_id, modified))
+
+            self._conn.commit()
+            if stale:
+                self._vectors = None
+        if fresh or stale:
+            print(f"✓ Report store: {len(fresh)} files written, {len(stale)} removed or replaced")
+        return len(fresh)
+
+    def _insert(self, file_id: str, df: pd.DataFrame):
+        dates = df["date_parsed"] if "date_parsed" in df.columns else pd.Series(pd.NaT, index=df.index)
+        texts = {column: df[column].map(_text) if column in df.columns else pd.Series("", index=df.index)
+                 for column in TEXT_COLUMNS}
+        row_texts = [report_row_text(row) for row in df.to_dict(orient="records")]
+        records = [
+            (str(key), file_id,
+             None if pd.isna(day) else day.strftime("%Y-%m-%d"),
+             None if pd.isna(day) else day.year,
+             None if pd.isna(day) else day.month,
+             *(texts[column][key] for column in TEXT_COLUMNS),
+             row_text)
+            for (key, day), row_text in zip(dates.items(), row_texts)
+        ]
+        self._conn.executemany(
+            f"""INSERT OR REPLACE INTO reports (row_key, file_id, date, year, month, {', '.join(TEXT_COLUMNS)}, text)
+                VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(TEXT_COLUMNS))}, ?)""",
+            records
+        )
+        if self.full_text and records:
+            self._conn.execute(
+                f"""INSERT INTO reports_fts (rowid, {', '.join(TEXT_COLUMNS)})
+                    SELECT rowid, {', '.join(TEXT_COLUMNS)} FROM reports WHERE file_id = ?""",
+                (file_id,)
+            )
+
+    def compile_filters(self, filters: dict, select: str = "row_key") -> tuple:
+        """
+        Compile an extracted filter dict into one SQL query.
+
+        Args:
+            filters: Filter dict of extract_filters_from_query
+            select: Column returned by the query
+
+        Returns:
+            (sql, params) selecting that column for every matching report row
+        """
+        clauses = []
+        params = []
+
+        month = parse_month(filters["month"]) if filters.get("month") else None
+        if month:
+            clauses.append("month = ?")
+            params.append(month)
+
+        if filters.get("year"):
+            try:
+                clauses.append("year = ?")
+                params.append(int(filters["year"]))
+            except (TypeError, ValueError):
+                clauses.pop()
+
+        date_range = filters.get("date_range")
+        if isinstance(date_range, dict):
+            for key, operator in (("start", ">="), ("end", "<=")):
+                bound = pd.to_datetime(date_range.get(key), errors="coerce")
+                if not pd.isna(bound):
+                    clauses.append(f"date {operator} ?")
+                    params.append(bound.strftime("%Y-%m-%d"))
+
+        matches = []
+        for field, columns in TEXT_FILTERS.items():
+            value = _text(filters.get(field)).strip().lower()
+            if not value:
+                continue
+            if self.full_text and len(value) >= 3:
+                phrase = '"' + value.replace('"', '""') + '"'
+                matches.append("(" + " OR ".join(f"{column} : {phrase}" for column in columns) + ")")
+            else:
+                escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                clauses.append("(" + " OR ".join(f"lower({column}) LIKE ? ESCAPE '\\'" for column in columns) + ")")
+                params.extend([f"%{escaped}%"] * len(columns))
+
+        if matches:
+            clauses.append("rowid IN (SELECT rowid FROM reports_fts WHERE reports_fts MATCH ?)")
+            params.append(" AND ".join(matches))
+
+        sql = f"SELECT {select} FROM reports"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return sql, params
+
+    def query_row_keys(self, filters: dict) -> list:
+        """Return the keys of the report rows matching an extracted filter dict."""
+        sql, params = self.compile_filters(filters)
+        with self._lock:
+            return [row_key for (row_key,) in self._conn.execute(sql, params)]
+
+    def index_vectors(self, embedding_model, batch_size: int = REPORT_EMBEDDING_BATCH):
+        """
+        Embed the rows that do not have a vector yet.
+
+        Vectors made with another embedding model are dropped first.
+
+        Returns:
+            Number of rows embedded
+        """
+        model_name = _model_name(embedding_model)
+        with self._lock:
+            stored = self._conn.execute("SELECT value FROM report_meta WHERE key = 'embedding_model'").fetchone()
+            if stored is None or stored[0] != model_name:
+                self._conn.execute("DELETE FROM report_vectors")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO report_meta (key, value) VALUES ('embedding_model', ?)", (model_name,)
+                )
+                self._conn.commit()
+                self._vectors = None
+            missing = self._conn.execute(
+                "SELECT rowid, text FROM reports WHERE rowid NOT IN (SELECT rowid FROM report_vectors)"
+            ).fetchall()
+
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            vectors = np.asarray(embedding_model.embed_documents([text for _, text in batch]), dtype="float32")
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO report_vectors (rowid, vector) VALUES (?, ?)",
+                    [(rowid, vector.tobytes()) for (rowid, _), vector in zip(batch, vectors)]
+                )
+                self._conn.commit()
+                self._vectors = None
+        if missing:
+            print(f"✓ Report store: {len(missing)} rows embedded")
+        return len(missing)
+
+    def _load_vectors(self):
+        with self._lock:
+            if self._vectors is None:
+                rows = self._conn.execute("SELECT rowid, vector FROM report_vectors ORDER BY rowid").fetchall()
+                rowids = np.array([rowid for rowid, _ in rows], dtype="int64")
+                matrix = np.array([np.frombuffer(vector, dtype="float32") for _, vector in rows], dtype="float32")
+                if len(rows):
+                    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                    norms[norms == 0] = 1.0
+                    matrix = matrix / norms
+                self._vectors = (rowids, matrix)
+            return self._vectors
+
+    def search(self, query_vector, filters: dict = None, k: int = 20) -> list:
+        """
+        Semantic search over the embedded rows matching the filters.
+
+        Args:
+            query_vector: Embedding of the question
+            filters: Filter dict applied before ranking (see compile_filters)
+            k: Number of rows returned
+
+        Returns:
+            Row keys of the k closest rows, best first
+        """
+        rowids, matrix = self._load_vectors()
+        if not len(rowids):
+            return []
+        if filters:
+            sql, params = self.compile_filters(filters, select="rowid")
+            with self._lock:
+                allowed = np.array([rowid for (rowid,) in self._conn.execute(sql, params)], dtype="int64")
+            mask = np.isin(rowids, allowed)
+            rowids, matrix = rowids[mask], matrix[mask]
+            if not len(rowids):
+                return []
+
+        query = np.asarray(query_vector, dtype="float32")
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query
+        top = np.argsort(-scores)[:k]
+        selected = [int(rowid) for rowid in rowids[top]]
+
+        with self._lock:
+            keys = dict(self._conn.execute(
+                f"SELECT rowid, row_key FROM reports WHERE rowid IN ({', '.join('?' * len(selected))})", selected
+            ))
+        return [keys[rowid] for rowid in selected if rowid in keys]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_report_store() -> ReportStore:
+    """Return the process-wide report store, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ReportStore()
+        return _store
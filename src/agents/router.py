@@ -0,0 +1,180 @@
+"""
+Intent router of the technician agent.
+
+A ReAct agent spends at least one LLM call choosing a tool before the tool runs.
+Most questions name their intent plainly ("téléphone de ...", "planning du
+12/08", "rapport journalier d'hier", "équipements installés en juillet"), so the
+router scores the tools with keyword rules and the date or period found in the
+question, then with an embedding classifier over the tool descriptions and
+example questions. The question goes straight to the chosen tool; only when no
+tool clearly wins does the agent fall back to the ReAct loop.
+"""
+import re
+import threading
+from typing import NamedTuple, Optional
+import numpy as np
+from config.settings import ROUTER_MIN_SIMILARITY, ROUTER_MIN_MARGIN
+from src.agents.date_parser import normalize_text, parse_date_range
+
+# Technician directory: a person cue, contact terms that only the directory
+# answers, and generic ones ("numéro du BL", "contact du client") that count
+# only next to a person cue ("numéro du technicien")
+TECHNICIAN_CUES = [r"\btechnicien", r"\btechnician"]
+CONTACT_RULES = [r"\btelephone", r"\bphone\b", r"\bmail\b", r"\be-?mail", r"\bjoindre\b"]
+PERSON_CONTACT_RULES = [r"\bnumero\b", r"\bnumber\b", r"\bcontact"]
+
+# Keyword rules per tool, matched on the normalized (lower-case, unaccented) question
+KEYWORD_RULES = {
+    "technician_search": TECHNICIAN_CUES + CONTACT_RULES,
+    "planning_date_search": [
+        r"\bplanning", r"\bplanifi", r"\bprevu", r"\bscheduled?\b", r"\bvehicule", r"\bvehicle",
+        r"\bfrais de mission", r"\bmission expenses?", r"\bqui (?:fait|travaille)", r"\bwho is (?:doing|working)",
+    ],
+    "daily_report_search": [
+        r"\brapports? journalier", r"\bdaily reports?", r"\breste a faire", r"\bcontraintes?\b",
+        r"\bconstraints?\b", r"\bobservations?\b", r"\bheures? d'entree", r"\bheures? de sortie",
+        r"\bequipements? (?:installes?|retournes?)", r"\bequipment (?:installed|returned)",
+    ],
+    "merged_data_search": [
+        r"\btotal\b", r"\bau total\b", r"\bcombien\b", r"\bhow many\b", r"\bhow much\b", r"\bacross\b",
+        r"\bdepuis\b", r"\bsince\b", r"\btous les\b", r"\ball (?:the )?(?:work|reports|dates)",
+        r"\bpar mois\b", r"\bper month\b", r"\bover time\b", r"\bpendant\b", r"\bduring\b",
+    ],
+}
+
+# Example questions embedded with the tool descriptions
+TOOL_EXAMPLES = {
+    "technician_search": [
+        "Quel est le numéro de téléphone de Karim ?",
+        "What is the email of the technician Ahmed?",
+        "Quel équipement possède le technicien Youssef ?",
+    ],
+    "planning_date_search": [
+        "Que fait Mehdi le 12/08/2025 ?",
+        "Which vehicles are used on 5 August?",
+        "Quel est le planning de demain ?",
+    ],
+    "daily_report_search": [
+        "Qu'est-ce qui a été fait hier pour le client Orange ?",
+        "What constraints were reported on 03/07/2025?",
+        "Quel est le reste à faire du rapport du 14 juillet ?",
+    ],
+    "merged_data_search": [
+        "Combien de caméras ont été installées en juillet ?",
+        "What work was done for Orange across all dates?",
+        "Total des heures travaillées par Dupont en août",
+    ],
+}
+
+_RULES = {tool: [re.compile(pattern) for pattern in patterns] for tool, patterns in KEYWORD_RULES.items()}
+_CUES = [re.compile(pattern) for pattern in TECHNICIAN_CUES]
+_CONTACT_RULES = [re.compile(pattern) for pattern in CONTACT_RULES]
+_PERSON_CONTACT_RULES = [re.compile(pattern) for pattern in PERSON_CONTACT_RULES]
+
+
+class Route(NamedTuple):
+    tool: Optional[str]  # None: fall back to the ReAct agent
+    source: str  # "rules", "embeddings" or "fallback"
+    scores: dict
+
+
+def rule_scores(question: str) -> dict:
+    """
+    Keyword and date evidence for each tool.
+
+    A single day in the question favours the per-date tools, a period (several
+    days, a month, a year) the merged search. With a date, the technician
+    directory needs a contact term: "Quels techniciens ont travaillé hier ?"
+    is about the reports, not about phone numbers.
+    """
+    text = normalize_text(question)
+    scores = {tool: float(sum(1 for rule in rules if rule.search(text))) for tool, rules in _RULES.items()}
+
+    cue = any(rule.search(text) for rule in _CUES)
+    person_contact = sum(1 for rule in _PERSON_CONTACT_RULES if rule.search(text)) if cue else 0
+    scores["technician_search"] += person_contact
+    contact = person_contact or any(rule.search(text) for rule in _CONTACT_RULES)
+
+    period = parse_date_range(question)
+    if period is not None:
+        if not contact:
+            scores["technician_search"] = 0.0
+        if period.is_single_day:
+            scores["planning_date_search"] += 0.5
+            scores["daily_report_search"] += 0.5
+            scores["merged_data_search"] = max(scores["merged_data_search"] - 1.0, 0.0)
+        else:
+            scores["merged_data_search"] += 1.0
+            scores["daily_report_search"] = max(scores["daily_report_search"] - 1.0, 0.0)
+    return scores
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class IntentRouter:
+    """Pick the tool answering a question without an LLM call."""
+
+    def __init__(self, tools: list, embedding_getter):
+        """
+        Args:
+            tools: LangChain tools (name, description, func)
+            embedding_getter: Callable returning the embedding model (called on first use)
+        """
+        self.tools = {tool.name: tool for tool in tools}
+        self._embedding_getter = embedding_getter
+        self._vectors = None
+        self._labels = None
+        self._lock = threading.Lock()
+
+    def _prototypes(self):
+        with self._lock:
+            if self._vectors is None:
+                labels, texts = [], []
+                for name, tool in self.tools.items():
+                    for text in [" ".join(tool.description.split())] + TOOL_EXAMPLES.get(name, []):
+                        labels.append(name)
+                        texts.append(text)
+                vectors = self._embedding_getter().embed_documents(texts)
+                self._vectors = _normalize(np.asarray(vectors, dtype="float32"))
+                self._labels = np.array(labels)
+            return self._vectors, self._labels
+
+    def embedding_scores(self, question: str) -> dict:
+        """Best cosine similarity of the question to each tool's description and examples."""
+        vectors, labels = self._prototypes()
+        query = _normalize(np.asarray(self._embedding_getter().embed_query(question), dtype="float32"))
+        similarities = vectors @ query
+        return {name: float(similarities[labels == name].max()) for name in self.tools}
+
+    def route(self, question: str) -> Route:
+        """
+        Choose a tool for the question.
+
+        Keyword rules win when the best tool has at least twice the evidence of
+        the next one. Otherwise the embedding classifier decides among the tools
+        with the best rule score (all tools if no rule matched), provided the
+        winner is similar enough and ahead by ROUTER_MIN_MARGIN.
+        """
+        scores = {name: score for name, score in rule_scores(question).items() if name in self.tools}
+        ranked = sorted(scores.values(), reverse=True)
+        best_rule = ranked[0] if ranked else 0.0
+        if best_rule > 0 and best_rule >= 2 * (ranked[1] if len(ranked) > 1 else 0.0):
+            return Route(max(scores, key=scores.get), "rules", scores)
+
+        try:
+            similarities = self.embedding_scores(question)
+        except Exception as e:
+            print(f"Router embedding classifier failed: {e}")
+            return Route(None, "fallback", scores)
+
+        candidates = [name for name, score in scores.items() if score == best_rule] if best_rule > 0 else list(similarities)
+        ranked = sorted(similarities.items(), key=lambda item: item[1], reverse=True)
+        best_name, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best_name in candidates and best_score >= ROUTER_MIN_SIMILARITY and best_score - runner_up >= ROUTER_MIN_MARGIN:
+            return Route(best_name, "embeddings", similarities)
+        return Route(None, "fallback", similarities)
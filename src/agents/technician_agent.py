@@ -3,95 +3,62 @@ Technician agent for handling technician-related queries.
 This module provides an agent that can search technician information, planning, and daily reports.
 """
 import pandas as pd
-from io import StringIO
-from pydrive.auth import GoogleAuth
-from pydrive.drive import GoogleDrive
 from langchain_community.vectorstores import FAISS
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate
 from langchain.tools import Tool
 from langchain.agents import initialize_agent, AgentType
-from langchain.embeddings import HuggingFaceEmbeddings
-from config.settings import OPENAI_API_KEY, OPENAI_API_BASE, LLM_MODEL, LLM_TEMPERATURE, EMBEDDING_MODEL_NAME
-import os
-import json
+from src.agents.context import get_agent_context
+from src.agents.date_parser import extract_date_ddmmyyyy, NO_DATE
+from src.agents.report_store import get_report_store, filter_frame
+from src.agents.router import IntentRouter
+from src.agents.map_reduce import map_reduce_answer, progress_callback
+from src.agents.tool_cache import tool_cache
+from src.agents.answer_templates import render_equipment_totals, finish_answer
+from src.agents.filter_extraction import filter_extractor
+from src.agents.time_on_site import add_duration_column, is_time_question, grouping_from_query, time_on_site_text
+from src.agents.equipment import (
+    ledger_cache, equipment_totals, REPORT_EQUIPMENT_COLUMNS, PLANNING_EQUIPMENT_COLUMNS
+)
+from config.settings import (
+    PLANNING_FOLDER_ID, DAILY_REPORT_SHEET_ID, DAILY_REPORTS_FOLDER_ID, AGENT_ROUTER,
+    MERGED_ANSWER_MODE, MAP_REDUCE_MIN_ROWS, MAP_REDUCE_MAX_ROWS
+)
+from src.models.llm import invoke_llm, get_llm
+from src.utils.singleflight import SingleFlight, normalize_key
+import functools
 import re
+import threading
 from datetime import datetime
 
-# Set environment variables for Groq
-os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
-os.environ["OPENAI_API_BASE"] = OPENAI_API_BASE
-
-# Initialize models
-llm = ChatOpenAI(
-    model=LLM_MODEL,
-    temperature=LLM_TEMPERATURE,
-)
-
-embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
-
-# Initialize Google Drive authentication
-gauth = GoogleAuth()
-
-# Set the client secrets file (should be in project root)
-client_secrets_file = "client_secrets.json"
-credentials_file = "credentials.json"
-
-# Load client secrets if it exists
-if os.path.exists(client_secrets_file):
-    gauth.LoadClientConfigFile(client_secrets_file)
-
-# Load or create credentials
-if os.path.exists(credentials_file):
-    gauth.LoadCredentialsFile(credentials_file)
-else:
-    # First time: need client_secrets.json to authenticate
-    if not os.path.exists(client_secrets_file):
-        raise FileNotFoundError(
-            f"client_secrets.json not found in project root. "
-            f"Please download it from Google Cloud Console and place it in the project root directory. "
-            f"See SETUP_INSTRUCTIONS.md for details."
-        )
-    gauth.LocalWebserverAuth()
-    gauth.SaveCredentialsFile(credentials_file)
 
-if gauth.credentials is None:
-    gauth.LocalWebserverAuth()
-elif gauth.access_token_expired:
-    gauth.Refresh()
-else:
-    gauth.Authorize()
+# Concurrent identical questions to the same tool share one run
+tool_flight = SingleFlight("agent_tools")
 
-gauth.SaveCredentialsFile(credentials_file)
-drive = GoogleDrive(gauth)
 
-# Load technician data
-sheet_id = "1ersVCUKQXs5Z6on6GNc34SD5pGnKIbxVr2KAObdk42Q"
-
-try:
-    file = drive.CreateFile({'id': sheet_id})
-    csv_content = file.GetContentString(mimetype='text/csv')
-    df_technicien = pd.read_csv(StringIO(csv_content))
-except Exception as e:
-    print(f"Error loading technician data: {e}")
-    df_technicien = pd.DataFrame()
+def coalesced_tool(func):
+    """Wrap a tool so identical in-flight questions are answered by a single run."""
+    @functools.wraps(func)
+    def wrapper(query):
+        return tool_flight.do(normalize_key(func.__name__, query), lambda: func(query))
+    return wrapper
 
 
 # Tool 1: Technician Search
 def search_technician(query):
     """Search for technician information including mail, phone, equipment"""
-    def build_technician_retriever(df):
-        texts = df.apply(lambda row: f"{row['nom']} {row['telephone']} {row['mail']} {row['equipement']}", axis=1).tolist()
-        metadatas = df.to_dict(orient="records")
-        vectorstore = FAISS.from_texts(texts, embedding_model, metadatas=metadatas)
-        return vectorstore
-    
-    if df_technicien.empty:
+    context = get_agent_context()
+    llm = context.llm
+
+    context.technicians.refresh()
+    cache_key = tool_cache.key("technician_search", query, None, context.technicians.content_hash)
+    cached = tool_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Index built once per sheet version (see TechnicianDirectory)
+    results = context.technicians.search(query, k=3)
+    if not results:
         return "No technician data available."
     
-    retriever = build_technician_retriever(df_technicien)
-    results = retriever.similarity_search(query, k=3)
-    
     search_results = [doc.page_content for doc in results]
     
     prompt = f"""Based on the following information, answer the user's question precisely and concisely.
@@ -103,8 +70,8 @@ def search_technician(query):
 
                 Answer:"""
     
-    answer = llm.predict(prompt)
-    return answer.strip()
+    answer = invoke_llm(llm, prompt)
+    return tool_cache.put(cache_key, answer.strip())
 
 
 
@@ -113,19 +80,15 @@ def search_technician(query):
 def search_planning_by_date(query):
     """Search planning for a specific date - handles any question type including equipment aggregation"""
     try:
-        def extract_date_from_query_to_id(user_query, df_planning):
-            prompt = PromptTemplate(
-                input_variables=["query"],
-                template="""Extract the date from the query and return it in DD-MM-YYYY format.
-  - If no date is found, return NO_DATE
-  - Only return the date, nothing else.
+        context = get_agent_context()
+        llm, sheets, embedding_model = context.llm, context.sheets, context.embedding_model
 
-   Query: {query}"""
-            )
-            
-            raw_response = llm.predict(prompt.format(query=user_query)).strip()
+        def extract_date_from_query_to_id(user_query, df_planning):
+            # Rule-based parsing first, LLM only when no date pattern matches;
+            # a bare weekday ("jeudi") is the coming one for the planning
+            raw_response = extract_date_ddmmyyyy(user_query, get_llm("extract"), weekday="future")
             
-            if raw_response == "NO_DATE":
+            if raw_response == NO_DATE:
                 return "NO_ID"
             
             matching_files = df_planning[df_planning['title'].str.contains(raw_response, case=False, na=False)]
@@ -135,69 +98,44 @@ def search_planning_by_date(query):
             else:
                 return "NO_ID"
         
-        def load_google_sheet(sheet_id):
+        def load_google_sheet(sheet_id, df_planning):
             try:
-                if drive.auth.credentials.access_token_expired:
-                    drive.auth.LocalWebserverAuth()
-                
-                file = drive.CreateFile({'id': sheet_id})
-                csv_content = file.GetContentString(mimetype='text/csv')
-                df_plan = pd.read_csv(StringIO(csv_content))
+                df_plan = sheets.get_sheet(sheet_id)
                 
                 if df_plan.empty:
                     return None, None
                 
-                date_from_file = file['title']
+                date_from_file = df_planning.loc[df_planning['id'] == sheet_id, 'title'].iloc[0]
                 return df_plan, date_from_file
             except Exception as e:
                 print(f"Error loading Google Sheet {sheet_id}: {e}")
                 return None, None
         
-        def aggregate_equipment(df_plan):
-            """Aggregate equipment counts from all entries"""
-            equipment_dict = {}
-            
-            for idx, row in df_plan.iterrows():
-                equipment_str = str(row.get('equipment', ''))
-                if pd.isna(equipment_str) or equipment_str == 'nan' or equipment_str == '':
-                    continue
-                
-                items = equipment_str.split(',')
-                for item in items:
-                    item = item.strip()
-                    if ':' in item:
-                        parts = item.split(':')
-                        equip_name = parts[0].strip()
-                        try:
-                            equip_count = int(parts[1].strip())
-                            equipment_dict[equip_name] = equipment_dict.get(equip_name, 0) + equip_count
-                        except:
-                            continue
-            
-            return equipment_dict
-        
-        # Get list of planning files
-        folder_id = "12V7P86iJMrceBDkU6INJ6DlpL0e9UqaM"
-        query_files = f"'{folder_id}' in parents and mimeType='application/vnd.google-apps.spreadsheet'"
-        file_list = drive.ListFile({'q': query_files}).GetList()
-        
-        files_data = []
-        for file in file_list:
-            files_data.append({
-                'title': file['title'],
-                'id': file['id']
-            })
+        def aggregate_equipment(df_plan, sheet_id):
+            """Aggregate equipment counts from all entries (ledger built once per sheet version)"""
+            ledger = ledger_cache.get(
+                f"planning:{sheet_id}", sheets.sheet_version(sheet_id), df_plan, PLANNING_EQUIPMENT_COLUMNS
+            )
+            return equipment_totals(ledger)
         
-        df_planning = pd.DataFrame(files_data)
+        # Get list of planning files (local mirror, synced when Drive changed)
+        df_planning = sheets.list_folder(PLANNING_FOLDER_ID)
         
         if df_planning.empty:
             return "No planning files found in the folder"
-                sheet_id = extract_date_from_query_to_id(query, df_planning)
+        
+        sheet_id = extract_date_from_query_to_id(query, df_planning)
         
         if sheet_id == "NO_ID":
             return f"No planning found for the specified date. Available dates: {', '.join(df_planning['title'].tolist())}"
         
-        df_plan, date_info = load_google_sheet(sheet_id)
+        # Same question on the same version of the planning sheet: cached answer
+        cache_key = tool_cache.key("planning_date_search", query, sheet_id, sheets.sheet_version(sheet_id))
+        cached = tool_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        df_plan, date_info = load_google_sheet(sheet_id, df_planning)
         if df_plan is None:
             return "Could not load the planning sheet"
         
@@ -206,25 +144,13 @@ def search_planning_by_date(query):
                                 ['equipment', 'equipement', 'needed', 'required', 'total', 'list', 'all'])
         
         if is_equipment_query and ('list' in query_lower or 'all' in query_lower or 'total' in query_lower):
-            equipment_totals = aggregate_equipment(df_plan)
+            planned_totals = aggregate_equipment(df_plan, sheet_id)
             
-            if not equipment_totals:
+            if not planned_totals:
                 return f"No equipment information found for {date_info}"
             
-            equipment_list = "\n".join([f"• {equip}: {count}" for equip, count in sorted(equipment_totals.items())])
-            
-            answer_prompt = f"""Format this equipment list in a clear, professional way based on the user's question.
-
-    User Question: {query}
-    Date: {date_info}
-
-    Equipment totals:
-    {equipment_list}
-
-    Provide a natural response with the formatted list."""
-            
-            answer = llm.predict(answer_prompt)
-            return answer.strip()
+            answer = render_equipment_totals(query, [("planned", planned_totals)], date_info=date_info)
+            return tool_cache.put(cache_key, finish_answer(query, answer, llm))
         
         texts = []
         for idx, row in df_plan.iterrows():
@@ -285,8 +211,8 @@ def search_planning_by_date(query):
 
     Answer:"""
         
-        answer = llm.predict(answer_prompt)
-        return answer.strip()
+        answer = invoke_llm(llm, answer_prompt)
+        return tool_cache.put(cache_key, answer.strip())
     
     except Exception as e:
         return f"Error searching planning: {str(e)}"
@@ -296,31 +222,21 @@ def search_planning_by_date(query):
 def search_daily_report_by_date(query):
     """Search daily reports (rapport journalier) for a specific date"""
     try:
-        def extract_date_from_query(user_query):
-            prompt = PromptTemplate(
-                input_variables=["query"],
-                template="""Extract the date from the query and return it in DD-MM-YYYY format.
-- If no date is found, return NO_DATE
-- Only return the date, nothing else.
+        context = get_agent_context()
+        llm, sheets, embedding_model = context.llm, context.sheets, context.embedding_model
 
-Query: {query}"""
-            )
-            
-            raw_response = llm.predict(prompt.format(query=user_query)).strip()
-            return raw_response
+        def extract_date_from_query(user_query):
+            # Rule-based parsing first, LLM only when no date pattern matches
+            return extract_date_ddmmyyyy(user_query, get_llm("extract"))
         
         def load_sheet_by_date(spreadsheet_id, date_str):
             """Load a specific sheet from the spreadsheet by date"""
             try:
-                if drive.auth.credentials.access_token_expired:
-                    drive.auth.LocalWebserverAuth()
-                
-                file = drive.CreateFile({'id': spreadsheet_id})
-                csv_content = file.GetContentString(mimetype='text/csv')
-                df_report = pd.read_csv(StringIO(csv_content))
+                df_report = sheets.get_sheet(spreadsheet_id)
                 
                 if df_report.empty:
                     return None, None
+                add_duration_column(df_report)
                 
                 if 'date' in df_report.columns:
                     df_report['date'] = pd.to_datetime(df_report['date'], errors='coerce').dt.strftime('%Y-%m-%d')
@@ -341,35 +257,30 @@ Query: {query}"""
                 return None, None
         
         def aggregate_equipment_from_reports(df_report, column='equipement_installee'):
-            """Aggregate equipment from report entries"""
-            equipment_dict = {}
-            
-            for idx, row in df_report.iterrows():
-                equipment_str = str(row.get(column, ''))
-                if pd.isna(equipment_str) or equipment_str == 'nan' or equipment_str == '':
-                    continue
-                
-                items = equipment_str.split(',')
-                for item in items:
-                    item = item.strip()
-                    if ':' in item:
-                        parts = item.split(':')
-                        equip_name = parts[0].strip()
-                        try:
-                            equip_count = int(parts[1].strip())
-                            equipment_dict[equip_name] = equipment_dict.get(equip_name, 0) + equip_count
-                        except:
-                            continue
-            
-            return equipment_dict
+            """Aggregate equipment from report entries (ledger of the whole sheet, built once per version)"""
+            ledger = ledger_cache.get(
+                f"daily_report:{spreadsheet_id}", sheets.sheet_version(spreadsheet_id),
+                sheets.read(spreadsheet_id), REPORT_EQUIPMENT_COLUMNS
+            )
+            return equipment_totals(ledger, REPORT_EQUIPMENT_COLUMNS[column], rows=df_report.index)
         
-        spreadsheet_id = "1c-lhkk7LPw00d5OfNiEp15CZXlVIWjUI-mI2BEYzuBs"
+        spreadsheet_id = DAILY_REPORT_SHEET_ID
         
         date_str = extract_date_from_query(query)
         
-        if date_str == "NO_DATE":
+        if date_str == NO_DATE:
             return "Please specify a date for the daily report query."
         
+        # Same question on the same version of the report sheet: cached answer
+        try:
+            sheets.sync_sheet(spreadsheet_id)
+        except Exception as e:
+            print(f"Could not sync sheet {spreadsheet_id}, using the local mirror: {e}")
+        cache_key = tool_cache.key("daily_report_search", query, date_str, sheets.sheet_version(spreadsheet_id))
+        cached = tool_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         # Load the sheet data
         df_report, date_info = load_sheet_by_date(spreadsheet_id, date_str)
         
@@ -378,27 +289,29 @@ Query: {query}"""
         
         query_lower = query.lower()
         
-        if any(keyword in query_lower for keyword in ['equipment', 'equipement', 'installed', 'installée', 'total']):
-            if 'list' in query_lower or 'all' in query_lower or 'total' in query_lower:
-                equipment_totals = aggregate_equipment_from_reports(df_report, 'equipement_installee')
-                
-                if not equipment_totals:
-                    return f"No equipment installation information found for {date_info}"
-                
-                equipment_list = "\n".join([f"• {equip}: {count}" for equip, count in sorted(equipment_totals.items())])
-                
-                answer_prompt = f"""Format this equipment installation list based on the user's question.
+        # Time on site: figures computed from the parsed entry/exit times
+        if is_time_question(query):
+            answer_prompt = f"""Answer the user's question using these computed figures. Do not recalculate them.
 
 User Question: {query}
 Date: {date_info}
 
-Equipment installed:
-{equipment_list}
+{time_on_site_text(df_report, grouping_from_query(query))}
 
-Provide a natural response with the formatted list."""
+Provide a natural, concise response."""
+            
+            answer = invoke_llm(llm, answer_prompt)
+            return tool_cache.put(cache_key, answer.strip())
+        
+        if any(keyword in query_lower for keyword in ['equipment', 'equipement', 'installed', 'installée', 'total']):
+            if 'list' in query_lower or 'all' in query_lower or 'total' in query_lower:
+                installed_totals = aggregate_equipment_from_reports(df_report, 'equipement_installee')
+                
+                if not installed_totals:
+                    return f"No equipment installation information found for {date_info}"
                 
-                answer = llm.predict(answer_prompt)
-                return answer.strip()
+                answer = render_equipment_totals(query, [("installed", installed_totals)], date_info=date_info)
+                return tool_cache.put(cache_key, finish_answer(query, answer, llm))
         
         # Handle equipment return queries
         if 'retour' in query_lower or 'return' in query_lower:
@@ -407,20 +320,8 @@ Provide a natural response with the formatted list."""
             if not equipment_returns:
                 return f"No equipment return information found for {date_info}"
             
-            equipment_list = "\n".join([f"• {equip}: {count}" for equip, count in sorted(equipment_returns.items())])
-            
-            answer_prompt = f"""Format this equipment return list based on the user's question.
-
-User Question: {query}
-Date: {date_info}
-
-Equipment returned:
-{equipment_list}
-
-Provide a natural response with the formatted list."""
-            
-            answer = llm.predict(answer_prompt)
-            return answer.strip()
+            answer = render_equipment_totals(query, [("returned", equipment_returns)], date_info=date_info)
+            return tool_cache.put(cache_key, finish_answer(query, answer, llm))
         
         texts = []
         for idx, row in df_report.iterrows():
@@ -488,234 +389,165 @@ Instructions:
 - If asked about work done, summarize the actions executed
 - If asked about constraints or problems, highlight those issues
 - If asked about remaining work, list what's left to do
-- If asked about time spent, calculate from entry/exit times
 - If asked about observations or needs, provide those details
 - Use natural language and proper formatting
-- For calculations (time, totals), perform them accurately
+- For totals, perform them accurately
 - Be specific with client names, actions, and equipment
 
 Answer:"""
         
-        answer = llm.predict(answer_prompt)
-        return answer.strip()
+        answer = invoke_llm(llm, answer_prompt)
+        return tool_cache.put(cache_key, answer.strip())
     
     except Exception as e:
         return f"Error searching daily reports: {str(e)}"
 
 
-# Tool 4: Advanced Merged Daily Reports Search
-def search_merged_data(query):
-    """Search across all daily report data for complex queries spanning multiple dates"""
+def prepare_daily_report(title: str, df: pd.DataFrame, file_id: str = None) -> pd.DataFrame:
+    """
+    Add the date / date_parsed columns of one daily report sheet (date taken from the title if missing)
+    and the duree_heures time on site (see time_on_site.py).
+
+    With a file_id, rows are indexed "<file_id>#<n>" so they keep the same label
+    in the combined frame and in the report store.
+    """
+    df = df.copy()
+    if file_id is not None:
+        df.index = [f"{file_id}#{n}" for n in range(len(df))]
+    if 'date' in df.columns:
+        df['date_parsed'] = pd.to_datetime(df['date'], errors='coerce')
+    else:
+        date_match = re.search(r'(\d{2}-\d{2}-\d{4})', title)
+        if date_match:
+            date_str = date_match.group(1)
+            df['date'] = date_str
+            df['date_parsed'] = pd.to_datetime(date_str, format='%d-%m-%Y', errors='coerce')
+    return add_duration_column(df)
+
+
+# Prepared daily reports, reused while the mirrored files are unchanged
+_reports_lock = threading.Lock()
+_reports_cache = {"version": None, "frames": {}, "combined": pd.DataFrame()}
+
+
+def load_all_daily_reports(sheets) -> pd.DataFrame:
+    """
+    Load all daily report data from multiple files in the folder.
+
+    Files come from the local mirror (changed files are fetched in parallel, see
+    SheetMirror). Only files whose modified date changed since the previous call
+    are prepared again, and the combined frame is reused while the folder is
+    unchanged; callers must not modify it. If the report store cannot be
+    updated, the version is not recorded: the frame has no version (no cached
+    answers, in-memory filtering) and the next call tries the sync again.
+    """
     try:
-        def load_all_daily_reports():
-            """Load all daily report data from multiple files in the folder"""
-            try:
-                if drive.auth.credentials.access_token_expired:
-                    drive.auth.LocalWebserverAuth()
-                
-                # Folder containing all daily reports
-                folder_id = "1t8RpUifcNYA66105dQ2QVLbNH8WAR94O"
-                query_files = f"'{folder_id}' in parents and mimeType='application/vnd.google-apps.spreadsheet'"
-                file_list = drive.ListFile({'q': query_files}).GetList()
-                
-                print(f"Found {len(file_list)} files in folder")
-                
-                all_reports = []
-                
-                for file in file_list:
+        files = sheets.list_folder(DAILY_REPORTS_FOLDER_ID)
+        version = tuple(zip(files['id'], files['modified']))
+
+        with _reports_lock:
+            if version == _reports_cache["version"]:
+                return _reports_cache["combined"]
+
+            print(f"Found {len(files)} files in folder")
+            frames = {}
+            for file in files.to_dict("records"):
+                key = (file['id'], file['modified'])
+                df = _reports_cache["frames"].get(key)
+                if df is None:
                     try:
-                        print(f"Loading: {file['title']}")
-                        sheet = drive.CreateFile({'id': file['id']})
-                        csv_content = sheet.GetContentString(mimetype='text/csv')
-                        df = pd.read_csv(StringIO(csv_content))
-                        
-                        if not df.empty:
-                            if 'date' in df.columns:
-                                df['date_parsed'] = pd.to_datetime(df['date'], errors='coerce')
-                            else:
-                                date_match = re.search(r'(\d{2}-\d{2}-\d{4})', file['title'])
-                                if date_match:
-                                    date_str = date_match.group(1)
-                                    df['date'] = date_str
-                                    df['date_parsed'] = pd.to_datetime(date_str, format='%d-%m-%Y', errors='coerce')
-                            
-                            all_reports.append(df)
-                            print(f"✓ Loaded {len(df)} entries from {file['title']}")
+                        df = prepare_daily_report(file['title'], sheets.read(file['id']), file['id'])
                     except Exception as e:
                         print(f"✗ Error loading file {file['title']}: {e}")
                         continue
-                
-                if all_reports:
-                    df_combined = pd.concat(all_reports, ignore_index=True)
-                    print(f"\n✓ Total: {len(df_combined)} entries from {len(all_reports)} files")
-                    return df_combined
-                
-                return pd.DataFrame()
-                
-            except Exception as e:
-                print(f"Error loading daily reports folder: {e}")
-                import traceback
-                traceback.print_exc()
-                return pd.DataFrame()
-        
-        def extract_filters_from_query(user_query):
-            """Use LLM to extract filtering criteria from query"""
-            filter_prompt = f"""Analyze this query and extract filtering information. Return a JSON object.
-
-Query: {user_query}
-
-Extract these fields (use null if not mentioned):
-- date_range: {{"start": "YYYY-MM-DD", "end": "YYYY-MM-DD"}} or null
-- month: month name or number (e.g., "july" or "7" or "august" or "8") or null  
-- year: year (e.g., "2025") or null
-- client: specific client name or null
-- site_manager: chef_chantier name or null
-- equipment_type: specific equipment type ONLY if user asks about PARTICULAR equipment (e.g., "camera", "alarme") or null
-- work_type: type of work/action or null
-- constraint: mentioned constraints or problems or null
-- aggregation: "list" if user asks "what", "show", "list" or "total" if user asks for counts/totals or null
-- delivery_note: BL number or null
-
-IMPORTANT: 
-- If user asks "what equipment" without specifying type, set equipment_type to null and aggregation to "list"
-- Don't filter by the word "equipment" itself
-- Recognize month names in different languages (july/juillet, august/août)
-
-Return ONLY valid JSON, nothing else."""
-            
+                if not df.empty:
+                    frames[key] = df
+
+            combined = pd.concat(frames.values()) if frames else pd.DataFrame()
             try:
-                filter_response = llm.predict(filter_prompt).strip()
-                # Clean up response
-                if '```json' in filter_response:
-                    filter_response = filter_response.split('```json')[1].split('```')[0].strip()
-                elif '```' in filter_response:
-                    filter_response = filter_response.split('```')[1].split('```')[0].strip()
-                
-                filters = json.loads(filter_response)
-                return filters
+                get_report_store().sync(frames)
             except Exception as e:
-                print(f"Error extracting filters: {e}")
-                return {}
-        
-        def apply_filters(df, filters):
-            """Apply filters to dataframe"""
-            filtered_df = df.copy()
-            
-            print(f"Starting with {len(filtered_df)} rows")
-            
-            # Date filtering
-            if 'date_parsed' in filtered_df.columns:
-                # Month filter
-                if filters.get('month'):
-                    month = str(filters['month']).lower()
-                    month_map = {
-                        'january': 1, 'janvier': 1, 'février': 2, 'february': 2, 
-                        'march': 3, 'mars': 3, 'april': 4, 'avril': 4,
-                        'may': 5, 'mai': 5, 'june': 6, 'juin': 6, 
-                        'july': 7, 'juillet': 7, 'august': 8, 'août': 8,
-                        'september': 9, 'septembre': 9, 'october': 10, 'octobre': 10, 
-                        'november': 11, 'novembre': 11, 'december': 12, 'décembre': 12,
-                        '1': 1, '2': 2, '3': 3, '4': 4, '5': 5, '6': 6,
-                        '7': 7, '8': 8, '9': 9, '10': 10, '11': 11, '12': 12
-                    }
-                    
-                    if month in month_map:
-                        month_num = month_map[month]
-                        filtered_df = filtered_df[filtered_df['date_parsed'].dt.month == month_num]
-                        print(f"After month filter ({month} = {month_num}): {len(filtered_df)} rows")
-                
-                # Year filter
-                if filters.get('year'):
-                    try:
-                        year = int(filters['year'])
-                        filtered_df = filtered_df[filtered_df['date_parsed'].dt.year == year]
-                        print(f"After year filter ({year}): {len(filtered_df)} rows")
-                    except:
-                        pass
-                
-                # Date range filter
-                if filters.get('date_range'):
-                    try:
-                        start = pd.to_datetime(filters['date_range'].get('start'))
-                        end = pd.to_datetime(filters['date_range'].get('end'))
-                        filtered_df = filtered_df[
-                            (filtered_df['date_parsed'] >= start) & 
-                            (filtered_df['date_parsed'] <= end)
-                        ]
-                        print(f"After date range filter: {len(filtered_df)} rows")
-                    except:
-                        pass
-            
-            # Client filter
-            if filters.get('client') and 'client' in filtered_df.columns:
-                client = str(filters['client']).lower()
-                filtered_df = filtered_df[
-                    filtered_df['client'].str.lower().str.contains(client, na=False, regex=False)
-                ]
-                print(f"After client filter ({client}): {len(filtered_df)} rows")
-            
-            # Site manager filter
-            if filters.get('site_manager') and 'chef_chantier' in filtered_df.columns:
-                manager = str(filters['site_manager']).lower()
-                filtered_df = filtered_df[
-                    filtered_df['chef_chantier'].str.lower().str.contains(manager, na=False, regex=False)
-                ]
-                print(f"After manager filter: {len(filtered_df)} rows")
-            
-            # Equipment TYPE filter (only if specific equipment mentioned)
-            if filters.get('equipment_type'):
-                equipment = str(filters['equipment_type']).lower()
-                equipment_columns = ['equipement_installee', 'equipement_retour']
-                
-                mask = pd.Series([False] * len(filtered_df))
-                for col in equipment_columns:
-                    if col in filtered_df.columns:
-                        mask |= filtered_df[col].str.lower().str.contains(equipment, na=False, regex=False)
-                
-                filtered_df = filtered_df[mask]
-                print(f"After equipment type filter ({equipment}): {len(filtered_df)} rows")
-            
-            return filtered_df
+                print(f"✗ Error updating report store, filtering in memory until it succeeds: {e}")
+                version = None
+            _reports_cache.update(version=version, frames=frames, combined=combined)
+            print(f"\n✓ Total: {len(combined)} entries from {len(frames)} files")
+            return combined
+
+    except Exception as e:
+        print(f"Error loading daily reports folder: {e}")
+        import traceback
+        traceback.print_exc()
+        return pd.DataFrame()
+
+
+def daily_reports_version(df_reports: pd.DataFrame):
+    """Version (file ids and modified dates) of the combined daily reports, None if not the cached frame."""
+    with _reports_lock:
+        return _reports_cache["version"] if df_reports is _reports_cache["combined"] else None
+
+
+def daily_reports_ledger(df_reports: pd.DataFrame) -> pd.DataFrame:
+    """Equipment ledger of the combined daily reports returned by load_all_daily_reports."""
+    version = daily_reports_version(df_reports)
+    return ledger_cache.get("daily_reports", version, df_reports, REPORT_EQUIPMENT_COLUMNS)
+
+
+def filter_daily_reports(df_reports: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    """
+    Rows of the combined daily reports matching the extracted filters.
+
+    The filters compile to one query on the indexed report store (see
+    report_store.py); the matching row keys select the rows of df_reports.
+    A frame the store is not in sync with (no version) is filtered in memory.
+    """
+    if daily_reports_version(df_reports) is None:
+        filtered_df = filter_frame(df_reports, filters)
+    else:
+        keys = get_report_store().query_row_keys(filters)
+        filtered_df = df_reports[df_reports.index.isin(keys)]
+    print(f"Filters {filters} matched {len(filtered_df)} of {len(df_reports)} rows")
+    return filtered_df
+
+
+# Tool 4: Advanced Merged Daily Reports Search
+def search_merged_data(query):
+    """Search across all daily report data for complex queries spanning multiple dates"""
+    try:
+        context = get_agent_context()
+        llm, sheets, embedding_model = context.llm, context.sheets, context.embedding_model
+
+        def extract_filters_from_query(user_query):
+            """Extract filtering criteria: rules and data vocabularies first, LLM for residual fields"""
+            ledger = daily_reports_ledger(df_reports)
+            return filter_extractor.extract(
+                user_query, get_llm("extract"), df_reports, daily_reports_version(df_reports),
+                equipment_names=ledger['equipment'].unique()
+            )
         
         def aggregate_equipment(df, column='equipement_installee'):
-            """Aggregate equipment from multiple rows"""
-            equipment_dict = {}
-            
-            if column not in df.columns:
-                return equipment_dict
-            
-            for idx, row in df.iterrows():
-                equipment_str = str(row.get(column, ''))
-                if pd.isna(equipment_str) or equipment_str == 'nan' or equipment_str == '':
-                    continue
-                
-                items = equipment_str.split(',')
-                for item in items:
-                    item = item.strip()
-                    if ':' in item:
-                        parts = item.split(':')
-                        equip_name = parts[0].strip()
-                        try:
-                            equip_count = int(parts[1].strip())
-                            equipment_dict[equip_name] = equipment_dict.get(equip_name, 0) + equip_count
-                        except:
-                            continue
-            
-            return equipment_dict
-        
-        filters = extract_filters_from_query(query)
-        print(f"Extracted filters: {filters}")
+            """Aggregate equipment from multiple rows (ledger built once per folder version)"""
+            ledger = daily_reports_ledger(df_reports)
+            return equipment_totals(ledger, REPORT_EQUIPMENT_COLUMNS[column], rows=df.index)
         
         print("\nLoading all daily reports...")
-        df_reports = load_all_daily_reports()
+        df_reports = load_all_daily_reports(sheets)
         
         if df_reports.empty:
             return "No daily report data available."
         
         print(f"\nLoaded {len(df_reports)} total report entries")
         
-        # Apply filters
-        df_filtered = apply_filters(df_reports, filters)
+        filters = extract_filters_from_query(query)
+        print(f"Extracted filters: {filters}")
+        
+        # Same question and filters on the same report files: cached answer
+        cache_key = tool_cache.key("merged_data_search", query, filters, daily_reports_version(df_reports))
+        cached = tool_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Apply filters (one indexed query on the report store)
+        df_filtered = filter_daily_reports(df_reports, filters)
         
         if df_filtered.empty:
             return f"No data found matching the criteria. Filters applied: {filters}\nPlease check if the date/month/client exists in the data."
@@ -724,6 +556,21 @@ Return ONLY valid JSON, nothing else."""
         
         query_lower = query.lower()
         
+        # Time on site: totals computed over every filtered row, the LLM only phrases them
+        if is_time_question(query):
+            answer_prompt = f"""Answer the user's question using these computed figures. Do not recalculate them.
+
+User Question: {query}
+Filters Applied: {filters}
+Total Records: {len(df_filtered)}
+
+{time_on_site_text(df_filtered, grouping_from_query(query))}
+
+Provide a clear, natural response with summary."""
+            
+            answer = invoke_llm(llm, answer_prompt)
+            return tool_cache.put(cache_key, answer.strip())
+        
         # Handle equipment aggregation queries
         if filters.get('aggregation') in ['list', 'total', 'count', 'sum']:
             
@@ -738,65 +585,52 @@ Return ONLY valid JSON, nothing else."""
                 if not show_installed and not show_returned:
                     show_installed = True
                 
-                result_text = ""
-                
+                sections = []
                 if show_installed and equipment_installed:
-                    equipment_list = "\n".join([f"• {equip}: {count}" for equip, count in sorted(equipment_installed.items(), key=lambda x: x[1], reverse=True)])
-                    result_text += f"Equipment Installed:\n{equipment_list}\n\n"
-                
+                    sections.append(("installed", equipment_installed))
                 if show_returned and equipment_returned:
-                    equipment_list = "\n".join([f"• {equip}: {count}" for equip, count in sorted(equipment_returned.items(), key=lambda x: x[1], reverse=True)])
-                    result_text += f"Equipment Returned:\n{equipment_list}\n"
+                    sections.append(("returned", equipment_returned))
                 
-                if not result_text:
+                if not sections:
                     return "No equipment information found for the specified criteria."
                 
-                answer_prompt = f"""Format this equipment data based on the user's question.
-
-User Question: {query}
-Filters Applied: {filters}
-Total Records: {len(df_filtered)}
-
-{result_text}
-
-Provide a clear, natural response with summary."""
-                
-                answer = llm.predict(answer_prompt)
-                return answer.strip()
-        
-        # For non-aggregation queries, use vector retrieval
-        df_sample = df_filtered.head(100) if len(df_filtered) > 100 else df_filtered
-        
-        # Build rich text representations
-        texts = []
-        for idx, row in df_sample.iterrows():
-            text = (
-                f"Date: {row.get('date', 'N/A')} | "
-                f"Client: {row.get('client', 'N/A')} | "
-                f"BL: {row.get('nom_BL', 'N/A')} | "
-                f"Manager: {row.get('chef_chantier', 'N/A')} | "
-                f"Time: {row.get('heure_entree', 'N/A')}-{row.get('heure_sortie', 'N/A')} | "
-                f"Action: {row.get('action_previsionelle_a_executer', 'N/A')} | "
-                f"Equipment Installed: {row.get('equipement_installee', 'N/A')} | "
-                f"Constraints: {row.get('contrainte_visees', 'N/A')} | "
-                f"Remaining: {row.get('reste_a_faire', 'N/A')} | "
-                f"Observations: {row.get('observation', 'N/A')}"
-            )
-            texts.append(text)
+                answer = render_equipment_totals(
+                    query, sections, records=len(df_filtered), filters=filters, by_count=True
+                )
+                return tool_cache.put(cache_key, finish_answer(query, answer, llm))
+        
+        # For non-aggregation queries, search the row index of the whole history
+        # (only rows added since the last question are embedded)
+        store = get_report_store()
+        store.index_vectors(embedding_model)
+
+        def nearest_rows(k):
+            """The k filtered rows closest to the question (rows the store does not know yet come last)."""
+            keys = store.search(embedding_model.embed_query(query), filters, k=k)
+            rows = df_filtered.loc[[key for key in keys if key in df_filtered.index]]
+            if len(rows) < min(k, len(df_filtered)):
+                rows = pd.concat([rows, df_filtered[~df_filtered.index.isin(rows.index)].head(k - len(rows))])
+            return rows
+        
+        # Many matching rows: summarize all of them (map-reduce) instead of a 20-row sample
+        if MERGED_ANSWER_MODE == "map_reduce" or (
+                MERGED_ANSWER_MODE == "auto" and len(df_filtered) > MAP_REDUCE_MIN_ROWS):
+            df_scope = df_filtered
+            if len(df_filtered) > MAP_REDUCE_MAX_ROWS:
+                df_scope = nearest_rows(MAP_REDUCE_MAX_ROWS)
+            if 'date_parsed' in df_scope.columns:
+                df_scope = df_scope.sort_values('date_parsed', kind='stable')
+            answer, complete = map_reduce_answer(
+            query, df_scope, llm, summarize_llm=get_llm("summarize"), total_matching=len(df_filtered)
+        )
+            # A run cut short by the row cap or the deadline is not cached
+            return tool_cache.put(cache_key, answer) if complete else answer
         
-        metadatas = df_sample.to_dict(orient="records")
+        df_results = nearest_rows(20)
         
-        # Create vectorstore
-        vectorstore = FAISS.from_texts(texts, embedding_model, metadatas=metadatas)
-        relevant_docs = vectorstore.similarity_search(query, k=min(20, len(texts)))
-        
-        if not relevant_docs:
+        if df_results.empty:
             return "No relevant information found."
         
-        # Format results
-        results_data = [doc.metadata for doc in relevant_docs]
-        df_results = pd.DataFrame(results_data)
-        
         # Use LLM to generate final answer
         answer_prompt = f"""You are a daily report analyst. Answer the user's question based on the data.
 
@@ -809,8 +643,8 @@ Data:
 
 Provide a comprehensive, clear answer with specific details."""
         
-        answer = llm.predict(answer_prompt)
-        return answer.strip()
+        answer = invoke_llm(llm, answer_prompt)
+        return tool_cache.put(cache_key, answer.strip())
         
     except Exception as e:
         import traceback
@@ -822,7 +656,7 @@ tools = [
     Tool(
         name="technician_search",
         description="Use this tool when user asks about technician information like mail, phone, or equipment",
-        func=search_technician,
+        func=coalesced_tool(search_technician),
         return_direct=True
     ),
     Tool(
@@ -836,7 +670,7 @@ tools = [
         - Observations or needs for tomorrow
         - Time spent on site (entry/exit times)
         - Equipment returned""",
-        func=search_daily_report_by_date,
+        func=coalesced_tool(search_daily_report_by_date),
         return_direct=True
     ),
     Tool(
@@ -848,7 +682,7 @@ tools = [
         - Which vehicles are in use on a date
         - Mission expenses for a date
         - Any other date-specific planning question""",
-        func=search_planning_by_date,
+        func=coalesced_tool(search_planning_by_date),
         return_direct=True
     ),
     Tool(
@@ -860,7 +694,7 @@ tools = [
         - Problems/constraints encountered during a period
         - Total hours worked in a month
         - Any analysis requiring data from multiple dates""",
-        func=search_merged_data,
+        func=coalesced_tool(search_merged_data),
         return_direct=True
     )
 ]
@@ -871,7 +705,7 @@ def create_agent():
     """Create and return the LangChain agent"""
     return initialize_agent(
         tools=tools,
-        llm=llm,
+        llm=get_llm("classify"),
         agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
         verbose=True,
         max_iterations=10,
@@ -880,20 +714,46 @@ def create_agent():
     )
 
 
+_agent = None
+_agent_lock = threading.Lock()
+router = IntentRouter(tools, lambda: get_agent_context().embedding_model)
+
+
+def get_agent():
+    """Return the ReAct agent, built on first use and shared by every question."""
+    global _agent
+    with _agent_lock:
+        if _agent is None:
+            _agent = create_agent()
+        return _agent
+
+
 # Main function to run the agent
-def run_agent(user_question: str) -> str:
+def run_agent(user_question: str, progress=None) -> str:
     """
     Run the technician agent to answer a question.
-    
+
+    The intent router answers with a single tool when the question clearly
+    belongs to one; otherwise the ReAct agent chooses.
+
     Args:
         user_question: User question about technicians, planning, or daily reports
+        progress: Optional callback progress(done, total, stage) for long map-reduce answers
     
     Returns:
         Agent response as string
     """
+    token = progress_callback.set(progress)
     try:
-        agent = create_agent()
-        response = agent.run(user_question)
+        if AGENT_ROUTER:
+            route = router.route(user_question)
+            if route.tool is not None:
+                print(f"Routed to {route.tool} ({route.source})")
+                return router.tools[route.tool].func(user_question)
+            print(f"No clear tool ({route.scores}), using the ReAct agent")
+        response = get_agent().run(user_question)
         return response
     except Exception as e:
         return f"Error calling agent: {str(e)}"
+    finally:
+        progress_callback.reset(token)
@@ -0,0 +1,149 @@
+"""
+Technician directory with a cached vector index.
+
+The technician sheet is embedded once per content version and the FAISS index
+kept in memory (and optionally on disk), so a lookup only embeds the question.
+The sheet comes from the local mirror (see data_sources.py), which re-downloads
+it only when its modified date changed; the index is rebuilt only when the
+content differs.
+
+A saved index holds phone numbers and emails and is loaded by unpickling, so
+only the copy of the current content is kept on disk and it is loaded only if
+its files still match the checksums written when it was saved.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import pandas as pd
+from langchain_community.vectorstores import FAISS
+from config.settings import TECHNICIAN_SHEET_ID, TECHNICIAN_INDEX_DIR
+from src.retrievers.verdict_cache import compute_index_version
+
+
+def technician_texts(df: pd.DataFrame) -> list:
+    """Text embedded for each technician row."""
+    return (
+        df['nom'].astype(str) + " " + df['telephone'].astype(str) + " "
+        + df['mail'].astype(str) + " " + df['equipement'].astype(str)
+    ).tolist()
+
+
+_INDEX_FILES = ("index.faiss", "index.pkl")
+_CHECKSUM_FILE = "checksums.json"
+
+
+def _file_checksums(path: str) -> dict:
+    checksums = {}
+    for name in _INDEX_FILES:
+        with open(os.path.join(path, name), "rb") as file:
+            checksums[name] = hashlib.sha256(file.read()).hexdigest()
+    return checksums
+
+
+def _verified(path: str) -> bool:
+    """Whether a saved index is complete and unchanged since it was saved."""
+    try:
+        with open(os.path.join(path, _CHECKSUM_FILE)) as file:
+            return json.load(file) == _file_checksums(path)
+    except (OSError, ValueError):
+        return False
+
+
+def _save_index(vectorstore, index_dir: str, content_hash: str):
+    """Save the index of content_hash with its checksums and delete the copies of older contents."""
+    path = os.path.join(index_dir, content_hash)
+    vectorstore.save_local(path)
+    with open(os.path.join(path, _CHECKSUM_FILE), "w") as file:
+        json.dump(_file_checksums(path), file)
+    for name in os.listdir(index_dir):
+        stale = os.path.join(index_dir, name)
+        if name != content_hash and os.path.isdir(stale):
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def build_technician_index(df: pd.DataFrame, embedding_model, content_hash: str = None,
+                           index_dir: str = TECHNICIAN_INDEX_DIR):
+    """
+    Build the FAISS index of the technician rows, reusing a saved copy when possible.
+
+    Args:
+        df: Technician directory
+        embedding_model: Model used to embed the rows
+        content_hash: Version of df (see compute_index_version); names the saved copy
+        index_dir: Directory of the saved index (None keeps it in memory only)
+
+    Returns:
+        FAISS vector store
+    """
+    path = os.path.join(index_dir, content_hash) if index_dir and content_hash else None
+    if path and os.path.isdir(path):
+        if not _verified(path):
+            print(f"Discarding technician index {path}: checksums do not match")
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                vectorstore = FAISS.load_local(path, embedding_model, allow_dangerous_deserialization=True)
+                print(f"✓ Technician index loaded from {path}")
+                return vectorstore
+            except Exception as e:
+                print(f"Could not load technician index from {path}: {e}")
+
+    vectorstore = FAISS.from_texts(technician_texts(df), embedding_model, metadatas=df.to_dict(orient="records"))
+    print(f"✓ Technician index built ({len(df)} rows)")
+    if path:
+        try:
+            _save_index(vectorstore, index_dir, content_hash)
+        except Exception as e:
+            print(f"Could not save technician index to {path}: {e}")
+    return vectorstore
+
+
+class TechnicianDirectory:
+    """Technician sheet plus its vector index, refreshed when the sheet changes."""
+
+    def __init__(self, context):
+        self._context = context
+        self.df = None
+        self.modified_date = None
+        self.content_hash = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Pick up a new version of the sheet and drop the index if its content changed."""
+        sheets = self._context.sheets
+        try:
+            sheets.sync_sheet(TECHNICIAN_SHEET_ID)
+        except Exception as e:
+            print(f"Error loading technician data: {e}")
+        modified_date = sheets.sheet_version(TECHNICIAN_SHEET_ID)
+
+        with self._lock:
+            if self.df is not None and modified_date == self.modified_date:
+                return
+            self.df = sheets.get_sheet(TECHNICIAN_SHEET_ID)
+            self.modified_date = modified_date
+
+            content_hash = compute_index_version(self.df) if not self.df.empty else None
+            if content_hash != self.content_hash:
+                self._index = None
+                self.content_hash = content_hash
+
+    def search(self, query: str, k: int = 3) -> list:
+        """
+        Return the k technician rows closest to the query (empty if no data).
+
+        The sheet is loaded on first use only; callers check for a new version
+        with refresh() (once per question, see search_technician).
+        """
+        if self.df is None:
+            self.refresh()
+        with self._lock:
+            if self.df is None or self.df.empty:
+                return []
+            if self._index is None:
+                self._index = build_technician_index(self.df, self._context.embedding_model, self.content_hash)
+            index = self._index
+        return index.similarity_search(query, k=k)
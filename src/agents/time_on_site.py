@@ -0,0 +1,142 @@
+"""
+Time spent on site, computed from the daily report entry and exit times.
+
+heure_entree / heure_sortie are parsed once when a report is loaded into a
+numeric duree_heures column, and totals per date, client, site manager or
+month are a pandas groupby. The LLM only phrases the computed figures instead
+of adding up times from a sample of rows.
+"""
+import re
+import pandas as pd
+
+DURATION_COLUMN = "duree_heures"
+
+# Grouping name -> column of the daily reports ("month" is derived from the date)
+GROUPINGS = {"date": "date", "client": "client", "manager": "chef_chantier", "month": "month"}
+
+# An exit before the entry is an overnight shift only for an evening entry and a
+# morning exit ("22h" -> "6h"); otherwise it is a typo and the row is not counted
+OVERNIGHT_ENTRY_FROM = 18
+OVERNIGHT_EXIT_UNTIL = 8
+
+# "8h30", "08:30", "8.30", "8h", "08:30:00", "830"
+_CLOCK = r"(?i)^\s*(?P<hour>\d{1,2})\s*(?:[h:.]\s*(?P<minute>\d{2})?(?::\d{2})?|(?P<compact>\d{2}))?\s*$"
+
+_TIME_KEYWORDS = [
+    "heures", "hours", "temps passe", "temps de travail", "time spent", "time on site",
+    "duree", "duration", "combien de temps", "how long",
+]
+
+_GROUPING_KEYWORDS = {
+    "client": [r"\b(?:par|per|by|pour chaque) clients?\b"],
+    "manager": [r"\b(?:par|per|by|pour chaque) (?:chefs?(?: de chantier)?|managers?|site managers?)\b"],
+    "date": [r"\b(?:par|per|by) (?:jour|day|date)\b", r"\bdaily breakdown\b"],
+    "month": [r"\b(?:par|per|by) mois\b", r"\b(?:per|by) month\b", r"\bmonthly\b"],
+}
+
+
+def _clock_text(value) -> str:
+    # A column of "8.30" cells is read by pandas as the float 8.3: hours.minutes
+    if isinstance(value, float):
+        return "" if pd.isna(value) else f"{value:.2f}"
+    return str(value)
+
+
+def parse_clock(values: pd.Series) -> pd.Series:
+    """Hours since midnight (float) of clock-time cells, NaN when not a time."""
+    parts = values.map(_clock_text).str.extract(_CLOCK)
+    hour = pd.to_numeric(parts["hour"], errors="coerce").astype(float)
+    minute = pd.to_numeric(parts["minute"].fillna(parts["compact"]), errors="coerce").astype(float).fillna(0)
+    hours = hour + minute / 60
+    return hours.where((hour < 24) & (minute < 60))
+
+
+def add_duration_column(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add duree_heures (hours on site) from heure_entree / heure_sortie.
+
+    An exit time earlier than the entry time is taken as the next day only for
+    an overnight shift (see OVERNIGHT_ENTRY_FROM). Rows without both times, or
+    with an exit before the entry otherwise, get NaN. df is modified in place
+    and returned.
+    """
+    if "heure_entree" in df.columns and "heure_sortie" in df.columns:
+        entry, exit_ = parse_clock(df["heure_entree"]), parse_clock(df["heure_sortie"])
+        duration = exit_ - entry
+        overnight = (duration < 0) & (entry >= OVERNIGHT_ENTRY_FROM) & (exit_ <= OVERNIGHT_EXIT_UNTIL)
+        df[DURATION_COLUMN] = duration.where(duration >= 0, (duration + 24).where(overnight))
+    else:
+        df[DURATION_COLUMN] = float("nan")
+    return df
+
+
+def format_hours(hours: float) -> str:
+    """7.5 -> "7h30"."""
+    minutes = int(round(hours * 60))
+    return f"{minutes // 60}h{minutes % 60:02d}"
+
+
+def is_time_question(query: str) -> bool:
+    """Whether the question asks about time spent on site."""
+    text = query.lower().replace("é", "e").replace("è", "e")
+    return any(keyword in text for keyword in _TIME_KEYWORDS)
+
+
+def grouping_from_query(query: str):
+    """Grouping asked for in the question ("par client", "per month", ...) or None."""
+    text = query.lower()
+    for grouping, patterns in _GROUPING_KEYWORDS.items():
+        if any(re.search(pattern, text) for pattern in patterns):
+            return grouping
+    return None
+
+
+def time_on_site(df: pd.DataFrame, by: str = None) -> pd.DataFrame:
+    """
+    Hours on site and number of visits.
+
+    Args:
+        df: Daily report rows with duree_heures (see add_duration_column)
+        by: None for a single total, or one of GROUPINGS
+
+    Returns:
+        DataFrame with columns hours, visits (rows with valid times) and
+        without_times (missing or inconsistent times), indexed by the group label ("total" when by is None),
+        largest hours first
+    """
+    if DURATION_COLUMN not in df.columns:
+        df = add_duration_column(df.copy())
+    durations = df[DURATION_COLUMN]
+
+    if by is None:
+        keys = pd.Series("total", index=df.index)
+    elif by == "month":
+        dates = df["date_parsed"] if "date_parsed" in df.columns else pd.to_datetime(df["date"], errors="coerce")
+        keys = dates.dt.strftime("%Y-%m")
+    else:
+        keys = df[GROUPINGS[by]].astype(str)
+
+    grouped = durations.groupby(keys)
+    result = pd.DataFrame({
+        "hours": grouped.sum(min_count=1).fillna(0.0),
+        "visits": grouped.count(),
+        "without_times": durations.isna().groupby(keys).sum().astype(int),
+    })
+    return result.sort_values("hours", ascending=False)
+
+
+def time_on_site_text(df: pd.DataFrame, by: str = None) -> str:
+    """Computed time-on-site figures as lines ready to be phrased by the LLM."""
+    total = time_on_site(df).iloc[0] if len(df) else None
+    if total is None or total["visits"] == 0:
+        return "No entry/exit times recorded for the selected reports."
+
+    hours, visits, without_times = float(total["hours"]), int(total["visits"]), int(total["without_times"])
+    lines = [f"Total time on site: {format_hours(hours)} ({hours:.2f} h) over {visits} visits"]
+    if without_times:
+        lines.append(f"Reports without valid entry/exit times (not counted): {without_times}")
+    if by is not None:
+        lines.append(f"By {by}:")
+        for label, row in time_on_site(df, by).iterrows():
+            lines.append(f"• {label}: {format_hours(row['hours'])} ({int(row['visits'])} visits)")
+    return "\n".join(lines)
@@ -0,0 +1,79 @@
+"""
+Result cache of the technician agent tools.
+
+Dispatch questions are asked again and again during the morning. A tool answer
+is cached under (tool, normalized question, resolved date or filters, data
+version of the sheets it read), so a repeated question is answered without the
+sheet work and LLM calls as long as the underlying sheets are unchanged. Entries
+expire after a TTL and the least recently used ones are evicted beyond the size
+limit.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from config.settings import TOOL_CACHE_TTL, TOOL_CACHE_MAX_ENTRIES
+from src.utils.singleflight import normalize_key
+
+
+class ToolResultCache:
+    """TTL + LRU cache of tool answers."""
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES, ttl: float = TOOL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(tool: str, query: str, resolved=None, version=None) -> str:
+        """
+        Build the cache key of a tool answer.
+
+        Args:
+            tool: Tool name
+            query: User question (normalized for case and spacing)
+            resolved: Date, sheet id or filter dict the question resolved to
+            version: Data version of the sheets the answer is computed from
+
+        Returns:
+            Cache key, or None (not cacheable) when the data version is unknown
+        """
+        if version is None:
+            return None
+        return normalize_key(tool, query) + "\x1e" + json.dumps([resolved, version], sort_keys=True, default=str)
+
+    def get(self, key: str):
+        """Return the cached answer, or None if missing or expired."""
+        if key is None or not self.max_entries:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[0] <= self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value):
+        """Store an answer and return it."""
+        if key is None or not self.max_entries:
+            return value
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+tool_cache = ToolResultCache()
@@ -1,19 +1,186 @@
 """
 LLM model initialization and configuration.
+
+Calls are routed by task class (see LLM_ROUTES): cheap extraction and
+classification prompts go to a small, deterministic model with a short answer
+cap, user-facing answers to the main model. Latency and token counts are kept
+per route by a callback attached to each route's model, so calls made by the
+ReAct agent and the RetrievalQA chains are counted as well as invoke_llm calls.
 """
+from langchain.callbacks.base import BaseCallbackHandler
 from langchain.chat_models import ChatOpenAI
-from config.settings import OPENAI_API_KEY, OPENAI_API_BASE, LLM_MODEL, LLM_TEMPERATURE
+from config.settings import (
+    OPENAI_API_KEY, OPENAI_API_BASE, LLM_ROUTES, DEFAULT_LLM_ROUTE,
+    LLM_RATE_LIMIT_PER_MINUTE, LLM_RATE_BURST
+)
+from src.utils.singleflight import llm_flight, normalize_key
+from src.utils.rate_limit import TokenBucket
+from src.utils.tokens import estimate_tokens
 import os
+import threading
+import time
 
 # Set environment variables
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 os.environ["OPENAI_API_BASE"] = OPENAI_API_BASE
 
+# Shared limiter for the Groq quota, used by every call going through invoke_llm
+llm_rate_limiter = TokenBucket(rate=LLM_RATE_LIMIT_PER_MINUTE / 60, capacity=LLM_RATE_BURST)
+
+
+class RouteStats:
+    """Call count, latency and token counters per LLM route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route: str, seconds: float, prompt_tokens: int, completion_tokens: int, failed: bool = False):
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                "calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+            })
+            stats["calls"] += 1
+            stats["errors"] += int(failed)
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+
+    def snapshot(self) -> list:
+        """One row per route: route, model, calls, errors, avg/max latency (s), tokens."""
+        with self._lock:
+            routes = {route: dict(stats) for route, stats in self._routes.items()}
+        rows = []
+        for route, stats in sorted(routes.items()):
+            rows.append({
+                "route": route,
+                "model": LLM_ROUTES.get(route, {}).get("model", ""),
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "avg_latency_s": round(stats["seconds"] / stats["calls"], 2) if stats["calls"] else 0.0,
+                "max_latency_s": round(stats["max_seconds"], 2),
+                "prompt_tokens": stats["prompt_tokens"],
+                "completion_tokens": stats["completion_tokens"],
+            })
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_stats = RouteStats()
+
+
+class RouteUsageCallback(BaseCallbackHandler):
+    """Record the latency and token usage of every call of a route's model in route_stats."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self._lock = threading.Lock()
+        # run_id -> (start time, estimated prompt tokens)
+        self._runs = {}
+
+    def _start(self, run_id, prompt_text: str):
+        with self._lock:
+            self._runs[run_id] = (time.monotonic(), estimate_tokens(prompt_text))
+
+    def _finish(self, run_id) -> tuple:
+        with self._lock:
+            start, prompt_tokens = self._runs.pop(run_id, (time.monotonic(), 0))
+        return time.monotonic() - start, prompt_tokens
+
+    def on_llm_start(self, serialized, prompts, *, run_id=None, **kwargs):
+        self._start(run_id, "\n".join(prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id=None, **kwargs):
+        self._start(run_id, "\n".join(str(message.content) for batch in messages for message in batch))
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs):
+        seconds, prompt_tokens = self._finish(run_id)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens") is not None and usage.get("completion_tokens") is not None:
+            prompt_tokens, completion_tokens = usage["prompt_tokens"], usage["completion_tokens"]
+        else:
+            # No usage reported by the API: estimate from the texts
+            completion_tokens = sum(
+                estimate_tokens(generation.text) for generations in response.generations for generation in generations
+            )
+        route_stats.record(self.route, seconds, prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error, *, run_id=None, **kwargs):
+        seconds, prompt_tokens = self._finish(run_id)
+        route_stats.record(self.route, seconds, prompt_tokens, 0, failed=True)
+
+
+# One model instance per route
+_llms = {}
+_llms_lock = threading.Lock()
+
+
+def get_llm(task: str = None):
+    """
+    Return the LLM of a task class, created on first use.
+
+    Args:
+        task: "extract", "classify", "answer" or "summarize" (see LLM_ROUTES);
+            None for the default route
+
+    Returns:
+        Chat model configured with the route's model, temperature, max_tokens and
+        timeout, with a RouteUsageCallback counting its calls
+    """
+    task = task or DEFAULT_LLM_ROUTE
+    if task not in LLM_ROUTES:
+        raise ValueError(f"Unknown LLM route '{task}', expected one of {sorted(LLM_ROUTES)}")
+    with _llms_lock:
+        llm = _llms.get(task)
+        if llm is None:
+            route = LLM_ROUTES[task]
+            kwargs = {"model": route["model"], "temperature": route["temperature"]}
+            if route.get("max_tokens"):
+                kwargs["max_tokens"] = route["max_tokens"]
+            if route.get("timeout"):
+                kwargs["request_timeout"] = route["timeout"]
+            llm = ChatOpenAI(callbacks=[RouteUsageCallback(task)], **kwargs)
+            _llms[task] = llm
+        return llm
+
+
+def llm_identity(llm) -> str:
+    """Describe the model configuration so different models never share results."""
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    temperature = getattr(llm, "temperature", "")
+    return f"{model}@{temperature}"
+
+
+def invoke_llm(llm, prompt: str, max_tokens: int = None) -> str:
+    """
+    Invoke the LLM and return the stripped response text.
+
+    Identical prompts sent to the same model while a call is already in flight
+    are coalesced: concurrent callers wait for the first call and share its answer.
+    Each actual call takes a token from the shared rate limiter first (its
+    usage is counted by the model's RouteUsageCallback).
+
+    Args:
+        llm: Language model instance
+        prompt: Fully formatted prompt
+        max_tokens: Optional cap on the generated tokens for this call
+
+    Returns:
+        Response content as a string
+    """
+    key = normalize_key(llm_identity(llm), str(max_tokens), prompt)
 
-def get_llm():
-    """Initialize and return the LLM model."""
-    return ChatOpenAI(
-        model=LLM_MODEL,
-        temperature=LLM_TEMPERATURE,
-    )
+    def call():
+        llm_rate_limiter.acquire()
+        if max_tokens:
+            response = llm.invoke(prompt, max_tokens=max_tokens)
+        else:
+            response = llm.invoke(prompt)
+        return getattr(response, "content", response).strip()
 
+    return llm_flight.do(key, call)
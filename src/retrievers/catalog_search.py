@@ -0,0 +1,128 @@
+"""
+Catalog-wide feature search.
+
+All spec chunks of a vendor are gathered into one in-memory matrix (reusing the
+vectors already stored in the per-product FAISS indices, no re-embedding), so a
+feature question is answered with a single vector (and optional keyword) search
+whose hits are grouped by product_code.
+"""
+import math
+import re
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+import streamlit as st
+from config.settings import CATALOG_TOP_N, CATALOG_EVIDENCE_K, CATALOG_CANDIDATE_K, CATALOG_KEYWORD_WEIGHT
+from src.retrievers.prescreen import stored_vectors
+
+_TOKEN = re.compile(r"[a-z0-9àâäçéèêëîïôöùûüÿœ]+(?:[.,-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list:
+    """Lower-case word tokens used by the keyword search."""
+    return [token for token in _TOKEN.findall(str(text).lower()) if len(token) > 1]
+
+
+class CatalogIndex:
+    """All spec chunks of a catalog with their product codes."""
+
+    def __init__(self, vectors: np.ndarray, product_codes: np.ndarray, texts: list):
+        self.vectors = vectors
+        self.product_codes = product_codes
+        self.texts = texts
+        self._postings = None
+        self._idf = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _build_keyword_index(self):
+        postings = defaultdict(list)
+        for chunk_id, text in enumerate(self.texts):
+            for token in set(tokenize(text)):
+                postings[token].append(chunk_id)
+        total = max(1, len(self.texts))
+        self._postings = {token: np.asarray(ids, dtype=np.int64) for token, ids in postings.items()}
+        self._idf = {token: math.log(1 + total / len(ids)) for token, ids in postings.items()}
+
+    def keyword_scores(self, query: str) -> np.ndarray:
+        """IDF-weighted share of the query terms present in each chunk (0..1)."""
+        if self._postings is None:
+            self._build_keyword_index()
+        scores = np.zeros(len(self.texts), dtype="float32")
+        tokens = [token for token in dict.fromkeys(tokenize(query)) if token in self._postings]
+        if not tokens:
+            return scores
+        for token in tokens:
+            scores[self._postings[token]] += self._idf[token]
+        return scores / sum(self._idf[token] for token in tokens)
+
+    def search(self, query: str, embedding_model, top_n: int = CATALOG_TOP_N, evidence_k: int = CATALOG_EVIDENCE_K,
+               use_keywords: bool = False, candidate_k: int = CATALOG_CANDIDATE_K) -> pd.DataFrame:
+        """
+        Search every chunk of the catalog and group the hits by product.
+
+        Args:
+            query: Feature question
+            embedding_model: Model the indices were built with (embeds the query only)
+            top_n: Number of products to return
+            evidence_k: Best chunks kept as evidence per product
+            use_keywords: Blend a keyword score with the vector similarity
+            candidate_k: Number of best chunks considered before grouping
+
+        Returns:
+            DataFrame with columns product_code, score, evidence (best chunks first)
+        """
+        if not len(self.texts):
+            return pd.DataFrame(columns=["product_code", "score", "evidence"])
+
+        query_vector = np.asarray(embedding_model.embed_query(query), dtype="float32")
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+        scores = self.vectors @ query_vector
+        if use_keywords:
+            scores = scores + CATALOG_KEYWORD_WEIGHT * self.keyword_scores(query)
+
+        candidate_k = min(candidate_k, len(scores))
+        candidates = np.argpartition(-scores, candidate_k - 1)[:candidate_k]
+        hits = pd.DataFrame({
+            "chunk": candidates,
+            "product_code": self.product_codes[candidates],
+            "score": scores[candidates],
+        }).sort_values("score", ascending=False)
+
+        hits["rank"] = hits.groupby("product_code").cumcount()
+        hits = hits[hits["rank"] < evidence_k]
+        hits["evidence"] = [self.texts[chunk] for chunk in hits["chunk"]]
+
+        grouped = hits.groupby("product_code", sort=False).agg(
+            score=("score", "max"),
+            evidence=("evidence", lambda chunks: "\n---\n".join(chunks))
+        )
+        return grouped.sort_values("score", ascending=False).head(top_n).reset_index()
+
+
+def build_catalog_index_uncached(specs_index: dict) -> CatalogIndex:
+    """Gather the stored chunk vectors of every product index into one CatalogIndex."""
+    all_vectors = []
+    product_codes = []
+    texts = []
+    for product_code, index in specs_index.items():
+        vectors, documents = stored_vectors(index)
+        if not len(documents):
+            continue
+        all_vectors.append(vectors)
+        product_codes.extend([product_code] * len(documents))
+        texts.extend(doc.page_content for doc in documents)
+
+    if all_vectors:
+        matrix = np.vstack(all_vectors)
+    else:
+        matrix = np.zeros((0, 0), dtype="float32")
+    print(f"✓ Catalog index: {len(texts)} chunks from {len(specs_index)} products")
+    return CatalogIndex(matrix, np.asarray(product_codes, dtype=object), texts)
+
+
+@st.cache_resource
+def build_catalog_index(vendor: str, index_version: str, _specs_index: dict) -> CatalogIndex:
+    """Cached catalog index, rebuilt when the vendor data version changes."""
+    return build_catalog_index_uncached(_specs_index)
@@ -0,0 +1,96 @@
+"""
+Embedding-similarity pre-screen for product analysis.
+
+Before asking the LLM, every selected product is scored against the question
+using the chunk vectors already stored in its FAISS index (only the question is
+embedded). Products whose best chunk is clearly unrelated to the question skip
+the CSV prompt and go straight to the PDF fallback. A high similarity only says
+the chunk is on topic ("PoE : non" is very close to "Supporte PoE ?"), so
+positive decisions are off unless CASCADE_POSITIVE_THRESHOLD is set.
+"""
+import threading
+import weakref
+import numpy as np
+from config.settings import CASCADE_NEGATIVE_THRESHOLD, CASCADE_POSITIVE_THRESHOLD
+
+# FAISS vector store -> (vectors, documents); entries go away with their index
+_vectors_cache = weakref.WeakKeyDictionary()
+_vectors_lock = threading.Lock()
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def stored_vectors(index):
+    """
+    Return the normalized chunk vectors and documents stored in a FAISS vector store.
+
+    Vectors are reconstructed from the FAISS index once and kept in memory.
+    """
+    with _vectors_lock:
+        cached = _vectors_cache.get(index)
+        if cached is not None:
+            return cached
+
+    total = index.index.ntotal
+    vectors = _normalize_rows(np.asarray(index.index.reconstruct_n(0, total), dtype="float32"))
+    documents = [index.docstore.search(index.index_to_docstore_id[i]) for i in range(total)]
+
+    with _vectors_lock:
+        _vectors_cache[index] = (vectors, documents)
+    return vectors, documents
+
+
+def score_products(query_vector, product_codes: list, specs_index: dict) -> dict:
+    """
+    Score products by the cosine similarity of their closest chunk to the query.
+
+    Returns:
+        Dictionary product_code -> (best score, best Document); products without
+        an index are left out
+    """
+    query = np.asarray(query_vector, dtype="float32")
+    query = query / (np.linalg.norm(query) or 1.0)
+    scores = {}
+    for product_code in dict.fromkeys(product_codes):
+        if product_code not in specs_index:
+            continue
+        vectors, documents = stored_vectors(specs_index[product_code])
+        if not len(documents):
+            continue
+        similarities = vectors @ query
+        best = int(np.argmax(similarities))
+        scores[product_code] = (float(similarities[best]), documents[best])
+    return scores
+
+
+def prescreen_products(query: str, product_codes: list, specs_index: dict, embedding_model,
+                       negative_threshold: float = CASCADE_NEGATIVE_THRESHOLD,
+                       positive_threshold: float = CASCADE_POSITIVE_THRESHOLD) -> dict:
+    """
+    Screen out the products whose similarity score falls outside the ambiguous band.
+
+    Args:
+        query: User question
+        product_codes: Products to screen
+        specs_index: Dictionary of CSV-based FAISS indices
+        embedding_model: Model used to embed the question (same as the indices)
+        negative_threshold: Best-chunk similarity below which the CSV chunks are
+            unrelated ("Non": the caller goes to the PDF fallback)
+        positive_threshold: Best-chunk similarity above which a product is "Oui"
+            (None, the default, disables positive decisions)
+
+    Returns:
+        Dictionary product_code -> (verdict, score, best chunk text)
+    """
+    scores = score_products(embedding_model.embed_query(query), product_codes, specs_index)
+    decided = {}
+    for product_code, (score, document) in scores.items():
+        if negative_threshold is not None and score < negative_threshold:
+            decided[product_code] = ("Non", score, document.page_content)
+        elif positive_threshold is not None and score >= positive_threshold:
+            decided[product_code] = ("Oui", score, document.page_content)
+    return decided
@@ -1,28 +1,34 @@
 """
 Product analysis functions for comparing products.
 """
+import functools
+import itertools
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import pandas as pd
 from langchain.prompts import PromptTemplate
-from config.settings import RETRIEVER_K_CSV, RETRIEVER_K_PDF
-
-
-def search_selected_products_tool_dual_df(query: str, selected_codes: list, llm, specs_index: dict, specs_index_pdf: dict):
-    """
-    Analyze products and return a DataFrame with code, correspond and justification for Hikvision.
-    
-    Args:
-        query: User question
-        selected_codes: List of product codes to analyze
-        llm: Language model instance
-        specs_index: Dictionary of CSV-based FAISS indices
-        specs_index_pdf: Dictionary of PDF-based FAISS indices
-    
-    Returns:
-        DataFrame with columns: code, correspond, justification, soures
-    """
-    decision_prompt = PromptTemplate(
-        input_variables=["context", "question", "product_code"],
-        template="""
+from config.settings import (
+    RETRIEVER_K_CSV, RETRIEVER_K_PDF, ANALYSIS_MAX_WORKERS, ANALYSIS_PRODUCT_TIMEOUT, ANALYSIS_MODE,
+    ANALYSIS_BATCH_TOKEN_BUDGET, ANALYSIS_BATCH_MAX_PRODUCTS, ANALYSIS_BATCH_OUTPUT_TOKENS,
+    ANALYSIS_SPECULATION, SPECULATIVE_PDF_PROMPT_BUDGET, ANALYSIS_FAST_MAX_TOKENS
+)
+from src.models.llm import invoke_llm
+from src.retrievers.retrieval import retrieve_product_documents
+from src.retrievers.spec_attributes import parse_attribute_conditions
+from src.retrievers.verdict_cache import get_verdict_cache
+from src.retrievers.prescreen import prescreen_products
+from src.utils.tokens import estimate_tokens
+
+
+# Bump whenever the prompts below change so cached verdicts are not reused
+PROMPT_VERSION = "1"
+
+decision_prompt = PromptTemplate(
+    input_variables=["context", "question", "product_code"],
+    template="""
 Vous êtes un ASSISTANT IA SPÉCIALISÉ en caméras de surveillance et systèmes de sécurité.
 Produit à analyser : {product_code}
 
@@ -37,11 +43,11 @@ INSTRUCTIONS :
 - Si vous n'êtes pas sûr ou si les informations sont insuffisantes, répondez "Pas clair".
 RÉPONSE :
 """
-    )
+)
 
-    pdf_prompt = PromptTemplate(
-        input_variables=["context", "question", "product_code"],
-        template="""
+pdf_prompt = PromptTemplate(
+    input_variables=["context", "question", "product_code"],
+    template="""
 Vous êtes un ASSISTANT IA SPÉCIALISÉ en caméras de surveillance et systèmes de sécurité.
 Produit à analyser : {product_code}
 
@@ -56,200 +62,805 @@ INSTRUCTIONS :
 - Utilisez toutes les informations disponibles dans le PDF.
 RÉPONSE :
 """
-    )
+)
 
-    results = []
+# Fast mode: verdict plus a one-line reason, answers capped at ANALYSIS_FAST_MAX_TOKENS
+fast_decision_prompt = PromptTemplate(
+    input_variables=["context", "question", "product_code"],
+    template="""
+Vous êtes un ASSISTANT IA SPÉCIALISÉ en caméras de surveillance et systèmes de sécurité.
+Produit à analyser : {product_code}
 
-    for product_code in selected_codes:
-        try:
-            final_docs_csv = []
-            context_df = ""
-            # CSV retriever
-            if product_code in specs_index:
-                retriever_csv = specs_index[product_code].as_retriever(search_kwargs={"k": 5})
-                docs_csv = retriever_csv.get_relevant_documents(query)
-                final_docs_csv.extend(docs_csv)
-
-            # Première analyse CSV
-            if not final_docs_csv:
-                first_response = "Pas clair"
-                context_csv = ""
-            else:
-                context_csv = "\n".join([doc.page_content for doc in final_docs_csv])
-                context_df = context_csv
-                prompt_input_csv = decision_prompt.format(
-                    context=context_csv,
-                    question=query,
-                    product_code=product_code
-                )
-                first_response = llm.invoke(prompt_input_csv).content.strip()
-
-            # PDF fallback si "Pas clair"
-            if "pas clair" in first_response.lower():
-                final_docs_pdf = []
-                if product_code in specs_index_pdf:
-                    retriever_pdf = specs_index_pdf[product_code].as_retriever(search_kwargs={"k": RETRIEVER_K_PDF})
-                    docs_pdf = retriever_pdf.get_relevant_documents(query)
-                    final_docs_pdf.extend(docs_pdf)
-
-                if final_docs_pdf:
-                    context_pdf = "\n".join([doc.page_content for doc in final_docs_pdf])
-                    context_df = context_pdf
-                    prompt_input_pdf = pdf_prompt.format(
-                        context=context_pdf,
-                        question=query,
-                        product_code=product_code
-                    )
-                    llm_response = llm.invoke(prompt_input_pdf).content.strip()
-                else:
-                    llm_response = first_response
-            else:
-                llm_response = first_response
+Spécifications techniques (CSV) :
+{context}
 
-            # Déterminer correspondance (oui/non)
-            if "oui" in llm_response.lower():
-                correspond = "Oui"
-            else:
-                correspond = "Non"
+Question : {question}
 
-            results.append({
-                "code": product_code,
-                "correspond": correspond,
-                "justification": llm_response,
-                "soures": context_df
-            })
+INSTRUCTIONS :
+- Répondez sur UNE SEULE LIGNE au format : OUI|NON|PAS CLAIR - raison en 15 mots maximum.
+- Si vous n'êtes pas sûr ou si les informations sont insuffisantes, répondez "PAS CLAIR".
+RÉPONSE :
+"""
+)
 
-        except Exception as e:
-            results.append({
-                "code": product_code,
-                "correspond": "Erreur",
-                "justification": str(e)
-            })
-            continue
+fast_pdf_prompt = PromptTemplate(
+    input_variables=["context", "question", "product_code"],
+    template="""
+Vous êtes un ASSISTANT IA SPÉCIALISÉ en caméras de surveillance et systèmes de sécurité.
+Produit à analyser : {product_code}
 
-    return pd.DataFrame(results)
+Spécifications techniques (PDF) :
+{context}
 
+Question : {question}
 
-def search_selected_products_tool_dual_df_satel(query: str, selected_codes: list, llm, specs_index_satel: dict, specs_index_pdf_satel: dict):
-    """
-    Analyze products and return a DataFrame with code, correspond and justification for Satel.
-    
-    Args:
-        query: User question
-        selected_codes: List of product codes to analyze
-        llm: Language model instance
-        specs_index_satel: Dictionary of CSV-based FAISS indices for Satel
-        specs_index_pdf_satel: Dictionary of PDF-based FAISS indices for Satel
-    
-    Returns:
-        DataFrame with columns: code, correspond, justification, soures
-    """
-    decision_prompt = PromptTemplate(
-        input_variables=["context", "question", "product_code"],
-        template="""
+INSTRUCTIONS :
+- Répondez sur UNE SEULE LIGNE au format : OUI|NON|PAS CLAIR - raison en 15 mots maximum.
+- Utilisez toutes les informations disponibles dans le PDF.
+RÉPONSE :
+"""
+)
+
+# Full justification of a fast verdict, generated only when the user asks for it
+explain_prompt = PromptTemplate(
+    input_variables=["context", "question", "product_code", "verdict"],
+    template="""
 Vous êtes un ASSISTANT IA SPÉCIALISÉ en caméras de surveillance et systèmes de sécurité.
 Produit à analyser : {product_code}
 
-Spécifications techniques (CSV) :
+Spécifications techniques :
 {context}
 
 Question : {question}
+Verdict retenu : {verdict}
 
 INSTRUCTIONS :
-- Répondez OUI ou NON de manière FACTUELLE et PRÉCISE.
-- Justifiez votre réponse même si c'est NON.
-- Si vous n'êtes pas sûr ou si les informations sont insuffisantes, répondez "Pas clair".
+- Justifiez ce verdict de manière FACTUELLE et PRÉCISE en citant les spécifications pertinentes.
+- Si les spécifications ne permettent pas de conclure, expliquez ce qui manque.
 RÉPONSE :
 """
+)
+
+
+def parse_short_verdict(llm_response: str) -> tuple:
+    """
+    Split a fast-mode answer ("OUI - raison") into its verdict and reason.
+
+    Returns:
+        (verdict, reason), verdict being "Oui", "Non" or "Pas clair"
+    """
+    text = llm_response.strip().lstrip("*# ").strip()
+    head = " ".join(text.upper().split()[:2])
+    for label in ("PAS CLAIR", "OUI", "NON"):
+        if head.startswith(label):
+            reason = text[len(label):].lstrip(" *:-–—.,").strip()
+            return label.capitalize(), reason
+    return "Pas clair", text
+
+
+def make_result_row(product_code: str, llm_response: str, context: str, fast: bool = False) -> dict:
+    """Build a result row, deciding the correspondence from the LLM answer."""
+    if fast:
+        verdict, reason = parse_short_verdict(llm_response)
+        correspond = "Oui" if verdict == "Oui" else "Non"
+        return {
+            "code": product_code,
+            "correspond": correspond,
+            "justification": f"{verdict.upper()} : {reason}" if reason else verdict.upper(),
+            "soures": context
+        }
+
+    # Déterminer correspondance (oui/non)
+    if "oui" in llm_response.lower():
+        correspond = "Oui"
+    else:
+        correspond = "Non"
+
+    return {
+        "code": product_code,
+        "correspond": correspond,
+        "justification": llm_response,
+        "soures": context
+    }
+
+
+class AnalysisCancelled(Exception):
+    """Raised in a worker whose job was abandoned by run_bounded (timeout)."""
+
+
+# Cancellation event of the run_bounded job running on the current thread
+_job_state = threading.local()
+
+
+def _current_cancel_event():
+    return getattr(_job_state, "cancel", None)
+
+
+def _invoke_llm(llm, prompt: str, max_tokens: int = None, cancel: threading.Event = None) -> str:
+    """invoke_llm, unless the job of this thread (or the given event) was cancelled."""
+    cancel = cancel or _current_cancel_event()
+    if cancel is not None and cancel.is_set():
+        raise AnalysisCancelled("analyse abandonnée après le délai")
+    return invoke_llm(llm, prompt, max_tokens=max_tokens)
+
+
+def make_error_row(product_code: str, message: str) -> dict:
+    """Build the result row reported when a product could not be analyzed."""
+    return {
+        "code": product_code,
+        "correspond": "Erreur",
+        "justification": message
+    }
+
+
+def fetch_pdf_context(query: str, product_code: str, specs_index_pdf: dict) -> str:
+    """Return the joined PDF chunks relevant to the query ("" if none)."""
+    docs_pdf = retrieve_product_documents(product_code, query, specs_index_pdf, RETRIEVER_K_PDF)
+    return "\n".join([doc.page_content for doc in docs_pdf])
+
+
+def format_pdf_prompt(query: str, product_code: str, context_pdf: str, fast: bool = False) -> str:
+    return (fast_pdf_prompt if fast else pdf_prompt).format(
+        context=context_pdf,
+        question=query,
+        product_code=product_code
     )
 
-    pdf_prompt = PromptTemplate(
-        input_variables=["context", "question", "product_code"],
-        template="""
-Vous êtes un ASSISTANT IA SPÉCIALISÉ en caméras de surveillance et systèmes de sécurité.
-Produit à analyser : {product_code}
 
-Spécifications techniques (PDF) :
-{context}
+def resolve_with_pdf(query: str, product_code: str, llm, specs_index_pdf: dict, first_response: str, context_csv: str,
+                     speculative=None, fast: bool = False) -> dict:
+    """
+    Finish the analysis of a product from its first (CSV) answer.
+
+    If the CSV answer is "Pas clair", the PDF index is searched and asked instead.
+    `speculative` is an optional Future already fetching (context_pdf, response or
+    None) in the background (see start_pdf_speculation); it is used when the PDF
+    is needed and cancelled or discarded otherwise. `fast` selects the short
+    verdict prompt and answer format.
+    """
+    context_df = context_csv
+
+    # PDF fallback si "Pas clair"
+    if "pas clair" in first_response.lower():
+        if speculative is not None:
+            context_pdf, llm_response = speculative.result()
+        else:
+            context_pdf, llm_response = fetch_pdf_context(query, product_code, specs_index_pdf), None
+
+        if context_pdf:
+            context_df = context_pdf
+            if llm_response is None:
+                llm_response = _invoke_llm(llm, format_pdf_prompt(query, product_code, context_pdf, fast),
+                                          max_tokens=ANALYSIS_FAST_MAX_TOKENS if fast else None)
+        else:
+            llm_response = first_response
+    else:
+        if speculative is not None:
+            speculative.cancel()
+        llm_response = first_response
+
+    return make_result_row(product_code, llm_response, context_df, fast)
+
+
+def explain_verdict(query: str, row: dict, llm) -> str:
+    """
+    Generate the full justification of a fast-mode result row.
+
+    Args:
+        query: Question the row answers
+        row: Result row (code, correspond, soures)
+        llm: Language model instance
+
+    Returns:
+        Detailed justification of the verdict, based on the row's sources
+    """
+    prompt = explain_prompt.format(
+        context=row.get("soures") or "Aucune spécification disponible.",
+        question=query,
+        product_code=row["code"],
+        verdict=str(row.get("correspond", "")).upper()
+    )
+    return invoke_llm(llm, prompt)
+
+
+# ---------------------------------------------------------------------------
+# Speculative PDF fallback
+# ---------------------------------------------------------------------------
+
+# Separate pool so speculative work never waits behind the product workers
+_speculation_pool = ThreadPoolExecutor(max_workers=ANALYSIS_MAX_WORKERS, thread_name_prefix="pdf-speculation")
+
+
+class SpeculationBudget:
+    """
+    Limit on speculative PDF work for one analysis.
+
+    mode "retrieval" only prefetches PDF chunks alongside the CSV prompt (no extra
+    tokens); mode "prompt" also sends the PDF prompt early for at most
+    `max_prompts` products, spending tokens that are wasted when the CSV answer
+    turns out to be decisive.
+    """
+
+    def __init__(self, mode: str, max_prompts: int = 0):
+        self.mode = mode
+        self.max_prompts = max_prompts
+        self.prompts_used = 0
+        self._lock = threading.Lock()
+
+    def try_acquire_prompt(self) -> bool:
+        if self.mode != "prompt":
+            return False
+        with self._lock:
+            if self.prompts_used >= self.max_prompts:
+                return False
+            self.prompts_used += 1
+            return True
+
+
+def start_pdf_speculation(query: str, product_code: str, llm, specs_index_pdf: dict, budget: SpeculationBudget,
+                          fast: bool = False):
+    """
+    Start fetching the PDF fallback of a product in the background.
+
+    Returns:
+        Future of (context_pdf, response or None), or None if the product has no PDF index
+    """
+    if budget is None or budget.mode not in ("retrieval", "prompt") or product_code not in specs_index_pdf:
+        return None
+
+    # Runs on the speculation pool: the cancellation event of the job is passed explicitly
+    cancel = _current_cancel_event()
+
+    def speculate():
+        context_pdf = fetch_pdf_context(query, product_code, specs_index_pdf)
+        if context_pdf and budget.try_acquire_prompt():
+            prompt = format_pdf_prompt(query, product_code, context_pdf, fast)
+            return context_pdf, _invoke_llm(llm, prompt, ANALYSIS_FAST_MAX_TOKENS if fast else None, cancel)
+        return context_pdf, None
+
+    return _speculation_pool.submit(speculate)
+
+
+def retrieve_csv_context(query: str, product_code: str, specs_index: dict) -> str:
+    """Return the joined CSV chunks relevant to the query ("" if none)."""
+    docs_csv = retrieve_product_documents(product_code, query, specs_index, 5)
+    return "\n".join([doc.page_content for doc in docs_csv])
+
+
+def analyze_product(query: str, product_code: str, llm, specs_index: dict, specs_index_pdf: dict,
+                    speculation: SpeculationBudget = None, fast: bool = False) -> dict:
+    """
+    Analyze one product: CSV verdict first, PDF fallback if the answer is "Pas clair".
+
+    With a speculation budget, the PDF fallback starts alongside the CSV prompt
+    instead of after it. In fast mode the answers are a verdict and a one-line
+    reason capped at ANALYSIS_FAST_MAX_TOKENS (see explain_verdict for the full
+    justification).
+
+    Returns:
+        Result row with keys code, correspond, justification, soures
+    """
+    try:
+        # CSV retriever
+        context_csv = retrieve_csv_context(query, product_code, specs_index)
+
+        # Première analyse CSV
+        if not context_csv:
+            first_response = "Pas clair"
+            speculative = None
+        else:
+            speculative = start_pdf_speculation(query, product_code, llm, specs_index_pdf, speculation, fast)
+            prompt_input_csv = (fast_decision_prompt if fast else decision_prompt).format(
+                context=context_csv,
+                question=query,
+                product_code=product_code
+            )
+            first_response = _invoke_llm(llm, prompt_input_csv, max_tokens=ANALYSIS_FAST_MAX_TOKENS if fast else None)
+
+        return resolve_with_pdf(query, product_code, llm, specs_index_pdf, first_response, context_csv, speculative, fast)
+
+    except Exception as e:
+        return make_error_row(product_code, str(e))
+
+
+def run_bounded(jobs: list, max_workers: int, timeout: float = None):
+    """
+    Run zero-argument jobs on a bounded thread pool.
+
+    Yields (job_index, result, timed_out) as jobs complete. A job running longer
+    than `timeout` seconds is yielded with timed_out=True and its eventual result
+    is discarded. Threads cannot be interrupted, so the job is flagged as
+    cancelled instead: its next LLM call raises AnalysisCancelled rather than
+    spending the shared rate limit and quota.
+    """
+    if not jobs:
+        return
+
+    started = {}
+    cancelled = [threading.Event() for _ in jobs]
+
+    def run(index):
+        _job_state.cancel = cancelled[index]
+        try:
+            started[index] = time.monotonic()
+            return jobs[index]()
+        finally:
+            _job_state.cancel = None
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs))))
+    try:
+        futures = {executor.submit(run, index): index for index in range(len(jobs))}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield futures[future], future.result(), False
+
+            if timeout is None:
+                continue
+            now = time.monotonic()
+            for future in list(pending):
+                index = futures[future]
+                start = started.get(index)
+                if start is not None and now - start > timeout:
+                    pending.discard(future)
+                    cancelled[index].set()
+                    future.cancel()
+                    yield index, None, True
+    finally:
+        # Also stops the jobs left running when the caller stops iterating
+        for event in cancelled:
+            event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _timeout_message(timeout: float) -> str:
+    return f"Timeout: analyse non terminée après {timeout}s"
+
+
+# ---------------------------------------------------------------------------
+# Batched mode: several products packed into one prompt, JSON verdicts
+# ---------------------------------------------------------------------------
+
+batch_decision_prompt = PromptTemplate(
+    input_variables=["products", "question"],
+    template="""
+Vous êtes un ASSISTANT IA SPÉCIALISÉ en caméras de surveillance et systèmes de sécurité.
 
 Question : {question}
 
+Produits à analyser, chacun avec ses spécifications techniques (CSV) :
+{products}
+
 INSTRUCTIONS :
-- Répondez de manière FACTUELLE et PRÉCISE.
-- Justifiez votre réponse même si c'est NON.
-- Utilisez toutes les informations disponibles dans le PDF.
+- Pour CHAQUE produit, répondez OUI ou NON de manière FACTUELLE et PRÉCISE en vous basant uniquement sur ses spécifications.
+- Justifiez chaque réponse même si c'est NON.
+- Si vous n'êtes pas sûr ou si les informations sont insuffisantes, répondez "PAS CLAIR".
+- Répondez UNIQUEMENT avec un tableau JSON contenant un objet par produit, sans texte autour :
+[{{"code": "<code produit>", "verdict": "OUI" | "NON" | "PAS CLAIR", "justification": "<justification>"}}]
 RÉPONSE :
 """
+)
+
+BATCH_VERDICTS = {"OUI": "Oui", "NON": "Non", "PAS CLAIR": "Pas clair"}
+
+
+def format_batch_products(items: list) -> str:
+    """Format (code, context) pairs as the products section of the batched prompt."""
+    return "\n".join(f"### Produit : {code}\n{context}\n" for code, context in items)
+
+
+def plan_batches(query: str, items: list, token_budget: int = ANALYSIS_BATCH_TOKEN_BUDGET,
+                 max_batch_size: int = ANALYSIS_BATCH_MAX_PRODUCTS) -> list:
+    """
+    Group (position, code, context) items into batches fitting the token budget.
+
+    The budget covers the shared instructions once plus, for every product, its
+    context and the expected answer. A product too large for the budget on its
+    own still gets a batch of one.
+    """
+    overhead = estimate_tokens(batch_decision_prompt.template) + estimate_tokens(query)
+    batches = []
+    current = []
+    used = overhead
+
+    for item in items:
+        _, code, context = item
+        cost = estimate_tokens(format_batch_products([(code, context)])) + ANALYSIS_BATCH_OUTPUT_TOKENS
+        if current and (used + cost > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            used = overhead
+        current.append(item)
+        used += cost
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _extract_json_array(response: str):
+    """Return the JSON array contained in an LLM answer (code fences tolerated)."""
+    text = response.strip()
+    if "```" in text:
+        text = text.split("```")[1]
+        if text.lower().startswith("json"):
+            text = text[4:]
+    start = text.find("[")
+    end = text.rfind("]")
+    if start == -1 or end <= start:
+        raise ValueError("no JSON array in response")
+    data = json.loads(text[start:end + 1])
+    if not isinstance(data, list):
+        raise ValueError("response is not a JSON array")
+    return data
+
+
+def parse_batch_verdicts(response: str, expected_codes: list) -> dict:
+    """
+    Validate a batched answer.
+
+    Returns:
+        Dictionary code -> (verdict, justification) for every expected code that
+        received a well-formed entry; missing or invalid entries are left out.
+    """
+    by_key = {str(code).strip().lower(): code for code in expected_codes}
+    verdicts = {}
+
+    try:
+        entries = _extract_json_array(response)
+    except ValueError:
+        return verdicts
+
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        code = by_key.get(str(entry.get("code", "")).strip().lower())
+        verdict = " ".join(str(entry.get("verdict", "")).upper().split())
+        justification = entry.get("justification")
+        if code is None or verdict not in BATCH_VERDICTS or not isinstance(justification, str):
+            continue
+        verdicts[code] = (BATCH_VERDICTS[verdict], justification.strip())
+
+    return verdicts
+
+
+def _ask_batch(query: str, items: list, llm) -> dict:
+    """Send one packed prompt for (position, code, context) items and parse the verdicts."""
+    prompt = batch_decision_prompt.format(
+        products=format_batch_products([(code, context) for _, code, context in items]),
+        question=query
     )
+    response = _invoke_llm(llm, prompt)
+    return parse_batch_verdicts(response, [code for _, code, _ in items])
+
 
-    results = []
+def analyze_batch(query: str, items: list, llm, specs_index_pdf: dict) -> dict:
+    """
+    Analyze a batch of (position, code, context) items with one packed prompt.
+
+    Products whose entry is missing or malformed are re-asked once together;
+    those still failing fall back to the single-product prompt. If the re-ask
+    itself fails, its products get an error row. "Pas clair" verdicts go
+    through the usual PDF fallback.
 
-    for product_code in selected_codes:
+    Returns:
+        Dictionary position -> result row
+    """
+    rows = {}
+    try:
+        verdicts = _ask_batch(query, items, llm)
+    except Exception as e:
+        return {position: make_error_row(code, str(e)) for position, code, _ in items}
+
+    failed = [item for item in items if item[1] not in verdicts]
+    if len(failed) > 1:
         try:
-            final_docs_csv = []
-            context_df = ""
-            # CSV retriever
-            if product_code in specs_index_satel:
-                retriever_csv = specs_index_satel[product_code].as_retriever(search_kwargs={"k": 5})
-                docs_csv = retriever_csv.get_relevant_documents(query)
-                final_docs_csv.extend(docs_csv)
-
-            # Première analyse CSV
-            if not final_docs_csv:
-                first_response = "Pas clair"
-                context_csv = ""
-            else:
-                context_csv = "\n".join([doc.page_content for doc in final_docs_csv])
-                context_df = context_csv
-                prompt_input_csv = decision_prompt.format(
-                    context=context_csv,
-                    question=query,
-                    product_code=product_code
-                )
-                first_response = llm.invoke(prompt_input_csv).content.strip()
-
-            # PDF fallback si "Pas clair"
-            if "pas clair" in first_response.lower():
-                final_docs_pdf = []
-                if product_code in specs_index_pdf_satel:
-                    retriever_pdf = specs_index_pdf_satel[product_code].as_retriever(search_kwargs={"k": RETRIEVER_K_PDF})
-                    docs_pdf = retriever_pdf.get_relevant_documents(query)
-                    final_docs_pdf.extend(docs_pdf)
-
-                if final_docs_pdf:
-                    context_pdf = "\n".join([doc.page_content for doc in final_docs_pdf])
-                    context_df = context_pdf
-                    prompt_input_pdf = pdf_prompt.format(
-                        context=context_pdf,
-                        question=query,
-                        product_code=product_code
+            verdicts.update(_ask_batch(query, failed, llm))
+        except Exception as e:
+            for position, code, _ in failed:
+                rows[position] = make_error_row(code, f"Nouvelle analyse groupée échouée : {e}")
+
+    for position, code, context in items:
+        if position in rows:
+            continue
+        try:
+            if code in verdicts:
+                verdict, justification = verdicts[code]
+                if verdict == "Pas clair":
+                    rows[position] = resolve_with_pdf(
+                        query, code, llm, specs_index_pdf, f"Pas clair : {justification}", context
                     )
-                    llm_response = llm.invoke(prompt_input_pdf).content.strip()
                 else:
-                    llm_response = first_response
+                    rows[position] = {
+                        "code": code,
+                        "correspond": verdict,
+                        "justification": f"{verdict.upper()} : {justification}",
+                        "soures": context
+                    }
             else:
-                llm_response = first_response
+                prompt_input_csv = decision_prompt.format(context=context, question=query, product_code=code)
+                first_response = _invoke_llm(llm, prompt_input_csv)
+                rows[position] = resolve_with_pdf(query, code, llm, specs_index_pdf, first_response, context)
+        except Exception as e:
+            rows[position] = make_error_row(code, str(e))
+
+    return rows
+
+
+def _analyze_screened(query: str, product_code: str, score: float, llm, specs_index_pdf: dict,
+                      fast: bool = False) -> dict:
+    """Analyze a product whose CSV chunks the pre-screen found unrelated: PDF fallback only."""
+    try:
+        first_response = f"Pas clair : spécifications CSV sans rapport avec la question (similarité {score:.2f})"
+        return resolve_with_pdf(query, product_code, llm, specs_index_pdf, first_response, "", fast=fast)
+    except Exception as e:
+        return make_error_row(product_code, str(e))
 
-            # Déterminer correspondance (oui/non)
-            if "oui" in llm_response.lower():
-                correspond = "Oui"
-            else:
-                correspond = "Non"
 
-            results.append({
-                "code": product_code,
-                "correspond": correspond,
-                "justification": llm_response,
-                "soures": context_df
-            })
+def _analyze_without_context(query: str, position: int, product_code: str, llm, specs_index_pdf: dict) -> dict:
+    """Analyze a product that has no CSV context: go straight to the PDF fallback."""
+    try:
+        return {position: resolve_with_pdf(query, product_code, llm, specs_index_pdf, "Pas clair", "")}
+    except Exception as e:
+        return {position: make_error_row(product_code, str(e))}
 
+
+def iter_selected_products_batched(query: str, selected_codes: list, llm, specs_index: dict, specs_index_pdf: dict,
+                                   max_workers: int = ANALYSIS_MAX_WORKERS, timeout: float = ANALYSIS_PRODUCT_TIMEOUT,
+                                   token_budget: int = ANALYSIS_BATCH_TOKEN_BUDGET):
+    """
+    Analyze products by packing several CSV contexts into each prompt.
+
+    Batches are sized to `token_budget` and run concurrently; `timeout` applies
+    to each batch. Products without CSV context skip straight to the PDF fallback.
+
+    Yields:
+        (position, row) pairs as batches complete, position indexing selected_codes
+    """
+    jobs = []
+    job_positions = []
+
+    packable = []
+    for position, product_code in enumerate(selected_codes):
+        try:
+            context_csv = retrieve_csv_context(query, product_code, specs_index)
         except Exception as e:
-            results.append({
-                "code": product_code,
-                "correspond": "Erreur",
-                "justification": str(e)
-            })
+            yield position, make_error_row(product_code, str(e))
             continue
+        if context_csv:
+            packable.append((position, product_code, context_csv))
+        else:
+            jobs.append(functools.partial(_analyze_without_context, query, position, product_code, llm, specs_index_pdf))
+            job_positions.append([(position, product_code)])
+
+    for batch in plan_batches(query, packable, token_budget=token_budget):
+        jobs.append(functools.partial(analyze_batch, query, batch, llm, specs_index_pdf))
+        job_positions.append([(position, code) for position, code, _ in batch])
+
+    for index, rows, timed_out in run_bounded(jobs, max_workers, timeout):
+        if timed_out:
+            for position, code in job_positions[index]:
+                yield position, make_error_row(code, _timeout_message(timeout))
+        else:
+            yield from rows.items()
+
+
+def analyze_selected_products_batched(query: str, selected_codes: list, llm, specs_index: dict, specs_index_pdf: dict,
+                                      max_workers: int = ANALYSIS_MAX_WORKERS, timeout: float = ANALYSIS_PRODUCT_TIMEOUT,
+                                      token_budget: int = ANALYSIS_BATCH_TOKEN_BUDGET) -> list:
+    """Batched analysis returning the result rows in the order of selected_codes."""
+    results = [None] * len(selected_codes)
+    for position, row in iter_selected_products_batched(
+        query, selected_codes, llm, specs_index, specs_index_pdf,
+        max_workers=max_workers, timeout=timeout, token_budget=token_budget
+    ):
+        results[position] = row
+    return results
+
+
+def answer_from_attributes(query: str, selected_codes: list, attribute_store) -> dict:
+    """
+    Decide products directly from the structured attribute table when possible.
+
+    Only applies when the question consists solely of numeric attribute conditions
+    (e.g. "résolution ≥ 4MP et IP67"); products missing one of the attributes are
+    left for the LLM.
+
+    Returns:
+        Dictionary position -> result row for the products decided without the LLM
+    """
+    conditions, complete = parse_attribute_conditions(query)
+    if not complete:
+        return {}
+
+    evaluation = attribute_store.evaluate(conditions, selected_codes)
+    rows = {}
+    for position, product_code in enumerate(selected_codes):
+        if product_code not in evaluation.index or not evaluation.at[product_code, "known"]:
+            continue
+        match = bool(evaluation.at[product_code, "match"])
+        values = attribute_store.describe_product(product_code, conditions)
+        verdict = "Oui" if match else "Non"
+        rows[position] = {
+            "code": product_code,
+            "correspond": verdict,
+            "justification": f"{verdict.upper()} : d'après les spécifications techniques ({values})",
+            "soures": f"Attributs techniques : {values}"
+        }
+    return rows
+
+
+def iter_selected_products_analysis(query: str, selected_codes: list, llm, specs_index: dict, specs_index_pdf: dict,
+                                    max_workers: int = ANALYSIS_MAX_WORKERS, timeout: float = ANALYSIS_PRODUCT_TIMEOUT,
+                                    mode: str = None, attribute_store=None, index_version: str = None,
+                                    cascade: bool = False, embedding_model=None, speculation: str = None):
+    """
+    Analyze several products and yield each result as soon as it is available.
+
+    Products answered by the attribute table, the verdict cache or the embedding
+    pre-screen come first, then LLM results in completion order. LLM calls share the global rate limiter
+    (see invoke_llm), so the pool size only bounds how many products are in
+    progress at once. A product that runs longer than `timeout` seconds is
+    reported as an error and its result discarded.
+
+    Args:
+        query: User question
+        selected_codes: List of product codes to analyze
+        llm: Language model instance
+        specs_index: Dictionary of CSV-based FAISS indices
+        specs_index_pdf: Dictionary of PDF-based FAISS indices
+        max_workers: Number of products analyzed in parallel
+        timeout: Seconds allowed per product once started (None to disable)
+        mode: "concurrent" (one prompt per product), "fast" (one prompt per product,
+            short verdicts) or "batched" (packed prompts); defaults to ANALYSIS_MODE
+        attribute_store: Optional SpecAttributeStore answering purely numeric
+            questions without the LLM
+        index_version: Version of the indices (see compute_index_version); when
+            given, verdicts are read from and written to the persistent cache
+        cascade: Pre-screen products by embedding similarity; products whose CSV
+            chunks are unrelated to the question skip the CSV prompt and go to
+            the PDF fallback (requires embedding_model)
+        embedding_model: Embedding model the indices were built with
+        speculation: "off", "retrieval" or "prompt" (defaults to ANALYSIS_SPECULATION):
+            start the PDF fallback alongside the CSV prompt; "prompt" also sends the
+            PDF prompt early for up to SPECULATIVE_PDF_PROMPT_BUDGET of the products
+            (per-product and fast modes only)
+
+    Yields:
+        (position, row) pairs, position indexing selected_codes
+    """
+    mode = mode or ANALYSIS_MODE
+    fast = mode == "fast"
+    # Fast rows carry a short justification, so they are cached separately
+    prompt_version = f"{PROMPT_VERSION}-fast" if fast else PROMPT_VERSION
+    answered = set()
+
+    if attribute_store is not None:
+        for position, row in answer_from_attributes(query, selected_codes, attribute_store).items():
+            answered.add(position)
+            yield position, row
+
+    cache = get_verdict_cache() if index_version else None
+    if cache is not None:
+        pending_codes = [code for position, code in enumerate(selected_codes) if position not in answered]
+        cached = cache.get_many(query, pending_codes, index_version, prompt_version)
+        for position, product_code in enumerate(selected_codes):
+            if position not in answered and product_code in cached:
+                answered.add(position)
+                yield position, dict(cached[product_code])
+
+    # Products whose CSV chunks are unrelated to the question: PDF fallback only
+    unrelated = {}
+    if cascade and embedding_model is not None:
+        pending_codes = [code for position, code in enumerate(selected_codes) if position not in answered]
+        screened = prescreen_products(query, pending_codes, specs_index, embedding_model)
+        for position, product_code in enumerate(selected_codes):
+            if position not in answered and product_code in screened:
+                verdict, score, chunk = screened[product_code]
+                answered.add(position)
+                if verdict == "Non":
+                    unrelated[position] = score
+                    continue
+                yield position, {
+                    "code": product_code,
+                    "correspond": verdict,
+                    "justification": f"{verdict.upper()} : décidé par similarité des spécifications (score {score:.2f})",
+                    "soures": chunk
+                }
+
+    pending = [position for position in range(len(selected_codes)) if position not in answered]
+    pending_codes = [selected_codes[position] for position in pending]
+
+    if mode == "batched":
+        rows = iter_selected_products_batched(
+            query, pending_codes, llm, specs_index, specs_index_pdf, max_workers=max_workers, timeout=timeout
+        )
+    else:
+        speculation = speculation or ANALYSIS_SPECULATION
+        budget = None
+        if speculation in ("retrieval", "prompt"):
+            budget = SpeculationBudget(speculation, math.ceil(SPECULATIVE_PDF_PROMPT_BUDGET * len(pending_codes)))
+        jobs = [
+            functools.partial(analyze_product, query, product_code, llm, specs_index, specs_index_pdf, budget, fast)
+            for product_code in pending_codes
+        ]
+        rows = (
+            (index, make_error_row(pending_codes[index], _timeout_message(timeout)) if timed_out else row)
+            for index, row, timed_out in run_bounded(jobs, max_workers, timeout)
+        )
+
+    rows = ((pending[index], row) for index, row in rows)
+    if unrelated:
+        screened_positions = list(unrelated)
+        screened_jobs = [
+            functools.partial(_analyze_screened, query, selected_codes[position], unrelated[position], llm,
+                              specs_index_pdf, fast)
+            for position in screened_positions
+        ]
+        rows = itertools.chain(rows, (
+            (screened_positions[index],
+             make_error_row(selected_codes[screened_positions[index]], _timeout_message(timeout)) if timed_out else row)
+            for index, row, timed_out in run_bounded(screened_jobs, max_workers, timeout)
+        ))
+
+    for position, row in rows:
+        if cache is not None:
+            cache.put_many(query, [row], index_version, prompt_version)
+        yield position, row
+
+
+def analyze_selected_products(query: str, selected_codes: list, llm, specs_index: dict, specs_index_pdf: dict,
+                              **options) -> list:
+    """
+    Analyze several products (see iter_selected_products_analysis for the options).
+
+    Returns:
+        List of result rows in the order of selected_codes
+    """
+    results = [None] * len(selected_codes)
+    for position, row in iter_selected_products_analysis(query, selected_codes, llm, specs_index, specs_index_pdf, **options):
+        results[position] = row
+    return results
+
 
+def search_selected_products_tool_dual_df(query: str, selected_codes: list, llm, specs_index: dict, specs_index_pdf: dict, mode: str = None, attribute_store=None, index_version: str = None):
+    """
+    Analyze products and return a DataFrame with code, correspond and justification for Hikvision.
+
+    Args:
+        query: User question
+        selected_codes: List of product codes to analyze
+        llm: Language model instance
+        specs_index: Dictionary of CSV-based FAISS indices
+        specs_index_pdf: Dictionary of PDF-based FAISS indices
+        mode: "concurrent", "fast" or "batched" (defaults to ANALYSIS_MODE)
+        attribute_store: Optional SpecAttributeStore for attribute-only questions
+        index_version: Index version enabling the persistent verdict cache
+
+    Returns:
+        DataFrame with columns: code, correspond, justification, soures
+    """
+    results = analyze_selected_products(query, selected_codes, llm, specs_index, specs_index_pdf, mode=mode, attribute_store=attribute_store, index_version=index_version)
     return pd.DataFrame(results)
 
+
+def search_selected_products_tool_dual_df_satel(query: str, selected_codes: list, llm, specs_index_satel: dict, specs_index_pdf_satel: dict, mode: str = None, attribute_store=None, index_version: str = None):
+    """
+    Analyze products and return a DataFrame with code, correspond and justification for Satel.
+
+    Args:
+        query: User question
+        selected_codes: List of product codes to analyze
+        llm: Language model instance
+        specs_index_satel: Dictionary of CSV-based FAISS indices for Satel
+        specs_index_pdf_satel: Dictionary of PDF-based FAISS indices for Satel
+        mode: "concurrent", "fast" or "batched" (defaults to ANALYSIS_MODE)
+        attribute_store: Optional SpecAttributeStore for attribute-only questions
+        index_version: Index version enabling the persistent verdict cache
+
+    Returns:
+        DataFrame with columns: code, correspond, justification, soures
+    """
+    results = analyze_selected_products(query, selected_codes, llm, specs_index_satel, specs_index_pdf_satel, mode=mode, attribute_store=attribute_store, index_version=index_version)
+    return pd.DataFrame(results)
@@ -4,6 +4,34 @@ Question-answering chains for product queries.
 from langchain.chains import RetrievalQA
 from langchain.vectorstores import FAISS
 from config.settings import RETRIEVER_K_CSV, RETRIEVER_K_PDF, RETRIEVER_K_COMBINED
+from src.models.llm import llm_identity, llm_rate_limiter
+from src.retrievers.retrieval import retrieve_product_documents
+from src.utils.singleflight import llm_flight, normalize_key
+
+
+def _answer_from_docs(product_code: str, query: str, llm, final_docs: list, embedding_model, index_key: str):
+    """
+    Run the RetrievalQA chain over the retrieved documents.
+
+    Identical questions about the same product that are already in flight
+    share a single chain run (and therefore a single LLM call).
+    """
+    def run_chain():
+        # Create a temporary retriever from combined docs
+        combined_index = FAISS.from_documents(final_docs, embedding_model)
+        combined_retriever = combined_index.as_retriever(search_kwargs={"k": RETRIEVER_K_COMBINED})
+
+        # Feed to LLM
+        qa_chain = RetrievalQA.from_chain_type(
+            llm=llm,
+            retriever=combined_retriever,
+            return_source_documents=True
+        )
+        llm_rate_limiter.acquire()
+        return qa_chain(query)
+
+    key = normalize_key("qa", llm_identity(llm), index_key, product_code, query)
+    return llm_flight.do(key, run_chain)
 
 
 def ask_product_question(product_code: str, query: str, llm, specs_index: dict, specs_index_pdf: dict, embedding_model):
@@ -24,30 +52,14 @@ def ask_product_question(product_code: str, query: str, llm, specs_index: dict,
     final_docs = []
     
     # Step 1: Search in CSV/text embeddings
-    if product_code in specs_index:
-        retriever_csv = specs_index[product_code].as_retriever(search_kwargs={"k": RETRIEVER_K_CSV})
-        docs_csv = retriever_csv.get_relevant_documents(query)
-        final_docs.extend(docs_csv)
+    final_docs.extend(retrieve_product_documents(product_code, query, specs_index, RETRIEVER_K_CSV))
     
     # Step 2: Search in PDF embeddings
-    if product_code in specs_index_pdf:
-        retriever_pdf = specs_index_pdf[product_code].as_retriever(search_kwargs={"k": RETRIEVER_K_PDF})
-        docs_pdf = retriever_pdf.get_relevant_documents(query)
-        final_docs.extend(docs_pdf)
-    
-    # Step 3: Create a temporary retriever from combined docs
-    combined_index = FAISS.from_documents(final_docs, embedding_model)
-    combined_retriever = combined_index.as_retriever(search_kwargs={"k": RETRIEVER_K_COMBINED})
-    
-    # Step 4: Feed to LLM
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=combined_retriever,
-        return_source_documents=True
-    )
+    final_docs.extend(retrieve_product_documents(product_code, query, specs_index_pdf, RETRIEVER_K_PDF))
     
-    result = qa_chain(query)
-    return result
+    # Steps 3-4: Combined retriever fed to the LLM
+    index_key = f"{id(specs_index)}:{id(specs_index_pdf)}"
+    return _answer_from_docs(product_code, query, llm, final_docs, embedding_model, index_key)
 
 
 def ask_product_question_satel(product_code: str, query: str, llm, specs_index_satel: dict, specs_index_pdf_satel: dict, embedding_model):
@@ -68,28 +80,12 @@ def ask_product_question_satel(product_code: str, query: str, llm, specs_index_s
     final_docs = []
     
     # Step 1: Search in CSV/text embeddings
-    if product_code in specs_index_satel:
-        retriever_csv = specs_index_satel[product_code].as_retriever(search_kwargs={"k": RETRIEVER_K_CSV})
-        docs_csv = retriever_csv.get_relevant_documents(query)
-        final_docs.extend(docs_csv)
+    final_docs.extend(retrieve_product_documents(product_code, query, specs_index_satel, RETRIEVER_K_CSV))
     
     # Step 2: Search in PDF embeddings
-    if product_code in specs_index_pdf_satel:
-        retriever_pdf = specs_index_pdf_satel[product_code].as_retriever(search_kwargs={"k": RETRIEVER_K_PDF})
-        docs_pdf = retriever_pdf.get_relevant_documents(query)
-        final_docs.extend(docs_pdf)
-    
-    # Step 3: Create a temporary retriever from combined docs
-    combined_index = FAISS.from_documents(final_docs, embedding_model)
-    combined_retriever = combined_index.as_retriever(search_kwargs={"k": RETRIEVER_K_COMBINED})
-    
-    # Step 4: Feed to LLM
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=combined_retriever,
-        return_source_documents=True
-    )
+    final_docs.extend(retrieve_product_documents(product_code, query, specs_index_pdf_satel, RETRIEVER_K_PDF))
     
-    result = qa_chain(query)
-    return result
+    # Steps 3-4: Combined retriever fed to the LLM
+    index_key = f"{id(specs_index_satel)}:{id(specs_index_pdf_satel)}"
+    return _answer_from_docs(product_code, query, llm, final_docs, embedding_model, index_key)
 
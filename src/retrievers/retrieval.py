@@ -0,0 +1,30 @@
+"""
+Shared retrieval helpers for FAISS indices.
+"""
+from src.utils.singleflight import retrieval_flight, normalize_key
+
+
+def retrieve_documents(index, query: str, k: int):
+    """
+    Return the k most relevant documents of a FAISS index for a query.
+
+    Identical searches on the same index that are already in flight are
+    coalesced into a single similarity search.
+
+    Args:
+        index: FAISS vector store
+        query: Search query
+        k: Number of documents to return
+
+    Returns:
+        List of Documents
+    """
+    key = normalize_key(id(index), k, query)
+    return retrieval_flight.do(key, lambda: index.as_retriever(search_kwargs={"k": k}).get_relevant_documents(query))
+
+
+def retrieve_product_documents(product_code: str, query: str, specs_index: dict, k: int):
+    """Return relevant documents for a product, or an empty list if it has no index."""
+    if product_code not in specs_index:
+        return []
+    return retrieve_documents(specs_index[product_code], query, k)
@@ -0,0 +1,412 @@
+"""
+Structured attribute store parsed from the scraped technical specifications.
+
+The scrapers flatten specifications as "category:spec_name:spec_value" (Hikvision)
+or "spec_name:spec_value" (Satel) joined by "|". This module parses them into a
+typed table (one row per product, one numeric column per normalized attribute)
+so that simple numeric questions ("résolution ≥ 4MP et IP67") can be answered for
+the whole catalog with a vectorized filter instead of one LLM call per product.
+"""
+import re
+from dataclasses import dataclass
+import pandas as pd
+import streamlit as st
+
+
+# Normalized attributes and their units
+ATTRIBUTE_UNITS = {
+    "resolution_mp": "MP",
+    "ip_rating": "IP",
+    "focal_length_min_mm": "mm",
+    "focal_length_max_mm": "mm",
+    "supply_voltage_min_v": "V",
+    "supply_voltage_max_v": "V",
+    "power_w": "W",
+    "temperature_min_c": "°C",
+    "temperature_max_c": "°C",
+}
+
+ATTRIBUTE_LABELS = {
+    "resolution_mp": "résolution",
+    "ip_rating": "indice de protection",
+    "focal_length_min_mm": "focale min",
+    "focal_length_max_mm": "focale max",
+    "supply_voltage_min_v": "tension d'alimentation min",
+    "supply_voltage_max_v": "tension d'alimentation max",
+    "power_w": "puissance",
+    "temperature_min_c": "température min",
+    "temperature_max_c": "température max",
+}
+
+_NUMBER = r"[-+−]?\d+(?:[.,]\d+)?"
+
+_RESOLUTION_NAMES = ("resolution", "résolution")
+_FOCAL_NAMES = ("focal length", "focale", "lens")
+# Spec names of the supply voltage itself (not "Tension de sortie du bloc d'alimentation" and the like)
+_VOLTAGE_NAME = re.compile(r"^(?:power supply|supply voltage|input voltage|tension d['’]alimentation|alimentation)\b")
+_VOLTAGE_EXCLUDED = ("sortie", "output")
+_VOLTAGE_RANGE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:V\s*)?(?:…|\.\.\.|-|~|à|to)\s*(\d+(?:[.,]\d+)?)\s*V")
+_VOLTAGE_VALUE = re.compile(r"(\d+(?:[.,]\d+)?)\s*V(?:DC|AC|\s*DC|\s*AC|\s*CA|\s*CC)?\b(?:\s*±\s*(\d+(?:[.,]\d+)?)\s*%)?")
+_POWER_NAMES = ("power", "consumption", "consommation", "puissance")
+_TEMPERATURE_NAMES = ("operating condition", "working temperature", "operating temperature", "temperature", "température")
+
+
+def _to_float(text: str) -> float:
+    return float(text.replace("−", "-").replace(",", "."))
+
+
+def parse_spec_pairs(specs: str, vendor: str = "hikvision") -> list:
+    """
+    Split a flattened technical_specifications field into (category, name, value) tuples.
+
+    Args:
+        specs: Flattened specifications ("|" separated)
+        vendor: "hikvision" (category:name:value) or "satel" (name:value)
+    """
+    pairs = []
+    if not isinstance(specs, str):
+        return pairs
+
+    for item in specs.split("|"):
+        if vendor == "hikvision":
+            parts = item.split(":", 2)
+            if len(parts) == 3:
+                category, name, value = parts
+            elif len(parts) == 2:
+                category, (name, value) = "", parts
+            else:
+                continue
+        else:
+            parts = item.split(":", 1)
+            if len(parts) != 2:
+                continue
+            category, (name, value) = "", parts
+        name, value = name.strip(), value.strip()
+        if name and value:
+            pairs.append((category.strip(), name, value))
+    return pairs
+
+
+# Marketed megapixels of sensor resolutions whose pixel count rounds otherwise
+# (2560 × 1440 is 3.7 million pixels but sold as 4 MP)
+MARKETED_RESOLUTIONS = {
+    (1280, 720): 1.0, (1280, 960): 1.3, (1920, 1080): 2.0, (2048, 1536): 3.0, (2304, 1296): 3.0,
+    (2560, 1440): 4.0, (2688, 1520): 4.0, (2560, 1920): 5.0, (2592, 1944): 5.0, (2880, 1620): 5.0,
+    (3072, 1728): 5.0, (3200, 1800): 6.0, (3072, 2048): 6.0, (3840, 2160): 8.0, (4096, 2160): 8.0,
+    (5120, 1440): 8.0, (7680, 2160): 16.0,
+}
+
+_MEGAPIXELS = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:MP|mégapixels?|megapixels?)\b", re.IGNORECASE)
+
+
+def _resolution_mp(value: str):
+    """Marketed resolution in MP: an explicit "N MP" first, then the standard value of W × H."""
+    match = _MEGAPIXELS.search(value)
+    if match:
+        return _to_float(match.group(1))
+    match = re.search(r"(\d{3,5})\s*[x×*]\s*(\d{3,5})", value)
+    if match:
+        width, height = int(match.group(1)), int(match.group(2))
+        if (width, height) in MARKETED_RESOLUTIONS:
+            return MARKETED_RESOLUTIONS[(width, height)]
+        megapixels = width * height / 1e6
+        return float(round(megapixels)) if megapixels >= 2 else round(megapixels, 1)
+    return None
+
+
+def _temperature_range(value: str):
+    # Ignore Fahrenheit conversions and anything after the last Celsius mark
+    text = re.sub(r"\([^)]*°\s*F[^)]*\)", "", value)
+    end = text.rfind("°C") if "°C" in text else text.rfind("° C")
+    if end == -1:
+        return None
+    numbers = [_to_float(n) for n in re.findall(_NUMBER, text[:end])]
+    if not numbers:
+        return None
+    return min(numbers), max(numbers)
+
+
+def _supply_voltage_range(value: str):
+    """
+    (min, max) supply voltage of a spec value, or None when it is not a single value or range.
+
+    "10,5…14 V DC" gives (10.5, 14), "12 VDC ± 25%" gives (9, 15). Several
+    alternative voltages ("24 VAC/12 VDC") are not a range and give None.
+    """
+    ranges = [(_to_float(low), _to_float(high)) for low, high in _VOLTAGE_RANGE.findall(value)]
+    if ranges:
+        return ranges[0] if len(set(ranges)) == 1 else None
+    values = set()
+    for number, tolerance in _VOLTAGE_VALUE.findall(value):
+        voltage = _to_float(number)
+        margin = voltage * _to_float(tolerance) / 100 if tolerance else 0.0
+        values.add((round(voltage - margin, 3), round(voltage + margin, 3)))
+    return values.pop() if len(values) == 1 else None
+
+
+def extract_attributes(pairs: list, product_name: str = "") -> dict:
+    """
+    Extract normalized numeric attributes from (category, name, value) tuples.
+
+    Returns:
+        Dictionary attribute -> float for the attributes that could be parsed
+    """
+    attributes = {}
+
+    def keep_max(key, value):
+        if value is not None and (key not in attributes or value > attributes[key]):
+            attributes[key] = value
+
+    for _, name, value in pairs:
+        lname = name.lower()
+
+        ip = re.findall(r"\bIP\s?(\d{2})\b", value)
+        if ip:
+            keep_max("ip_rating", max(float(code) for code in ip))
+
+        if any(key in lname for key in _RESOLUTION_NAMES):
+            keep_max("resolution_mp", _resolution_mp(value))
+
+        if any(key in lname for key in _FOCAL_NAMES):
+            focal = [_to_float(n) for n in re.findall(r"(\d+(?:[.,]\d+)?)(?=\s*(?:to|à|-|~|…)?\s*(?:\d+(?:[.,]\d+)?\s*)?mm\b)", value)]
+            if focal and "focal_length_min_mm" not in attributes:
+                attributes["focal_length_min_mm"] = min(focal)
+                attributes["focal_length_max_mm"] = max(focal)
+
+        if (_VOLTAGE_NAME.match(lname) and not any(key in lname for key in _VOLTAGE_EXCLUDED)
+                and "supply_voltage_min_v" not in attributes):
+            voltages = _supply_voltage_range(value)
+            if voltages:
+                attributes["supply_voltage_min_v"], attributes["supply_voltage_max_v"] = voltages
+
+        if any(key in lname for key in _POWER_NAMES):
+            watts = re.findall(r"(\d+(?:[.,]\d+)?)\s*W\b", value)
+            if watts:
+                keep_max("power_w", max(_to_float(w) for w in watts))
+
+        if any(key in lname for key in _TEMPERATURE_NAMES) and "temperature_min_c" not in attributes:
+            temperatures = _temperature_range(value)
+            if temperatures:
+                attributes["temperature_min_c"], attributes["temperature_max_c"] = temperatures
+
+    # The "N MP" of the product name is the marketed figure and wins over the specs
+    name_match = _MEGAPIXELS.search(str(product_name)) if product_name else None
+    if name_match:
+        attributes["resolution_mp"] = _to_float(name_match.group(1))
+    elif "resolution_mp" not in attributes and product_name:
+        attributes["resolution_mp"] = _resolution_mp(str(product_name))
+        if attributes["resolution_mp"] is None:
+            del attributes["resolution_mp"]
+
+    return attributes
+
+
+@dataclass
+class AttributeCondition:
+    """A numeric condition on a normalized attribute parsed from a question."""
+    attribute: str
+    op: str  # ">=", "<=", "==" or "covers" (value inside a min/max range)
+    value: float
+    text: str
+
+    def describe(self) -> str:
+        unit = ATTRIBUTE_UNITS.get(self.attribute, "")
+        if self.attribute == "ip_rating":
+            return f"IP{int(self.value)}"
+        return f"{self.op} {self.value:g} {unit}"
+
+
+class SpecAttributeStore:
+    """Columnar table of normalized attributes, one row per product_code."""
+
+    def __init__(self, table: pd.DataFrame, specs: pd.DataFrame):
+        self.table = table
+        self.specs = specs
+
+    def __len__(self):
+        return len(self.table)
+
+    def column(self, attribute: str) -> pd.Series:
+        """Return the values of one attribute for every product (NaN when unknown)."""
+        if attribute not in self.table.columns:
+            return pd.Series(float("nan"), index=self.table.index)
+        return self.table[attribute]
+
+    def evaluate(self, conditions: list, product_codes: list = None) -> pd.DataFrame:
+        """
+        Evaluate conditions for all (or the given) products with vectorized masks.
+
+        Returns:
+            DataFrame indexed by product_code with boolean columns "known"
+            (every attribute needed is present) and "match" (all conditions hold)
+        """
+        table = self.table
+        if product_codes is not None:
+            table = table.reindex(pd.Index(product_codes).unique())
+
+        known = pd.Series(True, index=table.index)
+        match = pd.Series(True, index=table.index)
+
+        def col(name):
+            return table[name] if name in table.columns else pd.Series(float("nan"), index=table.index)
+
+        for condition in conditions:
+            if condition.op == "covers":
+                low = col(condition.attribute)
+                high = col(_range_upper(condition.attribute))
+                known &= low.notna() & high.notna()
+                match &= (low <= condition.value) & (high >= condition.value)
+                continue
+
+            values = col(condition.attribute)
+            known &= values.notna()
+            if condition.op == ">=":
+                match &= values >= condition.value
+            elif condition.op == "<=":
+                match &= values <= condition.value
+            else:
+                match &= (values - condition.value).abs() < 1e-6
+
+        return pd.DataFrame({"known": known, "match": match & known})
+
+    def matching_products(self, conditions: list) -> list:
+        """Return the codes of every product of the catalog known to satisfy all conditions."""
+        evaluation = self.evaluate(conditions)
+        return evaluation.index[evaluation["match"]].tolist()
+
+    def describe_product(self, product_code: str, conditions: list) -> str:
+        """Human readable summary of the attribute values used to decide a product."""
+        row = self.table.loc[product_code] if product_code in self.table.index else pd.Series(dtype=float)
+        parts = []
+        for attribute in dict.fromkeys(_condition_attributes(conditions)):
+            value = row.get(attribute)
+            if pd.notna(value):
+                unit = ATTRIBUTE_UNITS[attribute]
+                shown = f"IP{int(value)}" if attribute == "ip_rating" else f"{value:g} {unit}"
+                parts.append(f"{ATTRIBUTE_LABELS[attribute]} : {shown}")
+        return ", ".join(parts)
+
+
+def _range_upper(attribute: str) -> str:
+    """Return the upper-bound column of a range attribute ("..._min_..." -> "..._max_...")."""
+    return attribute.replace("_min_", "_max_")
+
+
+def _condition_attributes(conditions: list) -> list:
+    attributes = []
+    for condition in conditions:
+        if condition.op == "covers":
+            attributes.append(condition.attribute)
+            attributes.append(_range_upper(condition.attribute))
+        else:
+            attributes.append(condition.attribute)
+    return attributes
+
+
+_SPEC_COLUMNS = {
+    "hikvision": ["technical_specifications"],
+    "satel": ["technical_specifications"],
+}
+
+
+def build_spec_attribute_store_uncached(df: pd.DataFrame, vendor: str = "hikvision") -> SpecAttributeStore:
+    """Parse the specification columns of a product DataFrame into a SpecAttributeStore."""
+    rows = []
+    spec_rows = []
+    for product_code, product_name, *specs in df[["product_code", "product_name"] + _SPEC_COLUMNS[vendor]].itertuples(index=False):
+        pairs = []
+        for text in specs:
+            pairs.extend(parse_spec_pairs(text, vendor))
+        attributes = extract_attributes(pairs, product_name)
+        attributes["product_code"] = product_code
+        rows.append(attributes)
+        spec_rows.extend(
+            {"product_code": product_code, "category": category, "spec_name": name, "spec_value": value}
+            for category, name, value in pairs
+        )
+
+    table = pd.DataFrame(rows, columns=["product_code"] + list(ATTRIBUTE_UNITS))
+    table = table.drop_duplicates("product_code").set_index("product_code").astype("float64")
+    specs = pd.DataFrame(spec_rows, columns=["product_code", "category", "spec_name", "spec_value"])
+    print(f"✓ Parsed attributes for {len(table)} {vendor} products ({len(specs)} spec entries)")
+    return SpecAttributeStore(table, specs)
+
+
+@st.cache_resource
+def build_spec_attribute_store(df: pd.DataFrame, vendor: str = "hikvision") -> SpecAttributeStore:
+    """Cached version of build_spec_attribute_store_uncached."""
+    return build_spec_attribute_store_uncached(df, vendor)
+
+
+# ---------------------------------------------------------------------------
+# Question parsing
+# ---------------------------------------------------------------------------
+
+_OPERATORS = [
+    (r"(?:≥|>=|au moins|at least|minimum|min\.?|plus de|more than|supérieure? (?:ou égale? )?à|greater than)", ">="),
+    (r"(?:≤|<=|au plus|at most|maximum|max\.?|moins de|less than|inférieure? (?:ou égale? )?à|below|under)", "<="),
+    (r"(?:>)", ">="),
+    (r"(?:<)", "<="),
+]
+
+_CONDITION_PATTERNS = [
+    # (attribute, regex with a "value" group, default operator); a bare "4MP" asks
+    # for a 4 MP camera, not for one of at least 4 MP
+    ("resolution_mp", r"(?P<value>\d+(?:[.,]\d+)?)\s*(?:mp|mpx|megapixels?|mégapixels?)\b", "=="),
+    ("ip_rating", r"\bip\s?(?P<value>\d{2})\b", ">="),
+    ("focal_length_min_mm", r"(?P<value>\d+(?:[.,]\d+)?)\s*mm\b", "covers"),
+    ("supply_voltage_min_v", r"(?P<value>\d+(?:[.,]\d+)?)\s*v(?:dc|ac|cc|ca)?\b", "covers"),
+    ("power_w", r"(?P<value>\d+(?:[.,]\d+)?)\s*w(?:atts?)?\b", "<="),
+    ("temperature_min_c", r"(?P<value>[-+−]?\d+(?:[.,]\d+)?)\s*°\s*c\b", "covers"),
+]
+
+# Words that may surround attribute conditions without adding any requirement.
+# Disjunctions ("ou", "or") are deliberately absent: the conditions are AND-ed,
+# so "2 MP ou IP66" must be left to the LLM.
+_FILLER_WORDS = {
+    # French
+    "est", "ce", "cette", "ces", "que", "qu", "il", "elle", "a", "y", "t", "le", "la", "les", "l", "un", "une",
+    "des", "de", "du", "d", "et", "avec", "en", "au", "aux", "pour", "par", "sur", "à", "jusqu",
+    "supporte", "possède", "fonctionne", "produit", "produits", "caméra", "caméras", "résolution", "indice",
+    "protection", "étanche", "étanchéité", "focale", "objectif", "tension", "alimentation", "consommation",
+    "puissance", "température", "fonctionnement", "moins", "plus", "égale", "supérieure", "inférieure",
+    # English
+    "is", "it", "its", "this", "does", "do", "has", "have", "the", "an", "and", "with", "of", "in",
+    "for", "to", "up", "down", "camera", "cameras", "resolution", "lens", "focal", "length", "voltage",
+    "power", "supply", "consumption", "temperature", "operating", "rated", "rating", "support", "supports",
+    "works", "work", "least", "most", "than", "more", "less",
+    # Shared
+    "minimum", "maximum", "max", "min", "ip", "?", "!", ".", ",", ":", "-",
+}
+
+
+def parse_attribute_conditions(question: str):
+    """
+    Parse numeric attribute conditions from a question.
+
+    Returns:
+        (conditions, complete): the list of AttributeCondition found, and whether
+        the question contains nothing but those conditions (so the attribute
+        table alone can answer it)
+    """
+    text = question.lower().replace("−", "-")
+    conditions = []
+    residual = text
+
+    for attribute, pattern, default_op in _CONDITION_PATTERNS:
+        for match in re.finditer(pattern, text):
+            op = default_op
+            if default_op not in ("covers",):
+                prefix = text[max(0, match.start() - 30):match.start()].rstrip()
+                for op_pattern, op_value in _OPERATORS:
+                    if re.search(op_pattern + r"\s*$", prefix):
+                        op = op_value
+                        break
+            conditions.append(AttributeCondition(attribute, op, _to_float(match.group("value")), match.group(0)))
+            residual = residual.replace(match.group(0), " ")
+
+    for op_pattern, _ in _OPERATORS:
+        residual = re.sub(op_pattern, " ", residual)
+    words = [w for w in re.findall(r"[\w]+|[?!.,:]", residual) if w not in _FILLER_WORDS]
+    complete = bool(conditions) and not words
+    return conditions, complete
@@ -0,0 +1,125 @@
+"""
+Persistent cache of product analysis verdicts.
+
+Verdicts are stored in a local SQLite database keyed by
+(normalized question, product_code, index version, prompt version), so re-running
+the same follow-up question over overlapping selections only sends the products
+that were never analyzed to the LLM.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from config.settings import VERDICT_CACHE_PATH
+from src.utils.singleflight import normalize_key
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question for cache lookups (case, whitespace, trailing punctuation)."""
+    return normalize_key(question).rstrip(" ?!.")
+
+
+def compute_index_version(df: pd.DataFrame) -> str:
+    """Fingerprint the product data the indices were built from."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+class VerdictCache:
+    """SQLite-backed store of (question, product) verdict rows."""
+
+    def __init__(self, path: str = VERDICT_CACHE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                question TEXT NOT NULL,
+                product_code TEXT NOT NULL,
+                index_version TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                correspond TEXT,
+                justification TEXT,
+                soures TEXT,
+                created_at REAL,
+                PRIMARY KEY (question, index_version, prompt_version, product_code)
+            )
+        """)
+        self._conn.commit()
+
+    def get_many(self, question: str, product_codes: list, index_version: str, prompt_version: str) -> dict:
+        """
+        Look up the cached verdicts of several products in one pass.
+
+        Returns:
+            Dictionary product_code -> result row for the codes found in the cache
+        """
+        key = normalize_question(question)
+        codes = list(dict.fromkeys(product_codes))
+        found = {}
+
+        with self._lock:
+            for start in range(0, len(codes), 500):
+                chunk = codes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self._conn.execute(
+                    f"""SELECT product_code, correspond, justification, soures FROM verdicts
+                        WHERE question = ? AND index_version = ? AND prompt_version = ?
+                        AND product_code IN ({placeholders})""",
+                    [key, index_version, prompt_version] + chunk
+                )
+                for product_code, correspond, justification, soures in cursor:
+                    found[product_code] = {
+                        "code": product_code,
+                        "correspond": correspond,
+                        "justification": justification,
+                        "soures": soures
+                    }
+        return found
+
+    def put_many(self, question: str, rows: list, index_version: str, prompt_version: str):
+        """Store result rows; error rows are never cached."""
+        key = normalize_question(question)
+        now = time.time()
+        records = [
+            (key, row["code"], index_version, prompt_version,
+             row["correspond"], row.get("justification", ""), row.get("soures", ""), now)
+            for row in rows
+            if row and row.get("correspond") in ("Oui", "Non")
+        ]
+        if not records:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                """INSERT OR REPLACE INTO verdicts
+                   (question, product_code, index_version, prompt_version, correspond, justification, soures, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                records
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every cached verdict."""
+        with self._lock:
+            self._conn.execute("DELETE FROM verdicts")
+            self._conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_verdict_cache() -> VerdictCache:
+    """Return the process-wide verdict cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = VerdictCache()
+        return _cache
@@ -5,9 +5,12 @@ import streamlit as st
 import pandas as pd
 from src.agents.technician_agent import run_agent
 from src.retrievers.qa_chains import ask_product_question, ask_product_question_satel
-from src.retrievers.product_analysis import search_selected_products_tool_dual_df, search_selected_products_tool_dual_df_satel
+from src.retrievers.product_analysis import iter_selected_products_analysis, explain_verdict
 from src.utils.session_state import add_custom_product, remove_custom_product, reset_search, initialize_session_state
 from src.utils.search import search_products_with_code
+from src.retrievers.spec_attributes import parse_attribute_conditions
+from src.models.llm import route_stats
+from config.settings import ANALYSIS_MODE, ANALYSIS_SPECULATION, CATALOG_TOP_N
 
 
 def render_technician_interface():
@@ -61,8 +64,15 @@ def render_technician_interface():
     if ask_button and user_question.strip():
         with st.spinner("🤔 Agent is working..."):
             try:
-                # Run agent
-                answer = run_agent(user_question)
+                # Run agent (progress shown when many reports are summarized)
+                progress_placeholder = st.empty()
+
+                def show_progress(done, total, stage):
+                    label = "Summarizing reports" if stage == "map" else "Combining summaries"
+                    progress_placeholder.progress(done / total if total else 1.0, text=f"{label}: {done}/{total}")
+
+                answer = run_agent(user_question, progress=show_progress)
+                progress_placeholder.empty()
                 
                 # Add to history
                 st.session_state.technicien_chat_history.append({
@@ -77,6 +87,19 @@ def render_technician_interface():
                 st.error(f"❌ Error: {str(e)}")
 
 
+def render_llm_route_stats():
+    """Render the per-route LLM call counters (latency and tokens) in the sidebar."""
+    with st.sidebar.expander("⏱️ LLM routes", expanded=False):
+        rows = route_stats.snapshot()
+        if not rows:
+            st.caption("No LLM call yet.")
+            return
+        st.dataframe(pd.DataFrame(rows).set_index("route"), use_container_width=True)
+        if st.button("Reset counters", key="reset_route_stats"):
+            route_stats.reset()
+            st.rerun()
+
+
 def render_product_chat(product_code: str, category: str, llm, specs_index: dict, specs_index_pdf: dict, embedding_model):
     """Render product chat interface."""
     st.markdown(f"### Chat about product: {product_code}")
@@ -126,7 +149,52 @@ def render_product_chat(product_code: str, category: str, llm, specs_index: dict
         })
 
 
-def render_product_search_interface(category: str, df: pd.DataFrame, llm, specs_index: dict, specs_index_pdf: dict, embedding_model):
+def render_streaming_analysis(query: str, selected_codes: list, llm, specs_index: dict, specs_index_pdf: dict, **options) -> pd.DataFrame:
+    """
+    Run a product analysis, appending each result to a live table as it completes.
+
+    Returns:
+        DataFrame of all results in the order of selected_codes
+    """
+    total = len(selected_codes)
+    progress = st.progress(0.0, text=f"0/{total} products analyzed")
+    live_table = st.empty()
+
+    results = [None] * total
+    completed = []
+    for position, row in iter_selected_products_analysis(query, selected_codes, llm, specs_index, specs_index_pdf, **options):
+        results[position] = row
+        completed.append(row)
+        progress.progress(len(completed) / total, text=f"{len(completed)}/{total} products analyzed")
+        live_table.dataframe(pd.DataFrame(completed), use_container_width=True)
+
+    progress.empty()
+    live_table.empty()
+    return pd.DataFrame(results)
+
+
+def render_full_justifications(entry: dict, entry_index: int, llm):
+    """Let the user generate the full justification of fast-mode rows one at a time."""
+    justifications = st.session_state.setdefault("full_justifications", {})
+    st.markdown("**📝 Full justifications**")
+    for row_index, row in enumerate(entry["results"].to_dict("records")):
+        if row.get("correspond") == "Erreur":
+            continue
+        key = (entry["query"], row["code"], row["correspond"])
+        with st.expander(f"{row['code']} — {row['correspond']}", expanded=key in justifications):
+            st.write(row["justification"])
+            if key in justifications:
+                st.markdown(justifications[key])
+            elif st.button("Generate full justification", key=f"explain_{entry_index}_{row_index}"):
+                with st.spinner("Generating justification..."):
+                    try:
+                        justifications[key] = explain_verdict(entry["query"], row, llm)
+                    except Exception as e:
+                        st.error(f"❌ Error: {str(e)}")
+                st.rerun()
+
+
+def render_product_search_interface(category: str, df: pd.DataFrame, llm, specs_index: dict, specs_index_pdf: dict, embedding_model, attribute_store=None, index_version=None):
     """Render product search and analysis interface."""
     # Initialize session state
     initialize_session_state()
@@ -146,6 +214,30 @@ def render_product_search_interface(category: str, df: pd.DataFrame, llm, specs_
             reset_search()
             st.rerun()
 
+    mode_labels = {"concurrent": "Per product", "fast": "Fast (short verdicts)", "batched": "Batched"}
+    mode = st.radio(
+        "Analysis mode:",
+        list(mode_labels),
+        index=list(mode_labels).index(ANALYSIS_MODE),
+        format_func=mode_labels.get,
+        horizontal=True,
+        help="Fast returns a verdict with a one-line reason (full justification on demand); "
+             "Batched packs several products into each LLM prompt to save tokens"
+    )
+    speculation_labels = {"off": "On demand", "retrieval": "Prefetch PDF", "prompt": "Speculative PDF prompt"}
+    speculation = st.radio(
+        "PDF fallback:",
+        list(speculation_labels),
+        index=list(speculation_labels).index(ANALYSIS_SPECULATION),
+        format_func=speculation_labels.get,
+        horizontal=True,
+        help="Start the PDF fallback alongside the CSV prompt to cut latency (the speculative prompt spends extra tokens)"
+    )
+    cascade = st.checkbox(
+        "Pre-screen products by similarity",
+        help="Skip the CSV prompt for products whose specifications are unrelated to the question (PDF fallback only)"
+    )
+
     # Section: Custom Product Management
     with st.expander("➕ Manage Custom Product Codes", expanded=False):
         st.markdown("**Add individual product codes manually:**")
@@ -209,6 +301,8 @@ def render_product_search_interface(category: str, df: pd.DataFrame, llm, specs_
                     
                     # Display results table
                     st.dataframe(entry["results"], use_container_width=True)
+                    if entry.get("mode") == "fast":
+                        render_full_justifications(entry, i, llm)
                     
                     # Product selection with Select All functionality
                     all_products = entry["analyzed_products"]
@@ -324,29 +418,30 @@ def render_product_search_interface(category: str, df: pd.DataFrame, llm, specs_
                         )
                         
                         if followup_query and st.button(f"🚀 Analyze Selected Products", key=f"analyze_{i}"):
-                            with st.spinner("Performing detailed analysis..."):
-                                # Perform follow-up analysis
-                                if category == "Hikvision Product":
-                                    df_followup = search_selected_products_tool_dual_df(followup_query, selected, llm, specs_index, specs_index_pdf)
-                                else:  # Satel Product
-                                    df_followup = search_selected_products_tool_dual_df_satel(followup_query, selected, llm, specs_index, specs_index_pdf)
-                                
-                                st.markdown(f"### 🔍 Follow-up Analysis: '{followup_query}'")
-                                
-                                # Display results
-                                st.dataframe(df_followup, use_container_width=True)
-                                
-                                # Save results to history
-                                st.session_state["history"].append({
-                                    "query": followup_query,
-                                    "analyzed_products": selected,
-                                    "results": df_followup,
-                                    "type": "followup",
-                                    "code_configuration": product_codes
-                                })
-                                
-                                st.success("✅ Analysis completed and saved to history!")
-                                st.rerun()
+                            st.markdown(f"### 🔍 Follow-up Analysis: '{followup_query}'")
+                            
+                            # Perform follow-up analysis, showing results as they arrive
+                            df_followup = render_streaming_analysis(
+                                followup_query, selected, llm, specs_index, specs_index_pdf,
+                                mode=mode, attribute_store=attribute_store, index_version=index_version,
+                                cascade=cascade, embedding_model=embedding_model, speculation=speculation
+                            )
+                            
+                            # Display results
+                            st.dataframe(df_followup, use_container_width=True)
+                            
+                            # Save results to history
+                            st.session_state["history"].append({
+                                "query": followup_query,
+                                "analyzed_products": selected,
+                                "results": df_followup,
+                                "type": "followup",
+                                "code_configuration": product_codes,
+                                "mode": mode
+                            })
+                            
+                            st.success("✅ Analysis completed and saved to history!")
+                            st.rerun()
 
         # Direct custom product analysis
         if st.session_state["custom_products"]:
@@ -384,24 +479,77 @@ def render_product_search_interface(category: str, df: pd.DataFrame, llm, specs_
                     )
                     
                     if custom_query and st.button("🚀 Analyze Custom Products"):
-                        with st.spinner("Analyzing custom products..."):
-                            if category == "Hikvision Product":
-                                df_custom = search_selected_products_tool_dual_df(custom_query, custom_selected, llm, specs_index, specs_index_pdf)
-                            else:  # Satel Product
-                                df_custom = search_selected_products_tool_dual_df_satel(custom_query, custom_selected, llm, specs_index, specs_index_pdf)
-                            
-                            st.markdown(f"### 🔍 Custom Product Analysis: '{custom_query}'")
-                            st.dataframe(df_custom, use_container_width=True)
-                            
-                            # Save to history
-                            st.session_state["history"].append({
-                                "query": custom_query,
-                                "analyzed_products": custom_selected,
-                                "results": df_custom,
-                                "type": "custom",
-                                "code_configuration": custom_codes
-                            })
-                            
-                            st.success("✅ Custom analysis completed!")
-                            st.rerun()
+                        st.markdown(f"### 🔍 Custom Product Analysis: '{custom_query}'")
+                        df_custom = render_streaming_analysis(
+                            custom_query, custom_selected, llm, specs_index, specs_index_pdf,
+                            mode=mode, attribute_store=attribute_store, index_version=index_version,
+                            cascade=cascade, embedding_model=embedding_model, speculation=speculation
+                        )
+                        st.dataframe(df_custom, use_container_width=True)
+                        
+                        # Save to history
+                        st.session_state["history"].append({
+                            "query": custom_query,
+                            "analyzed_products": custom_selected,
+                            "results": df_custom,
+                            "type": "custom",
+                            "code_configuration": custom_codes,
+                            "mode": mode
+                        })
+                        
+                        st.success("✅ Custom analysis completed!")
+                        st.rerun()
+
+
+
+def render_catalog_search_interface(category: str, df: pd.DataFrame, catalog_index, embedding_model, attribute_store=None):
+    """Render the catalog-wide feature search interface."""
+    st.markdown("### 🌐 Search the Whole Catalog")
+    st.caption(f"{len(catalog_index)} specification chunks indexed for {category}")
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        feature_query = st.text_input(
+            "Describe the feature you are looking for:",
+            key=f"catalog_query_{category}",
+            placeholder="e.g., caméra 4MP IP67, détecteur sans fil extérieur..."
+        )
+    with col2:
+        top_n = st.number_input("Products", min_value=1, max_value=100, value=CATALOG_TOP_N, key=f"catalog_top_n_{category}")
+
+    use_keywords = st.checkbox("Also match keywords", key=f"catalog_keywords_{category}")
+
+    if not feature_query:
+        return
+
+    names = df.drop_duplicates("product_code").set_index("product_code")["product_name"]
+
+    # Purely numeric questions are answered from the attribute table
+    if attribute_store is not None:
+        conditions, complete = parse_attribute_conditions(feature_query)
+        if complete:
+            codes = attribute_store.matching_products(conditions)
+            st.markdown(f"### ✅ {len(codes)} products match {', '.join(c.describe() for c in conditions)}")
+            df_matches = pd.DataFrame({
+                "product_code": codes,
+                "product_name": [names.get(code, "") for code in codes],
+                "attributes": [attribute_store.describe_product(code, conditions) for code in codes]
+            })
+            st.dataframe(df_matches, use_container_width=True)
+            return
+
+    with st.spinner("Searching the catalog..."):
+        df_hits = catalog_index.search(feature_query, embedding_model, top_n=int(top_n), use_keywords=use_keywords)
+
+    if df_hits.empty:
+        st.warning(f"❌ No results found for: '{feature_query}'")
+        return
+
+    df_hits.insert(1, "product_name", [names.get(code, "") for code in df_hits["product_code"]])
+    st.markdown(f"### ✅ Top {len(df_hits)} products for '{feature_query}':")
+    st.dataframe(df_hits[["product_code", "product_name", "score"]], use_container_width=True)
 
+    for _, hit in df_hits.iterrows():
+        with st.expander(f"{hit['product_code']} — {hit['product_name']} ({hit['score']:.2f})"):
+            for chunk in hit["evidence"].split("\n---\n"):
+                st.markdown(f"- {chunk[:300]}")
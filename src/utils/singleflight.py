@@ -0,0 +1,99 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+
+When several threads (concurrent users, Streamlit reruns) ask for the same
+result at the same time, only the first caller runs the function; the others
+wait for it and receive the same result (or exception).
+"""
+import threading
+
+
+def normalize_key(*parts) -> str:
+    """
+    Build a coalescing key from several parts.
+
+    Text parts are lower-cased and their whitespace collapsed so that prompts
+    differing only in case or spacing share the same key.
+    """
+    return "\x1f".join(" ".join(str(part).lower().split()) for part in parts)
+
+
+class _Call:
+    """State of one in-flight call shared by the leader and its followers."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and share its outcome."""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn):
+        """
+        Run fn() unless a call with the same key is already in flight.
+
+        Args:
+            key: Coalescing key (see normalize_key)
+            fn: Zero-argument callable producing the result
+
+        Returns:
+            The result of fn(), shared by every concurrent caller of the key
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def in_flight(self) -> int:
+        """Return the number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> dict:
+        """Return counters of executed and coalesced calls."""
+        return {
+            "name": self.name,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight(),
+        }
+
+
+# Shared groups used across the application
+llm_flight = SingleFlight("llm")
+retrieval_flight = SingleFlight("retrieval")
@@ -0,0 +1,17 @@
+"""
+Token counting helpers used to size prompts.
+"""
+import functools
+import tiktoken
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text (cl100k encoding, close enough for Llama)."""
+    if not text:
+        return 0
+    return len(_encoding().encode(text, disallowed_special=()))
@@ -0,0 +1,74 @@
+"""Rule-based date parser checked against a corpus of technician phrasings."""
+from datetime import date
+import pytest
+from src.agents.date_parser import parse_date_range, extract_date_ddmmyyyy, NO_DATE
+
+# Reference day: Wednesday 20 August 2025
+TODAY = date(2025, 8, 20)
+
+CORPUS = [
+    ("Qu'est-ce que Karim a fait le 12 août ?", ("2025-08-12", "2025-08-12")),
+    ("Quel est le planning du 05-08-2025", ("2025-08-05", "2025-08-05")),
+    ("planning 5/8/2025 équipe 2", ("2025-08-05", "2025-08-05")),
+    ("rapport journalier du 2025-08-14", ("2025-08-14", "2025-08-14")),
+    ("Quels équipements ont été installés le 1er août 2025 ?", ("2025-08-01", "2025-08-01")),
+    ("qu'est ce qui a été fait hier chez le client Vermeg", ("2025-08-19", "2025-08-19")),
+    ("rapport d'avant-hier", ("2025-08-18", "2025-08-18")),
+    ("Qui travaille demain ?", ("2025-08-21", "2025-08-21")),
+    ("planning d'aujourd'hui", ("2025-08-20", "2025-08-20")),
+    ("What did the team do yesterday?", ("2025-08-19", "2025-08-19")),
+    ("What is Ahmed doing on August 22?", ("2025-08-22", "2025-08-22")),
+    ("Show the daily report for the 3rd of August", ("2025-08-03", "2025-08-03")),
+    ("equipment installed on 14/08", ("2025-08-14", "2025-08-14")),
+    ("rapport du 12.08.25", ("2025-08-12", "2025-08-12")),
+    ("il y a 3 jours, quelles contraintes ?", ("2025-08-17", "2025-08-17")),
+    ("il y a deux jours", ("2025-08-18", "2025-08-18")),
+    ("2 days ago at the Sfax site", ("2025-08-18", "2025-08-18")),
+    ("travaux de lundi dernier", ("2025-08-18", "2025-08-18")),
+    ("What happened last friday?", ("2025-08-15", "2025-08-15")),
+    ("planning de vendredi prochain", ("2025-08-22", "2025-08-22")),
+    ("rapport de mardi", ("2025-08-19", "2025-08-19")),
+    ("équipements utilisés du 1 au 15 juillet", ("2025-07-01", "2025-07-15")),
+    ("from 01/08/2025 to 05/08/2025", ("2025-08-01", "2025-08-05")),
+    ("between August 4 and August 8", ("2025-08-04", "2025-08-08")),
+    ("entre le 10 juillet et le 12 juillet", ("2025-07-10", "2025-07-12")),
+    ("Quel matériel a été installé en juillet ?", ("2025-07-01", "2025-07-31")),
+    ("Quel matériel a été installé en août ?", ("2025-08-01", "2025-08-31")),
+    ("rapports en aout 2024", ("2024-08-01", "2024-08-31")),
+    ("total equipment used in august 2025", ("2025-08-01", "2025-08-31")),
+    ("Travaux réalisés pour Tunisie Telecom en mai", ("2025-05-01", "2025-05-31")),
+    ("heures travaillées le mois dernier", ("2025-07-01", "2025-07-31")),
+    ("rapports d'il y a 2 mois", ("2025-06-01", "2025-06-30")),
+    ("three months ago", ("2025-05-01", "2025-05-31")),
+    ("la semaine dernière, quels problèmes ?", ("2025-08-11", "2025-08-17")),
+    ("équipements de cette semaine", ("2025-08-18", "2025-08-24")),
+    ("les 7 derniers jours", ("2025-08-14", "2025-08-20")),
+    ("last 30 days for client STEG", ("2025-07-22", "2025-08-20")),
+    ("all reports in 2024", ("2024-01-01", "2024-12-31")),
+    ("Quel est le téléphone de Sami ?", None),
+    ("Can you list all equipment?", None),
+    ("May I see the planning?", None),
+    ("date invalide 31/02/2025", None),
+]
+
+
+@pytest.mark.parametrize("text, expected", CORPUS)
+def test_corpus(text, expected):
+    found = parse_date_range(text, TODAY)
+    got = (found.start.isoformat(), found.end.isoformat()) if found else None
+    assert got == expected
+
+
+@pytest.mark.parametrize("text, weekday, expected", [
+    ("Qui travaille jeudi ?", "future", "21-08-2025"),
+    ("Qui travaille mercredi ?", "future", "20-08-2025"),
+    ("Qui travaille lundi ?", "future", "25-08-2025"),
+    ("rapport de jeudi", "past", "14-08-2025"),
+    ("rapport de mercredi", "past", "20-08-2025"),
+])
+def test_bare_weekday_direction(text, weekday, expected):
+    assert extract_date_ddmmyyyy(text, today=TODAY, weekday=weekday) == expected
+
+
+def test_period_is_not_a_single_day():
+    assert extract_date_ddmmyyyy("la semaine dernière", today=TODAY) == NO_DATE
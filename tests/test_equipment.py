@@ -0,0 +1,52 @@
+"""Equipment ledger exploded from the "name: count" cells of the sheets."""
+import pandas as pd
+from src.agents.equipment import (
+    parse_equipment_column, build_equipment_ledger, equipment_totals, LedgerCache, PLANNING_EQUIPMENT_COLUMNS,
+    LEDGER_COLUMNS
+)
+
+REPORTS = pd.DataFrame({
+    "date": ["01/07/2025", "02/07/2025", "03/07/2025"],
+    "client": ["Vermeg", "STEG", "Vermeg"],
+    "chef_chantier": ["Sami", "Karim", "Sami"],
+    "equipement_installee": ["Caméra: 4, Switch: 1", "Caméra:2", None],
+    "equipement_retour": ["", "Câble: x, Switch: 1", "Caméra: 1"],
+}, index=[10, 11, 12])
+
+
+def test_parse_skips_items_without_count():
+    parsed = parse_equipment_column(pd.Series(["Caméra: 4, Switch", " NVR :  1 ", ": 3", None]))
+    assert parsed.to_dict(orient="list") == {"row": [0, 1], "equipment": ["Caméra", "NVR"], "qty": [4, 1]}
+
+
+def test_ledger_keeps_source_rows_and_context():
+    ledger = build_equipment_ledger(REPORTS)
+    assert list(ledger.columns) == LEDGER_COLUMNS
+    installed = ledger[ledger["direction"] == "installed"]
+    assert installed["row"].tolist() == [10, 10, 11]
+    assert installed["client"].tolist() == ["Vermeg", "Vermeg", "STEG"]
+
+
+def test_totals_by_direction_and_rows():
+    ledger = build_equipment_ledger(REPORTS)
+    assert equipment_totals(ledger, "installed") == {"Caméra": 6, "Switch": 1}
+    assert equipment_totals(ledger, "returned") == {"Caméra": 1, "Switch": 1}
+    assert equipment_totals(ledger, "installed", rows=[11, 12]) == {"Caméra": 2}
+
+
+def test_planning_columns_and_missing_columns():
+    planning = pd.DataFrame({"date": ["01/07/2025"], "equipment": ["Caméra: 3"]})
+    ledger = build_equipment_ledger(planning, PLANNING_EQUIPMENT_COLUMNS)
+    assert equipment_totals(ledger, "planned") == {"Caméra": 3}
+    assert ledger["client"].isna().all()
+    assert build_equipment_ledger(pd.DataFrame({"date": []})).empty
+
+
+def test_ledger_cache_rebuilds_on_new_version():
+    cache = LedgerCache(max_entries=1)
+    first = cache.get("reports", "v1", REPORTS)
+    assert cache.get("reports", "v1", REPORTS) is first
+    assert cache.get("reports", "v2", REPORTS) is not first
+    cache.get("planning", "v1", REPORTS)
+    assert "reports" not in cache._entries
+    assert cache.get("reports", None, REPORTS) is not cache.get("reports", None, REPORTS)
@@ -0,0 +1,75 @@
+"""Merged-search filters read from the question with the data vocabularies."""
+from datetime import date
+import pandas as pd
+import pytest
+from src.agents.filter_extraction import build_vocabularies, rule_filters, date_filters, residual_fields
+
+TODAY = date(2025, 8, 20)
+
+REPORTS = pd.DataFrame({
+    "client": ["Mars Distribution", "Orange Tunisie", "Tunisie Telecom", "Vermeg", "Banque Zitouna"],
+    "chef_chantier": ["Jean Dupont", "Karim Ben Salah", "Sami Trabelsi", "Jean Dupont", "Karim Ben Salah"],
+})
+EQUIPMENT = ["Caméra Dome 4MP", "Switch PoE 8 ports", "Enregistreur NVR"]
+
+
+@pytest.fixture(scope="module")
+def vocabularies():
+    return build_vocabularies(REPORTS, EQUIPMENT)
+
+
+def filters_of(question, vocabularies):
+    filters = rule_filters(question, vocabularies, TODAY)
+    return {field: value for field, value in filters.items() if value}
+
+
+def test_month_is_not_a_client(vocabularies):
+    filters = filters_of("Combien de caméras installées en mars ?", vocabularies)
+    assert filters.get("month") == "3" and "client" not in filters
+
+
+def test_country_is_not_a_client(vocabularies):
+    filters = filters_of("Travaux en Tunisie en 2025", vocabularies)
+    assert "client" not in filters and filters.get("year") == "2025"
+
+
+@pytest.mark.parametrize("question, client", [
+    ("Rapports pour Mars Distribution en juillet", "Mars Distribution"),
+    ("Travaux chez Orange Tunisie", "Orange Tunisie"),
+    ("Travaux chez Orange", "Orange"),
+    ("installations Tunisie Telecom", "Tunisie Telecom"),
+    ("Interventions chez Vermeg la semaine dernière", "Vermeg"),
+    ("Zitouna", "Zitouna"),
+])
+def test_client_names(vocabularies, question, client):
+    assert filters_of(question, vocabularies).get("client") == client
+
+
+def test_manager_word_shared_by_one_name(vocabularies):
+    assert filters_of("Quels rapports de Dupont ?", vocabularies).get("site_manager") == "Dupont"
+    assert filters_of("rapports de Karim Ben Salah", vocabularies).get("site_manager") == "Karim Ben Salah"
+
+
+def test_equipment_word_not_read_as_client():
+    reports = pd.DataFrame({"client": ["Dome Immobilier"], "chef_chantier": ["Ali"]})
+    filters = filters_of("combien de dome installées ?", build_vocabularies(reports, ["Dome", "Caméra Bullet"]))
+    assert "client" not in filters and filters.get("equipment_type") == "Dome"
+    assert filters.get("aggregation") == "total"
+
+
+def test_delivery_note_and_residual_cue(vocabularies):
+    filters = rule_filters("matériel du BL n° 2025-114 chez Inconnu", vocabularies, TODAY)
+    assert filters["delivery_note"] == "2025-114"
+    assert residual_fields("matériel du BL n° 2025-114 chez Inconnu", filters) == ["client"]
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("installé en juillet", {"month": "7", "year": None}),
+    ("installé en juillet 2024", {"month": "7", "year": "2024"}),
+    ("heures du mois dernier", {"month": "7", "year": "2025"}),
+    ("rapports en 2024", {"year": "2024"}),
+    ("du 1 au 15 juillet", {"date_range": {"start": "2025-07-01", "end": "2025-07-15"}}),
+    ("sans date", {}),
+])
+def test_date_filters(question, expected):
+    assert date_filters(question, TODAY) == expected
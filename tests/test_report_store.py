@@ -0,0 +1,60 @@
+"""Indexed report store filters, kept equal to the in-memory filter_frame."""
+import numpy as np
+import pandas as pd
+import pytest
+from src.agents.report_store import ReportStore, filter_frame
+
+REPORTS = pd.DataFrame({
+    "date": ["01/07/2025", "15/07/2025", "02/08/2025", "10/07/2024", "n/a"],
+    "client": ["Vermeg", "Orange Tunisie", "Vermeg", "STEG", "Vermeg"],
+    "chef_chantier": ["Sami Trabelsi", "Karim", "Karim", "Sami Trabelsi", None],
+    "equipement_installee": ["Caméra Dome: 4", "Switch: 1", "", "Caméra Bullet: 2", "NVR: 1"],
+    "equipement_retour": ["", "", "Caméra Dome: 1", "", ""],
+}, index=["f1:0", "f1:1", "f1:2", "f2:0", "f2:1"])
+REPORTS["date_parsed"] = pd.to_datetime(REPORTS["date"], format="%d/%m/%Y", errors="coerce")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReportStore(str(tmp_path / "reports.sqlite"))
+    store.sync({("f1", "m1"): REPORTS.loc[["f1:0", "f1:1", "f1:2"]], ("f2", "m1"): REPORTS.loc[["f2:0", "f2:1"]]})
+    return store
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"month": "7"},
+    {"month": "juillet", "year": "2025"},
+    {"year": "2024"},
+    {"date_range": {"start": "2025-07-10", "end": "2025-08-05"}},
+    {"client": "vermeg"},
+    {"client": "Orange"},
+    {"site_manager": "sami", "month": "7"},
+    {"equipment_type": "caméra dome"},
+    {"equipment_type": "nvr"},
+    {"client": "vermeg", "equipment_type": "dome"},
+    {"year": "not a year"},
+])
+def test_store_matches_filter_frame(store, filters):
+    assert sorted(store.query_row_keys(filters)) == sorted(filter_frame(REPORTS, filters).index)
+
+
+def test_sync_rewrites_changed_files_only(store):
+    assert store.sync({("f1", "m1"): REPORTS.loc[["f1:0"]], ("f2", "m2"): REPORTS.loc[["f2:0"]]}) == 1
+    assert sorted(store.query_row_keys({})) == ["f1:0", "f1:1", "f1:2", "f2:0"]
+    store.sync({("f1", "m1"): REPORTS.loc[["f1:0"]]})
+    assert "f2:0" not in store.query_row_keys({})
+
+
+def test_search_ranks_filtered_rows(store):
+    class Embeddings:
+        model_name = "test"
+
+        def embed_documents(self, texts):
+            return [[1.0, 0.0] if "Vermeg" in text else [0.0, 1.0] for text in texts]
+
+    assert store.index_vectors(Embeddings()) == 5
+    assert store.index_vectors(Embeddings()) == 0
+    assert store.search(np.array([0.0, 1.0]), k=1) in (["f1:1"], ["f2:0"])
+    assert store.search([1.0, 0.0], {"month": "8"}, k=3) == ["f1:2"]
+    assert store.search([1.0, 0.0], {"client": "nobody"}) == []
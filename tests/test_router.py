@@ -0,0 +1,58 @@
+"""Intent router: keyword and date evidence, embedding fallback."""
+from types import SimpleNamespace
+import pytest
+from src.agents.router import IntentRouter, rule_scores
+
+TOOL_NAMES = ["technician_search", "planning_date_search", "daily_report_search", "merged_data_search"]
+
+
+def make_router(embedding_getter=None):
+    tools = [SimpleNamespace(name=name, description=name.replace("_", " ")) for name in TOOL_NAMES]
+
+    def unavailable():
+        raise RuntimeError("no embeddings in tests")
+
+    return IntentRouter(tools, embedding_getter or unavailable)
+
+
+@pytest.mark.parametrize("question, tool", [
+    ("Quel est le téléphone de Sami ?", "technician_search"),
+    ("Donne-moi le mail du technicien Karim", "technician_search"),
+    ("Quel est le numéro du technicien Youssef ?", "technician_search"),
+    ("Quel est le planning du 12/08/2025 ?", "planning_date_search"),
+    ("Combien de caméras installées en juillet ?", "merged_data_search"),
+])
+def test_rule_routes(question, tool):
+    route = make_router().route(question)
+    assert (route.tool, route.source) == (tool, "rules")
+
+
+@pytest.mark.parametrize("question", [
+    "Quel est le numéro du BL du 12/08/2025 ?",
+    "Quel est le contact du client Orange pour le rapport du 3 juillet ?",
+    "Quels techniciens ont travaillé hier ?",
+    "Quel est le numéro du BL ?",
+])
+def test_generic_contact_words_do_not_pick_the_directory(question):
+    assert rule_scores(question)["technician_search"] == 0.0
+    assert make_router().route(question).tool != "technician_search"
+
+
+def test_dated_contact_question_keeps_the_directory():
+    scores = rule_scores("numéro du technicien qui travaille demain")
+    assert scores["technician_search"] > 0
+
+
+def test_embeddings_break_a_rule_tie():
+    vectors = {name: [float(i == n) for i in range(4)] for n, name in enumerate(TOOL_NAMES)}
+
+    class Embeddings:
+        def embed_documents(self, texts):
+            return [vectors[text.replace(" ", "_")] if text.replace(" ", "_") in vectors else [0.0] * 4
+                    for text in texts]
+
+        def embed_query(self, question):
+            return vectors["daily_report_search"]
+
+    route = make_router(lambda: Embeddings()).route("Quels techniciens ont travaillé hier ?")
+    assert route == ("daily_report_search", "embeddings", route.scores)
@@ -0,0 +1,71 @@
+"""Specification parsing and attribute conditions answered without the LLM."""
+import pandas as pd
+import pytest
+from src.retrievers.spec_attributes import (
+    parse_spec_pairs, extract_attributes, parse_attribute_conditions, build_spec_attribute_store_uncached
+)
+
+
+def conditions_of(question):
+    conditions, complete = parse_attribute_conditions(question)
+    return [(c.attribute, c.op, c.value) for c in conditions], complete
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2560 × 1440", 4.0),
+    ("3200 × 1800", 6.0),
+    ("1920 × 1080", 2.0),
+    ("3840 × 2160", 8.0),
+    ("4 MP (2560 × 1440)", 4.0),
+])
+def test_marketed_resolution(value, expected):
+    pairs = parse_spec_pairs(f"Image:Max. Resolution:{value}", "hikvision")
+    assert extract_attributes(pairs)["resolution_mp"] == expected
+
+
+def test_product_name_megapixels_win():
+    pairs = parse_spec_pairs("Image:Max. Resolution:2688 × 1512", "hikvision")
+    assert extract_attributes(pairs, "4 MP AcuSense Fixed Dome")["resolution_mp"] == 4.0
+
+
+def test_bare_resolution_is_exact():
+    assert conditions_of("4MP") == ([("resolution_mp", "==", 4.0)], True)
+    assert conditions_of("résolution au moins 4MP") == ([("resolution_mp", ">=", 4.0)], True)
+
+
+def test_disjunction_goes_to_llm():
+    _, complete = parse_attribute_conditions("au moins 2 MP ou IP66")
+    assert not complete
+    _, complete = parse_attribute_conditions("au moins 2 MP et IP66")
+    assert complete
+
+
+def test_supply_voltage_range():
+    pairs = parse_spec_pairs(
+        "Tension de sortie du bloc d'alimentation:14 V|Tension d'alimentation:10,5…14 V DC", "satel"
+    )
+    attributes = extract_attributes(pairs)
+    assert (attributes["supply_voltage_min_v"], attributes["supply_voltage_max_v"]) == (10.5, 14.0)
+
+
+def test_alternative_voltages_left_to_llm():
+    pairs = parse_spec_pairs("Power Supply:24 VAC/12 VDC", "satel")
+    assert "supply_voltage_min_v" not in extract_attributes(pairs)
+
+
+def test_store_evaluates_resolution_and_voltage():
+    df = pd.DataFrame({
+        "product_code": ["CAM4", "CAM8", "PSU"],
+        "product_name": ["cam", "cam", "psu"],
+        "technical_specifications": [
+            "Image:Max. Resolution:2560 × 1440", "Image:Max. Resolution:3840 × 2160", "Power:Power Supply:12 VDC ± 25%",
+        ],
+    })
+    store = build_spec_attribute_store_uncached(df, "hikvision")
+
+    conditions, _ = parse_attribute_conditions("résolution ≥ 4MP")
+    assert store.matching_products(conditions) == ["CAM4", "CAM8"]
+    conditions, _ = parse_attribute_conditions("4MP")
+    assert store.matching_products(conditions) == ["CAM4"]
+    conditions, _ = parse_attribute_conditions("supporte 12V ?")
+    assert store.matching_products(conditions) == ["PSU"]
@@ -0,0 +1,42 @@
+"""Time on site computed from the daily report entry and exit times."""
+import math
+import pandas as pd
+import pytest
+from src.agents.time_on_site import parse_clock, add_duration_column, time_on_site, format_hours
+
+
+@pytest.mark.parametrize("cell, hours", [
+    ("8h30", 8.5), ("08:30", 8.5), ("8.30", 8.5), ("8H", 8.0), ("08:30:00", 8.5), ("830", 8.5),
+    (8.3, 8.5), (17.45, 17.75), (9.0, 9.0),
+])
+def test_parse_clock(cell, hours):
+    assert parse_clock(pd.Series([cell], dtype=object)).iloc[0] == pytest.approx(hours)
+
+
+@pytest.mark.parametrize("cell", ["", "abc", "25h", "8h75", None, float("nan")])
+def test_parse_clock_rejects(cell):
+    assert math.isnan(parse_clock(pd.Series([cell], dtype=object)).iloc[0])
+
+
+def test_float_column_read_by_pandas():
+    df = pd.DataFrame({"heure_entree": [8.3, 13.0], "heure_sortie": [17.45, 18.3]})
+    assert add_duration_column(df)["duree_heures"].tolist() == pytest.approx([9.25, 5.5])
+
+
+def test_overnight_shift_wraps_but_typo_does_not():
+    df = pd.DataFrame({
+        "heure_entree": ["22h", "9h", "8h"],
+        "heure_sortie": ["6h", "7h", "17h"],
+        "date": ["01/07/2025"] * 3,
+        "client": ["A", "B", "A"],
+    })
+    durations = add_duration_column(df)["duree_heures"]
+    assert durations.iloc[0] == 8.0 and math.isnan(durations.iloc[1]) and durations.iloc[2] == 9.0
+
+    total = time_on_site(df).loc["total"]
+    assert (total["hours"], total["visits"], total["without_times"]) == (17.0, 2, 1)
+    assert time_on_site(df, "client").loc["A", "hours"] == 17.0
+
+
+def test_format_hours():
+    assert format_hours(7.5) == "7h30"
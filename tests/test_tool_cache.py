@@ -0,0 +1,43 @@
+"""TTL + LRU cache of the technician tool answers."""
+from unittest import mock
+from src.agents import tool_cache as tool_cache_module
+from src.agents.tool_cache import ToolResultCache
+
+
+def test_key_needs_a_version_and_normalizes_the_question():
+    assert ToolResultCache.key("planning", "Qui travaille ?", "2025-08-20", None) is None
+    assert ToolResultCache.key("planning", "Qui  TRAVAILLE ?", "2025-08-20", "v1") == \
+        ToolResultCache.key("planning", "qui travaille ?", "2025-08-20", "v1")
+    assert ToolResultCache.key("planning", "q", {"month": "7"}, "v1") != ToolResultCache.key("planning", "q", {"month": "8"}, "v1")
+    assert ToolResultCache.key("planning", "q", None, "v1") != ToolResultCache.key("planning", "q", None, "v2")
+
+
+def test_uncacheable_key_is_passed_through():
+    cache = ToolResultCache(max_entries=4, ttl=60)
+    assert cache.put(None, "answer") == "answer"
+    assert cache.get(None) is None and not cache._entries
+
+
+def test_entries_expire_after_the_ttl():
+    cache = ToolResultCache(max_entries=4, ttl=10)
+    with mock.patch.object(tool_cache_module.time, "monotonic", return_value=100.0):
+        cache.put("k", "answer")
+    with mock.patch.object(tool_cache_module.time, "monotonic", return_value=110.0):
+        assert cache.get("k") == "answer"
+    with mock.patch.object(tool_cache_module.time, "monotonic", return_value=110.5):
+        assert cache.get("k") is None
+    assert (cache.hits, cache.misses) == (1, 1) and "k" not in cache._entries
+
+
+def test_least_recently_used_is_evicted():
+    cache = ToolResultCache(max_entries=2, ttl=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_zero_size_disables_the_cache():
+    cache = ToolResultCache(max_entries=0, ttl=None)
+    assert cache.put("a", 1) == 1 and cache.get("a") is None
@@ -0,0 +1,57 @@
+"""SQLite verdict cache keyed by question, product and versions."""
+import pandas as pd
+import pytest
+from src.retrievers.verdict_cache import VerdictCache, normalize_question, compute_index_version
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return VerdictCache(str(tmp_path / "cache" / "verdicts.sqlite"))
+
+
+def row(code, correspond, justification="ok"):
+    return {"code": code, "correspond": correspond, "justification": justification, "soures": "CSV"}
+
+
+def test_round_trip_with_normalized_question(cache):
+    cache.put_many("Supporte le PoE ?", [row("A", "Oui"), row("B", "Non")], "v1", "p1")
+    found = cache.get_many("  supporte le poe", ["A", "B", "C"], "v1", "p1")
+    assert sorted(found) == ["A", "B"] and found["A"] == row("A", "Oui")
+
+
+def test_error_rows_are_not_cached(cache):
+    cache.put_many("q", [row("A", "Erreur"), row("B", "Pas clair"), None], "v1", "p1")
+    assert cache.get_many("q", ["A", "B"], "v1", "p1") == {}
+
+
+def test_versions_separate_entries(cache):
+    cache.put_many("q", [row("A", "Oui")], "v1", "p1")
+    assert cache.get_many("q", ["A"], "v2", "p1") == {}
+    assert cache.get_many("q", ["A"], "v1", "p2") == {}
+
+
+def test_replace_and_clear(cache):
+    cache.put_many("q", [row("A", "Oui")], "v1", "p1")
+    cache.put_many("q", [row("A", "Non", "updated")], "v1", "p1")
+    assert cache.get_many("q", ["A"], "v1", "p1")["A"]["justification"] == "updated"
+    cache.clear()
+    assert cache.get_many("q", ["A"], "v1", "p1") == {}
+
+
+def test_many_codes_are_chunked(cache):
+    codes = [f"P{i}" for i in range(1200)]
+    cache.put_many("q", [row(code, "Oui") for code in codes], "v1", "p1")
+    assert len(cache.get_many("q", codes + codes[:10], "v1", "p1")) == 1200
+
+
+def test_persisted_across_connections(tmp_path):
+    path = str(tmp_path / "verdicts.sqlite")
+    VerdictCache(path).put_many("q", [row("A", "Oui")], "v1", "p1")
+    assert "A" in VerdictCache(path).get_many("q", ["A"], "v1", "p1")
+
+
+def test_index_version_follows_the_data():
+    df = pd.DataFrame({"product_code": ["A", "B"], "price": [1, 2]})
+    assert compute_index_version(df) == compute_index_version(df.copy())
+    assert compute_index_version(df) != compute_index_version(df.assign(price=[1, 3]))
+    assert normalize_question("Quoi ?!") == normalize_question("quoi")